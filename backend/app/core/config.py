@@ -54,8 +54,12 @@ class Settings(BaseSettings):
     # CORS 設定 - 使用環境變數或默認值
     CORS_ORIGINS: str = "http://localhost:5173,http://localhost:3000"
     
+    # 前端網址（Discord 推播中的貼文連結）
+    FRONTEND_URL: str = "http://localhost:5173"
+    
     # 檔案上傳設定
     UPLOAD_DIR: str = "uploads"
+    LOGO_PATH: str = "uploads/logo.png"
     
     # CloudFlare D1 設定
     USE_D1: bool = True
@@ -63,6 +67,98 @@ class Settings(BaseSettings):
     CLOUDFLARE_D1_DATABASE_ID: str = ""
     CLOUDFLARE_API_TOKEN: str = ""
     
+    # D1 後端："cloudflare" 使用 D1 HTTP API，"sqlite" 使用本機 SQLite 檔案
+    D1_BACKEND: str = "cloudflare"
+    SQLITE_D1_PATH: str = "forumkit.sqlite3"
+    SQLITE_D1_SCHEMA_PATH: str = ""
+    
+    # D1 HTTP 連線池設定
+    D1_HTTP2: bool = True
+    D1_POOL_MAX_CONNECTIONS: int = 20
+    D1_POOL_MAX_KEEPALIVE: int = 10
+    D1_POOL_KEEPALIVE_EXPIRY: float = 30.0
+    D1_CONNECT_TIMEOUT: float = 5.0
+    D1_REQUEST_TIMEOUT: float = 30.0
+    
+    # 瀏覽次數寫回設定
+    VIEW_COUNT_FLUSH_INTERVAL: float = 10.0
+    VIEW_COUNT_FLUSH_THRESHOLD: int = 500
+    
+    # D1 查詢記錄設定
+    D1_SLOW_QUERY_MS: float = 200.0
+    D1_SLOW_QUERY_LOG_SIZE: int = 100
+    D1_N_PLUS_ONE_THRESHOLD: int = 10
+    
+    # Prometheus 指標端點（/metrics）
+    METRICS_ENABLED: bool = True
+    
+    # 就緒檢查（/ready）：D1 探測與外送佇列積壓的快取秒數，以及判定降級的門檻
+    HEALTH_CHECK_TTL: float = 5.0
+    HEALTH_CHECK_TIMEOUT: float = 2.0
+    HEALTH_MAX_D1_LATENCY_MS: float = 500.0
+    HEALTH_MAX_POOL_SATURATION: float = 0.9
+    HEALTH_MAX_OUTBOX_BACKLOG: int = 1000
+    HEALTH_MAX_RENDER_PENDING: int = 32
+    
+    # 學校功能開關快取
+    FEATURE_TOGGLE_CACHE_TTL: float = 300.0
+    FEATURE_TOGGLE_CACHE_SIZE: int = 1024
+    
+    # 信箱域名 -> 學校 ID 快取（無法對應的域名以較短的時間快取）
+    SCHOOL_DOMAIN_CACHE_TTL: float = 3600.0
+    SCHOOL_DOMAIN_NEGATIVE_TTL: float = 60.0
+    SCHOOL_DOMAIN_CACHE_SIZE: int = 4096
+    
+    # 認證用戶快取（get_current_user 每個請求的用戶查詢）
+    AUTH_PRINCIPAL_CACHE_TTL: float = 30.0
+    AUTH_PRINCIPAL_CACHE_SIZE: int = 10000
+    
+    # Google ID token 驗證（JWKS 依 Cache-Control 快取，未提供時使用預設秒數）
+    GOOGLE_JWKS_DEFAULT_TTL: float = 3600.0
+    GOOGLE_JWKS_MIN_REFRESH_INTERVAL: float = 60.0
+    GOOGLE_JWKS_TIMEOUT: float = 5.0
+    GOOGLE_TOKEN_CACHE_TTL: float = 300.0
+    GOOGLE_TOKEN_CACHE_SIZE: int = 10000
+    GOOGLE_TOKEN_CLOCK_SKEW: int = 10
+    
+    # 發布外送佇列（IG / Discord）；關閉時由其他行程負責處理佇列
+    OUTBOX_WORKER_ENABLED: bool = True
+    OUTBOX_IG_CONCURRENCY: int = 2
+    OUTBOX_DISCORD_CONCURRENCY: int = 5
+    OUTBOX_POLL_INTERVAL: float = 5.0
+    OUTBOX_MAX_ATTEMPTS: int = 6
+    OUTBOX_BACKOFF_BASE: float = 30.0
+    OUTBOX_BACKOFF_MAX: float = 3600.0
+    OUTBOX_LEASE_SECONDS: float = 300.0
+    OUTBOX_JOB_TIMEOUT: float = 240.0
+    OUTBOX_SHUTDOWN_TIMEOUT: float = 10.0
+
+    # Instagram Graph API 客戶端（共用連線池；用量標頭超過門檻時暫停送出）
+    IG_GRAPH_BASE_URL: str = "https://graph.facebook.com"
+    IG_GRAPH_API_VERSION: str = "v18.0"
+    IG_GRAPH_TIMEOUT: float = 30.0
+    IG_GRAPH_CONNECT_TIMEOUT: float = 5.0
+    IG_GRAPH_MAX_CONNECTIONS: int = 10
+    IG_GRAPH_MAX_RETRIES: int = 3
+    IG_GRAPH_BACKOFF_BASE: float = 1.0
+    IG_GRAPH_USAGE_PAUSE_PERCENT: float = 90.0
+    IG_GRAPH_USAGE_PAUSE_SECONDS: float = 60.0
+    IG_GRAPH_MAX_PAUSE: float = 120.0
+
+    # IG 圖片渲染行程池（0 表示使用 CPU 核心數；等待中的渲染超過 MAX_QUEUE 時回應 503）
+    IG_RENDER_WORKERS: int = 0
+    IG_RENDER_MAX_QUEUE: int = 32
+    IG_RENDER_TIMEOUT: float = 60.0
+    IG_RENDER_START_METHOD: str = "spawn"
+
+    # IG 模板資源快取（每個渲染子行程各自保存的背景、字型與 LOGO 數量上限）
+    IG_RENDER_BACKGROUND_CACHE_SIZE: int = 8
+    IG_RENDER_FONT_CACHE_SIZE: int = 64
+    IG_RENDER_LOGO_CACHE_SIZE: int = 8
+
+    # IG 渲染結果快取（輸出目錄總大小上限，超過時淘汰最久未使用的圖片）
+    IG_RENDER_OUTPUT_CACHE_MAX_BYTES: int = 512 * 1024 * 1024
+    
     def get_cors_origins(self) -> List[str]:
         """獲取 CORS 來源列表"""
         return [origin.strip() for origin in self.CORS_ORIGINS.split(",")]
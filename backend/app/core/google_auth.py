@@ -1,22 +1,179 @@
-from typing import Optional, Tuple
+from typing import Any, Dict, List, Optional, Tuple
+import asyncio
 import hashlib
-from google.oauth2 import id_token
-from google.auth.transport import requests
+import re
+import time
+import httpx
+from jose import jwt
+from jose.exceptions import JOSEError
 from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.ttl_cache import MISSING, TTLCache
 
-def verify_google_token(token: str) -> Optional[dict]:
+GOOGLE_JWKS_URL = "https://www.googleapis.com/oauth2/v3/certs"
+GOOGLE_ISSUERS = ("accounts.google.com", "https://accounts.google.com")
+
+_MAX_AGE = re.compile(r"max-age=(\d+)")
+
+def _cache_lifetime(headers: httpx.Headers, default: float) -> float:
+    """依 Cache-Control 的 max-age（扣除 Age）計算可快取的秒數"""
+    cache_control = headers.get("cache-control", "")
+    if "no-store" in cache_control or "no-cache" in cache_control:
+        return 0.0
+    match = _MAX_AGE.search(cache_control)
+    if not match:
+        return default
+    try:
+        age = float(headers.get("age", 0))
+    except ValueError:
+        age = 0.0
+    return max(float(match.group(1)) - age, 0.0)
+
+class GoogleKeySet:
+    """
+    Google 簽章公鑰（JWKS）快取
+    依回應的 Cache-Control 決定有效期限，遇到未知的 kid（金鑰輪替）時提前重新抓取
+    """
+
+    def __init__(
+        self,
+        url: str = GOOGLE_JWKS_URL,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        default_ttl: Optional[float] = None,
+        min_refresh_interval: Optional[float] = None
+    ):
+        self.url = url
+        self._transport = transport
+        self.default_ttl = default_ttl if default_ttl is not None else settings.GOOGLE_JWKS_DEFAULT_TTL
+        self.min_refresh_interval = (
+            min_refresh_interval if min_refresh_interval is not None else settings.GOOGLE_JWKS_MIN_REFRESH_INTERVAL
+        )
+        self._keys: Dict[str, Dict[str, Any]] = {}
+        self._expires_at = 0.0
+        self._fetched_at = 0.0
+        self._lock = asyncio.Lock()
+        self._client: Optional[httpx.AsyncClient] = None
+        self.fetches = 0
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=settings.GOOGLE_JWKS_TIMEOUT,
+                transport=self._transport
+            )
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _refresh(self):
+        response = await self.client.get(self.url)
+        response.raise_for_status()
+        keys = {key["kid"]: key for key in response.json().get("keys", []) if "kid" in key}
+        if not keys:
+            raise ValueError("Google JWKS 沒有可用的金鑰")
+        now = time.monotonic()
+        self._keys = keys
+        self._fetched_at = now
+        self._expires_at = now + _cache_lifetime(response.headers, self.default_ttl)
+        self.fetches += 1
+
+    async def get_key(self, kid: str) -> Dict[str, Any]:
+        """取得 kid 對應的公鑰，快取過期或找不到 kid 時重新抓取（同時只會有一個請求在抓取）"""
+        key = self._keys.get(kid)
+        if key is not None and time.monotonic() < self._expires_at:
+            return key
+
+        async with self._lock:
+            key = self._keys.get(kid)
+            now = time.monotonic()
+            expired = now >= self._expires_at
+            # 找不到 kid 時才提前抓取，並限制頻率，避免偽造的 kid 讓每個請求都打到 Google
+            unknown = key is None and now - self._fetched_at >= self.min_refresh_interval
+            if expired or unknown:
+                try:
+                    await self._refresh()
+                except (httpx.HTTPError, ValueError) as e:
+                    if not self._keys:
+                        raise ValueError(f"無法取得 Google 簽章金鑰: {e}")
+                    # 抓取失敗時沿用舊的金鑰，稍後再試
+                    print(f"更新 Google 簽章金鑰失敗，沿用快取: {e}")
+                    self._expires_at = now + self.min_refresh_interval
+                key = self._keys.get(kid)
+
+        if key is None:
+            raise ValueError(f"未知的 Google 簽章金鑰: {kid}")
+        return key
+
+class GoogleTokenVerifier:
+    """
+    在本機以快取的 JWKS 驗證 Google ID token
+    簽章驗證在執行緒中進行，不阻塞事件迴圈；已驗證的 token 快取到過期為止
+    """
+
+    def __init__(
+        self,
+        client_id: Optional[str] = None,
+        key_set: Optional[GoogleKeySet] = None,
+        issuers: Tuple[str, ...] = GOOGLE_ISSUERS
+    ):
+        self.client_id = client_id or settings.GOOGLE_CLIENT_ID
+        self.key_set = key_set or GoogleKeySet()
+        self.issuers = issuers
+        self._verified = TTLCache(
+            ttl=settings.GOOGLE_TOKEN_CACHE_TTL,
+            maxsize=settings.GOOGLE_TOKEN_CACHE_SIZE
+        )
+        metrics.register_cache("google_id_token", self._verified.cache_info)
+
+    def _decode(self, token: str, key: Dict[str, Any]) -> Dict[str, Any]:
+        return jwt.decode(
+            token,
+            key,
+            algorithms=[key.get("alg", "RS256")],
+            audience=self.client_id,
+            issuer=self.issuers,
+            options={"verify_at_hash": False, "leeway": settings.GOOGLE_TOKEN_CLOCK_SKEW}
+        )
+
+    async def verify(self, token: str) -> Dict[str, Any]:
+        """驗證 token 並返回其中的資訊，無效時拋出 ValueError"""
+        cache_key = hashlib.sha256(token.encode()).hexdigest()
+        claims = self._verified.get(cache_key)
+        if claims is not MISSING:
+            return claims
+
+        try:
+            kid = jwt.get_unverified_header(token).get("kid")
+        except JOSEError as e:
+            raise ValueError(f"無效的 Google token: {e}")
+        if not kid:
+            raise ValueError("Google token 缺少 kid")
+
+        key = await self.key_set.get_key(kid)
+        try:
+            claims = await asyncio.to_thread(self._decode, token, key)
+        except JOSEError as e:
+            raise ValueError(f"無效的 Google token: {e}")
+
+        # 快取到 token 過期為止
+        ttl = min(self._verified.ttl, float(claims["exp"]) - time.time())
+        if ttl > 0:
+            self._verified.set(cache_key, claims, ttl=ttl)
+        return claims
+
+# 創建全域實例
+google_token_verifier = GoogleTokenVerifier()
+
+async def verify_google_token(token: str) -> Optional[dict]:
     """
     驗證 Google ID token
     """
     try:
-        idinfo = id_token.verify_oauth2_token(
-            token, requests.Request(), settings.GOOGLE_CLIENT_ID
-        )
-        
-        if idinfo['iss'] not in ['accounts.google.com', 'https://accounts.google.com']:
-            return None
-            
-        return idinfo
+        return await google_token_verifier.verify(token)
     except ValueError:
         return None
 
@@ -0,0 +1,259 @@
+"""
+Prometheus 格式的應用程式指標
+以簡單的計數器、量表與直方圖記錄請求延遲、D1 往返、外部發布與快取命中率，由 /metrics 以文字格式輸出
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# 預設延遲區間（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[Any, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _Metric:
+    """指標基底類別：依標籤值分組保存數值"""
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[Any, ...], Any] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[Any, ...]:
+        return tuple(labels.get(name, "") for name in self.labelnames)
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+            *self._samples()
+        ]
+
+class Counter(_Metric):
+    """只增不減的計數器"""
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+class Gauge(Counter):
+    """可增可減的量表"""
+    kind = "gauge"
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+class Histogram(_Metric):
+    """累積區間的直方圖（bucket / sum / count）"""
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                # [各區間次數（最後一格為 +Inf）, 總和, 次數]
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def count(self, **labels) -> int:
+        entry = self._values.get(self._key(labels))
+        return entry[2] if entry else 0
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = [(key, list(entry[0]), entry[1], entry[2]) for key, entry in self._values.items()]
+
+        lines = []
+        for key, counts, total, count in items:
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, float("inf")), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+class MetricsRegistry:
+    """指標註冊表：保存所有指標與快取統計來源，並輸出 Prometheus 文字格式"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._caches: Dict[str, Callable[[], Any]] = {}
+
+    def _register(self, metric: _Metric) -> _Metric:
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def register_cache(self, name: str, info: Callable[[], Any]):
+        """
+        註冊快取統計來源
+        info 返回具有 hits、misses、currsize 屬性的物件（與 functools.lru_cache 的 cache_info() 相同）
+        """
+        self._caches[name] = info
+
+    def _cache_lines(self) -> List[str]:
+        rows = []
+        for name, info in list(self._caches.items()):
+            try:
+                stats = info()
+            except Exception as e:
+                print(f"讀取快取統計失敗 ({name}): {e}")
+                continue
+            rows.append((name, stats.hits, stats.misses, stats.currsize or 0))
+        if not rows:
+            return []
+
+        labelnames = ("cache",)
+        lines = [
+            "# HELP forumkit_cache_hits_total Cache lookups served from the cache",
+            "# TYPE forumkit_cache_hits_total counter",
+            *[f"forumkit_cache_hits_total{_format_labels(labelnames, (name,))} {hits}" for name, hits, _, _ in rows],
+            "# HELP forumkit_cache_misses_total Cache lookups that missed",
+            "# TYPE forumkit_cache_misses_total counter",
+            *[f"forumkit_cache_misses_total{_format_labels(labelnames, (name,))} {misses}" for name, _, misses, _ in rows],
+            "# HELP forumkit_cache_entries Entries currently held by the cache",
+            "# TYPE forumkit_cache_entries gauge",
+            *[f"forumkit_cache_entries{_format_labels(labelnames, (name,))} {size}" for name, _, _, size in rows],
+            "# HELP forumkit_cache_hit_ratio Hits divided by lookups since start",
+            "# TYPE forumkit_cache_hit_ratio gauge"
+        ]
+        for name, hits, misses, _ in rows:
+            lookups = hits + misses
+            ratio = hits / lookups if lookups else 0.0
+            lines.append(f"forumkit_cache_hit_ratio{_format_labels(labelnames, (name,))} {_format_value(round(ratio, 6))}")
+        return lines
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        lines.extend(self._cache_lines())
+        return "\n".join(lines) + "\n"
+
+# 創建全域實例
+metrics = MetricsRegistry()
+
+http_requests_in_flight = metrics.gauge(
+    "forumkit_http_requests_in_flight",
+    "HTTP requests currently being processed"
+)
+http_requests_total = metrics.counter(
+    "forumkit_http_requests_total",
+    "HTTP requests by route template and status",
+    ("method", "route", "status")
+)
+http_request_duration_seconds = metrics.histogram(
+    "forumkit_http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ("method", "route")
+)
+d1_round_trips_total = metrics.counter(
+    "forumkit_d1_round_trips_total",
+    "D1 round trips (single queries or batches)",
+    ("kind",)
+)
+d1_statements_total = metrics.counter(
+    "forumkit_d1_statements_total",
+    "SQL statements sent to D1"
+)
+d1_round_trip_duration_seconds = metrics.histogram(
+    "forumkit_d1_round_trip_duration_seconds",
+    "Wall-clock latency of a D1 round trip as seen by the API",
+    ("kind",)
+)
+d1_execution_seconds_total = metrics.counter(
+    "forumkit_d1_execution_seconds_total",
+    "Statement execution time reported by D1"
+)
+publish_duration_seconds = metrics.histogram(
+    "forumkit_publish_duration_seconds",
+    "Duration of outbound publishes to external platforms",
+    ("target", "action"),
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+)
+publish_failures_total = metrics.counter(
+    "forumkit_publish_failures_total",
+    "Outbound publishes that raised an error",
+    ("target", "action")
+)
+
+@asynccontextmanager
+async def track_publish(target: str, action: str = "post"):
+    """記錄一次外部發布（IG、Discord）的耗時，發生例外時累計失敗次數"""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        publish_failures_total.inc(target=target, action=action)
+        raise
+    finally:
+        publish_duration_seconds.observe(time.perf_counter() - started, target=target, action=action)
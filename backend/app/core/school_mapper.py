@@ -1,6 +1,8 @@
 from typing import Optional
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.ttl_cache import TTLCache
 from app.crud.school_d1 import school_d1
-from app.schemas.school import SchoolCreate
 
 # 信箱域名到學校代碼的映射
 EMAIL_DOMAIN_TO_SCHOOL = {
@@ -16,6 +18,51 @@ def is_valid_edu_email(email: str) -> bool:
     """
     return email.lower().endswith('edu.tw')
 
+class SchoolDomainMap:
+    """
+    信箱域名 -> 學校 ID 的行程內對應表
+    啟動時整批載入；未知域名由單一請求查詢或建立（single-flight），其他同時登入的請求等待同一個結果
+    """
+
+    def __init__(self):
+        self._cache = TTLCache(
+            ttl=settings.SCHOOL_DOMAIN_CACHE_TTL,
+            maxsize=settings.SCHOOL_DOMAIN_CACHE_SIZE,
+            negative_ttl=settings.SCHOOL_DOMAIN_NEGATIVE_TTL
+        )
+        metrics.register_cache("school_domain", self._cache.cache_info)
+
+    async def load(self) -> int:
+        """載入所有學校的域名，返回筆數"""
+        rows = await school_d1.adapter.custom_query("SELECT id, domain FROM schools")
+        for row in rows:
+            self._cache.set(row["domain"].lower(), row["id"])
+        return len(rows)
+
+    async def _resolve(self, domain: str) -> Optional[int]:
+        school = await school_d1.get_by_domain(domain)
+        if not school:
+            # 如果學校不存在，創建新學校
+            school_name = EMAIL_DOMAIN_TO_SCHOOL.get(domain, domain.split('.')[0].upper())
+            school = await school_d1.get_or_create_by_domain(domain, f"{school_name} 大學")
+            if not school:
+                print(f"無法為域名 {domain} 建立學校（名稱 {school_name} 大學 已被使用）")
+                return None
+        return school["id"]
+
+    async def get_school_id(self, domain: str) -> Optional[int]:
+        domain = domain.lower()
+        return await self._cache.get_or_load(domain, lambda: self._resolve(domain))
+
+    def invalidate(self, domain: str):
+        self._cache.invalidate(domain.lower())
+
+    def clear(self):
+        self._cache.clear()
+
+# 創建全域實例
+school_domain_map = SchoolDomainMap()
+
 async def get_school_id_by_email_d1(email: str) -> Optional[int]:
     """
     根據郵件域名獲取學校 ID（D1 版本）
@@ -26,18 +73,7 @@ async def get_school_id_by_email_d1(email: str) -> Optional[int]:
     # 從郵件中提取學校域名
     domain = email.split('@')[1].lower()
     
-    # 根據域名查找學校
-    school = await school_d1.get_by_domain(domain)
-    if not school:
-        # 如果學校不存在，創建新學校
-        school_name = EMAIL_DOMAIN_TO_SCHOOL.get(domain, domain.split('.')[0].upper())
-        school_create = SchoolCreate(
-            name=f"{school_name} 大學",
-            domain=domain
-        )
-        school = await school_d1.create(school_create)
-    
-    return school["id"]
+    return await school_domain_map.get_school_id(domain)
 
 # 為了向後相容性保留原函數（但已淘汰）
 def get_school_id_by_email(db, email: str) -> Optional[int]:
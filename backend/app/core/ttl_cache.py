@@ -0,0 +1,98 @@
+"""
+行程內 TTL 快取
+容量有上限（LRU 淘汰），每筆資料有存活時間；多個 worker 各自持有一份，跨行程的變更以 TTL 收斂
+"""
+import asyncio
+import time
+from collections import OrderedDict, namedtuple
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+# 與 functools.lru_cache 的 cache_info() 欄位相同，可直接註冊到 metrics
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "maxsize", "currsize"])
+
+MISSING = object()
+
+class TTLCache:
+    """具存活時間與容量上限的快取，另提供 async 載入時的 single-flight"""
+
+    def __init__(self, ttl: float, maxsize: int = 1024, negative_ttl: Optional[float] = None):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        # 值為 None（查無資料）時使用的存活時間，未設定時與 ttl 相同
+        self.negative_ttl = negative_ttl
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._loading: Dict[Hashable, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Any = MISSING) -> Any:
+        """取得未過期的值，沒有時返回 default（預設為 MISSING，可與快取的 None 區分）"""
+        entry = self._data.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > time.monotonic():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._data[key]
+        self.misses += 1
+        return default
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        if ttl is None:
+            ttl = self.negative_ttl if value is None and self.negative_ttl is not None else self.ttl
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    async def get_or_load(
+        self,
+        key: Hashable,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: Optional[float] = None
+    ) -> Any:
+        """
+        取得快取值，沒有時呼叫 loader 載入並存入
+        同一個 key 同時只會有一個 loader 在執行，其他呼叫等待同一個結果
+        """
+        value = self.get(key)
+        if value is not MISSING:
+            return value
+
+        future = self._loading.get(key)
+        if future is not None:
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self._loading[key] = future
+        try:
+            value = await loader()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # 沒有其他等待者時避免「例外未被取出」的警告
+            future.exception()
+            raise
+        else:
+            # 載入期間被 invalidate 時不寫入快取，避免存入變更前的舊資料
+            if self._loading.get(key) is future:
+                self.set(key, value, ttl)
+            future.set_result(value)
+            return value
+        finally:
+            if self._loading.get(key) is future:
+                del self._loading[key]
+
+    def invalidate(self, key: Hashable):
+        self._data.pop(key, None)
+        self._loading.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+        self._loading.clear()
+
+    def cache_info(self) -> CacheInfo:
+        return CacheInfo(self.hits, self.misses, self.maxsize, len(self._data))
@@ -1,7 +1,7 @@
 """
 D1 資料庫版本的評論 CRUD 操作
 """
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple
 from app.crud.d1_base import CRUDBase
 from app.schemas.comment import CommentCreate, CommentUpdate
 from datetime import datetime
@@ -21,15 +21,14 @@ class CRUDCommentD1(CRUDBase[Dict[str, Any], CommentCreate, CommentUpdate]):
             "created_at": datetime.utcnow().isoformat()
         })
         
-        # 插入記錄並獲取 ID
-        new_id = await self.adapter.insert(self.table_name, comment_data)
+        # 插入記錄並直接取回新評論
+        comment = await self.adapter.insert_returning(self.table_name, comment_data)
         
         # 增加貼文評論數量
         if comment_data.get("post_id"):
             await self._increment_post_comment_count(comment_data["post_id"])
         
-        # 返回新創建的評論
-        return await self.get(new_id)
+        return comment
     
     async def get_comments_by_post(
         self, 
@@ -104,9 +103,7 @@ class CRUDCommentD1(CRUDBase[Dict[str, Any], CommentCreate, CommentUpdate]):
         reviewer_id: int
     ) -> Optional[Dict[str, Any]]:
         """拒絕評論"""
-        # 獲取評論資訊以減少貼文評論數量
-        comment = await self.get(comment_id)
-        
+        # 更新後的記錄已包含 post_id，不需事先查詢
         result = await self.update(
             id=comment_id, 
             obj_in={
@@ -117,22 +114,20 @@ class CRUDCommentD1(CRUDBase[Dict[str, Any], CommentCreate, CommentUpdate]):
         )
         
         # 減少貼文評論數量
-        if comment and comment.get("post_id"):
-            await self._decrement_post_comment_count(comment["post_id"])
+        if result and result.get("post_id"):
+            await self._decrement_post_comment_count(result["post_id"])
         
         return result
     
     async def increment_like_count(self, comment_id: int) -> Optional[Dict[str, Any]]:
         """增加按讚次數"""
         sql = "UPDATE comments SET like_count = like_count + 1 WHERE id = ?"
-        await self.adapter.execute_query(sql, [comment_id])
-        return await self.get(comment_id)
+        return await self._update_returning_one(comment_id, sql, [comment_id])
     
     async def decrement_like_count(self, comment_id: int) -> Optional[Dict[str, Any]]:
         """減少按讚次數"""
         sql = "UPDATE comments SET like_count = CASE WHEN like_count > 0 THEN like_count - 1 ELSE 0 END WHERE id = ?"
-        await self.adapter.execute_query(sql, [comment_id])
-        return await self.get(comment_id)
+        return await self._update_returning_one(comment_id, sql, [comment_id])
     
     async def get_comment_replies(
         self, 
@@ -168,16 +163,37 @@ class CRUDCommentD1(CRUDBase[Dict[str, Any], CommentCreate, CommentUpdate]):
             order_by="created_at DESC"
         )
     
+    async def get_comments_by_school_page(
+        self, 
+        school_id: int, 
+        cursor: Optional[str] = None, 
+        limit: int = 100,
+        status: Optional[str] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """根據學校 ID 以游標分頁獲取評論列表"""
+        # 公開動態使用，已軟刪除的記錄不列出
+        conditions = ["school_id = ?", "deleted_at IS NULL"]
+        params = [school_id]
+        if status:
+            conditions.append("status = ?")
+            params.append(status)
+        
+        return await self._paginate(
+            f"SELECT * FROM {self.table_name}",
+            conditions,
+            params,
+            cursor=cursor,
+            limit=limit
+        )
+    
     async def delete_comment(self, comment_id: int) -> Optional[Dict[str, Any]]:
         """軟刪除評論"""
-        # 獲取評論資訊以減少貼文評論數量
-        comment = await self.get(comment_id)
-        
+        # 更新後的記錄已包含 post_id，不需事先查詢
         result = await self.soft_delete(comment_id)
         
         # 減少貼文評論數量
-        if comment and comment.get("post_id"):
-            await self._decrement_post_comment_count(comment["post_id"])
+        if result and result.get("post_id"):
+            await self._decrement_post_comment_count(result["post_id"])
         
         return result
     
@@ -185,11 +201,13 @@ class CRUDCommentD1(CRUDBase[Dict[str, Any], CommentCreate, CommentUpdate]):
         """增加貼文評論數量"""
         sql = "UPDATE posts SET comment_count = comment_count + 1 WHERE id = ?"
         await self.adapter.execute_query(sql, [post_id])
+        self._forget(post_id, table_name="posts")
     
     async def _decrement_post_comment_count(self, post_id: int):
         """減少貼文評論數量"""
         sql = "UPDATE posts SET comment_count = CASE WHEN comment_count > 0 THEN comment_count - 1 ELSE 0 END WHERE id = ?"
         await self.adapter.execute_query(sql, [post_id])
+        self._forget(post_id, table_name="posts")
 
 # 創建全域實例
 comment_d1 = CRUDCommentD1() 
\ No newline at end of file
@@ -2,14 +2,37 @@
 D1 資料庫專用的 CRUD 基類
 提供基本的 CRUD 操作
 """
-from typing import Any, Dict, Generic, List, Optional, Type, TypeVar, Union
+from typing import Any, Dict, Generic, List, Optional, Sequence, Tuple, Type, TypeVar, Union
+import asyncio
+import base64
+import json
 from pydantic import BaseModel
 from app.db.d1_adapter import D1Adapter, get_d1_adapter
+from app.db.d1_loader import get_d1_loader
 
 ModelType = TypeVar("ModelType")
 CreateSchemaType = TypeVar("CreateSchemaType", bound=BaseModel)
 UpdateSchemaType = TypeVar("UpdateSchemaType", bound=BaseModel)
 
+# 預設的分頁排序鍵：(SQL 運算式, 結果欄位)
+CREATED_AT_KEYS = (("created_at", "created_at"), ("id", "id"))
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """將排序鍵的值編碼為不透明的分頁游標"""
+    raw = json.dumps(list(values), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    """解碼分頁游標，格式不符時拋出 ValueError"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError("Invalid cursor")
+    return values
+
 class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
     """D1 CRUD 基類"""
     
@@ -18,7 +41,11 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         self.adapter = get_d1_adapter()
     
     async def get(self, id: Any) -> Optional[Dict[str, Any]]:
-        """根據 ID 獲取單筆記錄"""
+        """根據 ID 獲取單筆記錄（請求範圍內會與同時發出的查詢合併）"""
+        loader = get_d1_loader()
+        if loader is not None and loader.adapter is self.adapter:
+            return await asyncio.shield(loader.load(self.table_name, id))
+        
         results = await self.adapter.select(
             table=self.table_name,
             where={"id": id},
@@ -42,6 +69,71 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
             order_by=order_by
         )
     
+    async def get_page(
+        self,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        where: Optional[Dict[str, Any]] = None,
+        descending: bool = True
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """以 (created_at, id) 游標分頁獲取多筆記錄，返回 (記錄, 下一頁游標)"""
+        conditions = []
+        params = []
+        for key, value in (where or {}).items():
+            conditions.append(f"{key} = ?")
+            params.append(value)
+        
+        return await self._paginate(
+            f"SELECT * FROM {self.table_name}",
+            conditions,
+            params,
+            cursor=cursor,
+            limit=limit,
+            descending=descending
+        )
+    
+    async def _paginate(
+        self,
+        select_sql: str,
+        conditions: List[str],
+        params: List[Any],
+        *,
+        cursor: Optional[str],
+        limit: int,
+        order_keys: Sequence[Tuple[str, str]] = CREATED_AT_KEYS,
+        descending: bool = True
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Keyset 分頁：以排序鍵的列值比較取代 OFFSET，深頁也只需走索引
+        order_keys 為 (SQL 運算式, 結果欄位) 的序列，最後一個鍵必須唯一
+        """
+        conditions = list(conditions)
+        params = list(params)
+        expressions = [expression for expression, _ in order_keys]
+        
+        if cursor:
+            values = decode_cursor(cursor, len(order_keys))
+            operator = "<" if descending else ">"
+            placeholders = ', '.join(['?' for _ in values])
+            conditions.append(f"({', '.join(expressions)}) {operator} ({placeholders})")
+            params.extend(values)
+        
+        sql = select_sql
+        if conditions:
+            sql += f" WHERE {' AND '.join(conditions)}"
+        direction = "DESC" if descending else "ASC"
+        sql += f" ORDER BY {', '.join(f'{expression} {direction}' for expression in expressions)} LIMIT ?"
+        # 多取一筆以判斷是否還有下一頁
+        params.append(limit + 1)
+        
+        rows = await self.adapter.custom_query(sql, params)
+        
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor([rows[-1][field] for _, field in order_keys])
+        return rows, next_cursor
+    
     async def create(self, obj_in: CreateSchemaType) -> Dict[str, Any]:
         """創建新記錄"""
         obj_in_data = obj_in.model_dump()
@@ -51,11 +143,8 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
             from datetime import datetime
             obj_in_data["created_at"] = datetime.utcnow().isoformat()
         
-        # 插入記錄並獲取 ID
-        new_id = await self.adapter.insert(self.table_name, obj_in_data)
-        
-        # 返回新創建的記錄
-        return await self.get(new_id)
+        # 插入記錄並直接取回新記錄
+        return await self.adapter.insert_returning(self.table_name, obj_in_data)
     
     async def update(
         self, 
@@ -73,34 +162,41 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
             from datetime import datetime
             update_data["updated_at"] = datetime.utcnow().isoformat()
             
-            # 執行更新
-            changes = await self.adapter.update(
+            # 執行更新並直接取回更新後的記錄
+            rows = await self.adapter.update_returning(
                 table=self.table_name,
                 data=update_data,
                 where={"id": id}
             )
+            self._forget(id)
             
-            if changes > 0:
-                return await self.get(id)
+            if rows:
+                return rows[0]
         
         return None
     
     async def remove(self, id: Any) -> Optional[Dict[str, Any]]:
         """刪除記錄"""
-        # 先獲取要刪除的記錄
-        db_obj = await self.get(id)
-        
-        if db_obj:
-            # 執行刪除
-            changes = await self.adapter.delete(
-                table=self.table_name,
-                where={"id": id}
-            )
-            
-            if changes > 0:
-                return db_obj
+        # 執行刪除並取回被刪除的記錄
+        rows = await self.adapter.delete_returning(
+            table=self.table_name,
+            where={"id": id}
+        )
+        self._forget(id)
         
-        return None
+        return rows[0] if rows else None
+    
+    async def _update_returning_one(self, id: Any, sql: str, params: List[Any]) -> Optional[Dict[str, Any]]:
+        """執行帶 RETURNING 的自訂更新語句並返回單筆記錄"""
+        rows = await self.adapter.custom_query(f"{sql} RETURNING *", params)
+        self._forget(id)
+        return rows[0] if rows else None
+    
+    def _forget(self, id: Any, table_name: Optional[str] = None):
+        """寫入後清除請求範圍內的讀取快取"""
+        loader = get_d1_loader()
+        if loader is not None:
+            loader.forget(table_name or self.table_name, id)
     
     async def soft_delete(self, id: Any) -> Optional[Dict[str, Any]]:
         """軟刪除記錄（設置 deleted_at）"""
@@ -113,18 +209,7 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
     
     async def count(self, where: Optional[Dict[str, Any]] = None) -> int:
         """計算記錄數量"""
-        sql = f"SELECT COUNT(*) as count FROM {self.table_name}"
-        params = []
-        
-        if where:
-            conditions = []
-            for key, value in where.items():
-                conditions.append(f"{key} = ?")
-                params.append(value)
-            sql += f" WHERE {' AND '.join(conditions)}"
-        
-        result = await self.adapter.custom_query(sql, params)
-        return result[0]['count'] if result else 0
+        return await self.adapter.count(self.table_name, where)
     
     async def exists(self, id: Any) -> bool:
         """檢查記錄是否存在"""
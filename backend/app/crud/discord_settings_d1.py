@@ -0,0 +1,22 @@
+"""
+D1 資料庫版本的 Discord 設定 CRUD 操作
+"""
+from typing import Optional, Dict, Any
+from app.crud.d1_base import CRUDBase
+
+class CRUDDiscordSettingsD1(CRUDBase[Dict[str, Any], Dict[str, Any], Dict[str, Any]]):
+    """D1 Discord 設定 CRUD 操作"""
+
+    def __init__(self):
+        super().__init__("discord_settings")
+
+    async def get_by_school(self, school_id: int) -> Optional[Dict[str, Any]]:
+        """獲取學校啟用中的 Discord 設定"""
+        rows = await self.adapter.custom_query(
+            "SELECT * FROM discord_settings WHERE school_id = ? AND is_enabled = 1 ORDER BY id DESC LIMIT 1",
+            [school_id]
+        )
+        return rows[0] if rows else None
+
+# 創建全域實例
+discord_settings_d1 = CRUDDiscordSettingsD1()
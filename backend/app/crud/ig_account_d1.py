@@ -0,0 +1,23 @@
+"""
+D1 資料庫版本的 IG 帳號 CRUD 操作
+"""
+from typing import Optional, Dict, Any
+from app.crud.d1_base import CRUDBase
+
+class CRUDIGAccountD1(CRUDBase[Dict[str, Any], Dict[str, Any], Dict[str, Any]]):
+    """D1 IG 帳號 CRUD 操作"""
+
+    def __init__(self):
+        super().__init__("ig_accounts")
+
+    async def get_active_by_school(self, school_id: int) -> Optional[Dict[str, Any]]:
+        """獲取學校啟用中且已設定 Graph API 權杖的 IG 帳號"""
+        rows = await self.adapter.custom_query(
+            "SELECT * FROM ig_accounts WHERE school_id = ? AND is_active = 1 AND access_token IS NOT NULL "
+            "ORDER BY id DESC LIMIT 1",
+            [school_id]
+        )
+        return rows[0] if rows else None
+
+# 創建全域實例
+ig_account_d1 = CRUDIGAccountD1()
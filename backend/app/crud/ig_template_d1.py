@@ -0,0 +1,31 @@
+"""
+D1 資料庫版本的 IG 模板 CRUD 操作
+"""
+import json
+from typing import Optional, Dict, Any
+from app.crud.d1_base import CRUDBase
+
+class CRUDIGTemplateD1(CRUDBase[Dict[str, Any], Dict[str, Any], Dict[str, Any]]):
+    """D1 IG 模板 CRUD 操作（config 欄位為 JSON 字串，返回時解析為字典）"""
+
+    def __init__(self):
+        super().__init__("ig_templates")
+
+    def _decode(self, template: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        if template is None or not template.get("config"):
+            return None
+        return {**template, "config": json.loads(template["config"])}
+
+    async def get(self, id: Any) -> Optional[Dict[str, Any]]:
+        """根據 ID 獲取已設定渲染參數的模板"""
+        return self._decode(await super().get(id))
+
+    async def get_active(self) -> Optional[Dict[str, Any]]:
+        """獲取最新的啟用中模板"""
+        rows = await self.adapter.custom_query(
+            "SELECT * FROM ig_templates WHERE is_active = 1 AND config IS NOT NULL ORDER BY id DESC LIMIT 1"
+        )
+        return self._decode(rows[0]) if rows else None
+
+# 創建全域實例
+ig_template_d1 = CRUDIGTemplateD1()
@@ -0,0 +1,107 @@
+"""
+D1 資料庫版本的發布外送佇列（outbox）
+貼文與待發布工作在同一個批次（交易）中寫入，由背景工作者領取、重試或轉入死信
+"""
+import json
+from typing import Optional, Dict, Any, List
+from app.crud.d1_base import CRUDBase
+
+# 批次中剛插入的貼文 ID：D1 批次在單一交易內依序執行，posts.id 為 AUTOINCREMENT，
+# 因此 MAX(id) 即為同一批次先前插入的貼文（last_insert_rowid() 在插入第一筆工作後就會改變）
+LAST_POST_ID_SQL = "(SELECT MAX(id) FROM posts)"
+
+class CRUDOutboxD1(CRUDBase[Dict[str, Any], Dict[str, Any], Dict[str, Any]]):
+    """D1 外送佇列 CRUD 操作"""
+
+    def __init__(self):
+        super().__init__("outbox")
+
+    def enqueue_query(
+        self,
+        destination: str,
+        post_id: Optional[int] = None,
+        payload: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        組合新增工作的語句，供與貼文寫入合併為同一個批次
+        未指定 post_id 時使用同一批次中剛插入的貼文
+        """
+        post_id_sql = "?" if post_id is not None else LAST_POST_ID_SQL
+        params = [destination] + ([post_id] if post_id is not None else []) + [
+            json.dumps(payload, ensure_ascii=False) if payload else None
+        ]
+        return {
+            "sql": f"INSERT INTO outbox (destination, post_id, payload) VALUES (?, {post_id_sql}, ?)",
+            "params": params
+        }
+
+    async def claim(self, destination: str, limit: int, lease_seconds: float) -> List[Dict[str, Any]]:
+        """
+        領取到期的工作並設定租約
+        處理中的工作若租約到期（工作者中止）會被重新領取；next_attempt_at 同時作為租約到期時間
+        """
+        return await self.adapter.custom_query(
+            """
+            UPDATE outbox
+            SET status = 'processing',
+                attempts = attempts + 1,
+                next_attempt_at = datetime('now', ?),
+                updated_at = datetime('now')
+            WHERE id IN (
+                SELECT id FROM outbox
+                WHERE destination = ? AND status IN ('pending', 'processing')
+                  AND next_attempt_at <= datetime('now')
+                ORDER BY next_attempt_at
+                LIMIT ?
+            )
+            RETURNING *
+            """,
+            [f"+{int(lease_seconds)} seconds", destination, limit]
+        )
+
+    async def complete(self, id: int) -> None:
+        """完成的工作直接刪除，保持佇列表精簡"""
+        await self.adapter.delete(self.table_name, {"id": id})
+
+    async def retry_later(self, id: int, error: str, delay_seconds: float) -> None:
+        """失敗的工作延後重試"""
+        await self.adapter.custom_query(
+            "UPDATE outbox SET status = 'pending', next_attempt_at = datetime('now', ?), "
+            "last_error = ?, updated_at = datetime('now') WHERE id = ?",
+            [f"+{int(delay_seconds)} seconds", error, id]
+        )
+
+    async def dead_letter(self, id: int, error: str) -> None:
+        """無法完成的工作轉入死信，保留供管理員檢視與重送"""
+        await self.adapter.custom_query(
+            "UPDATE outbox SET status = 'dead', last_error = ?, updated_at = datetime('now') WHERE id = ?",
+            [error, id]
+        )
+
+    async def backlog(self) -> Dict[str, Any]:
+        """已到期但尚未被領取的工作數，以及最久一筆已等待的秒數"""
+        rows = await self.adapter.custom_query(
+            "SELECT COUNT(*) AS due, "
+            "CAST(MAX(strftime('%s', 'now') - strftime('%s', next_attempt_at)) AS INTEGER) AS oldest_due_s "
+            "FROM outbox WHERE status IN ('pending', 'processing') AND next_attempt_at <= datetime('now')"
+        )
+        return {"due": rows[0]["due"], "oldest_due_s": rows[0]["oldest_due_s"] or 0}
+
+    async def get_dead_letters(self, skip: int = 0, limit: int = 100) -> List[Dict[str, Any]]:
+        """獲取死信工作"""
+        return await self.adapter.custom_query(
+            "SELECT * FROM outbox WHERE status = 'dead' ORDER BY id DESC LIMIT ? OFFSET ?",
+            [limit, skip]
+        )
+
+    async def requeue(self, id: int) -> Optional[Dict[str, Any]]:
+        """將死信工作重新排入佇列（重置嘗試次數）"""
+        rows = await self.adapter.custom_query(
+            "UPDATE outbox SET status = 'pending', attempts = 0, next_attempt_at = datetime('now'), "
+            "updated_at = datetime('now') WHERE id = ? AND status = 'dead' RETURNING *",
+            [id]
+        )
+        return rows[0] if rows else None
+
+# 創建全域實例
+outbox_d1 = CRUDOutboxD1()
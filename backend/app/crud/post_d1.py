@@ -1,33 +1,101 @@
 """
 D1 資料庫版本的貼文 CRUD 操作
 """
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple
 from app.crud.d1_base import CRUDBase
+from app.crud.outbox_d1 import outbox_d1
+from app.crud.view_count_buffer import view_count_buffer
 from app.schemas.post import PostCreate, PostUpdate
 from datetime import datetime
 
+# 熱門排序鍵：hot_score 由資料庫觸發器在按讚、評論、瀏覽變動時更新，並有部分索引
+HOT_SCORE_KEYS = (("hot_score", "hot_score"), ("id", "id"))
+
+# 全文搜尋：trigram 斷詞至少需要三個字元
+MIN_FTS_QUERY_LENGTH = 3
+SEARCH_SELECT = (
+    "SELECT posts.*, "
+    "snippet(posts_fts, 1, '<mark>', '</mark>', '…', 24) AS snippet, "
+    "bm25(posts_fts, 2.0, 1.0) AS rank "
+    "FROM posts_fts JOIN posts ON posts.id = posts_fts.rowid"
+)
+# 相關度排序鍵（bm25 越小越相關）與短查詢的時間排序鍵
+SEARCH_RANK_KEYS = (("bm25(posts_fts, 2.0, 1.0)", "rank"), ("posts.id", "id"))
+SEARCH_RECENT_KEYS = (("posts.created_at", "created_at"), ("posts.id", "id"))
+
 class CRUDPostD1(CRUDBase[Dict[str, Any], PostCreate, PostUpdate]):
     """D1 貼文 CRUD 操作"""
     
     def __init__(self):
         super().__init__("posts")
     
-    async def create(self, obj_in: PostCreate) -> Dict[str, Any]:
-        """創建新貼文"""
+    async def create(self, obj_in: PostCreate, author_id: Optional[int] = None) -> Dict[str, Any]:
+        """創建新貼文（待審核）"""
+        post_data = obj_in.model_dump()
+        post_data.update({
+            "author_id": author_id,
+            "status": "pending",
+            "view_count": 0,
+            "like_count": 0,
+            "comment_count": 0,
+            "created_at": datetime.utcnow().isoformat()
+        })
+        
+        # 插入記錄並直接取回新貼文
+        return await self.adapter.insert_returning(self.table_name, post_data)
+    
+    async def create_with_outbox(
+        self,
+        obj_in: PostCreate,
+        destinations: List[str],
+        author_id: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """創建貼文，並在同一個批次中寫入各發布目的地的外送工作"""
         post_data = obj_in.model_dump()
         post_data.update({
+            "author_id": author_id,
             "status": "pending",
             "view_count": 0,
             "like_count": 0,
             "comment_count": 0,
             "created_at": datetime.utcnow().isoformat()
         })
+        sql, params = self.adapter._insert_sql(self.table_name, post_data, returning=True)
+        queries = [{"sql": sql, "params": params}]
+        queries.extend(outbox_d1.enqueue_query(destination) for destination in destinations)
         
-        # 插入記錄並獲取 ID
-        new_id = await self.adapter.insert(self.table_name, post_data)
+        result = await self.adapter.execute_batch(queries)
+        if not result.get('success') or not result['result'][0]['results']:
+            raise Exception(f"Insert failed: {result}")
+        return result['result'][0]['results'][0]
+    
+    async def update_with_outbox(
+        self,
+        post_id: int,
+        obj_in: PostUpdate,
+        destinations: List[str]
+    ) -> Optional[Dict[str, Any]]:
+        """更新貼文，並在同一個批次中寫入各發布目的地的外送工作"""
+        update_data = obj_in.model_dump(exclude_unset=True)
+        update_data["updated_at"] = datetime.utcnow().isoformat()
+        return await self._update_with_outbox(post_id, update_data, destinations)
+    
+    async def _update_with_outbox(
+        self,
+        post_id: int,
+        update_data: Dict[str, Any],
+        destinations: List[str]
+    ) -> Optional[Dict[str, Any]]:
+        sql, params = self.adapter._update_sql(self.table_name, update_data, {"id": post_id}, returning=True)
+        queries = [{"sql": sql, "params": params}]
+        queries.extend(outbox_d1.enqueue_query(destination, post_id=post_id) for destination in destinations)
         
-        # 返回新創建的貼文
-        return await self.get(new_id)
+        result = await self.adapter.execute_batch(queries)
+        self._forget(post_id)
+        if not result.get('success'):
+            raise Exception(f"Update failed: {result}")
+        rows = result['result'][0]['results']
+        return rows[0] if rows else None
     
     async def get_posts_by_school(
         self, 
@@ -48,6 +116,29 @@ class CRUDPostD1(CRUDBase[Dict[str, Any], PostCreate, PostUpdate]):
             order_by="created_at DESC"
         )
     
+    async def get_posts_by_school_page(
+        self, 
+        school_id: int, 
+        cursor: Optional[str] = None, 
+        limit: int = 100,
+        status: Optional[str] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """根據學校 ID 以游標分頁獲取貼文列表"""
+        # 公開動態使用，已軟刪除的記錄不列出
+        conditions = ["school_id = ?", "deleted_at IS NULL"]
+        params = [school_id]
+        if status:
+            conditions.append("status = ?")
+            params.append(status)
+        
+        return await self._paginate(
+            f"SELECT * FROM {self.table_name}",
+            conditions,
+            params,
+            cursor=cursor,
+            limit=limit
+        )
+    
     async def get_posts_by_author(
         self, 
         author_id: int, 
@@ -85,18 +176,20 @@ class CRUDPostD1(CRUDBase[Dict[str, Any], PostCreate, PostUpdate]):
         self, 
         post_id: int, 
         reviewer_id: int,
-        review_comment: Optional[str] = None
+        review_comment: Optional[str] = None,
+        destinations: Optional[List[str]] = None
     ) -> Optional[Dict[str, Any]]:
-        """審核通過貼文"""
+        """審核通過貼文，並在同一個批次中寫入各發布目的地的外送工作"""
         update_data = {
             "status": "approved",
             "reviewed_by": reviewer_id,
-            "reviewed_at": datetime.utcnow().isoformat()
+            "reviewed_at": datetime.utcnow().isoformat(),
+            "updated_at": datetime.utcnow().isoformat()
         }
         if review_comment:
             update_data["review_comment"] = review_comment
         
-        return await self.update(id=post_id, obj_in=update_data)
+        return await self._update_with_outbox(post_id, update_data, destinations or [])
     
     async def reject_post(
         self, 
@@ -114,35 +207,53 @@ class CRUDPostD1(CRUDBase[Dict[str, Any], PostCreate, PostUpdate]):
         
         return await self.update(id=post_id, obj_in=update_data)
     
-    async def increment_view_count(self, post_id: int) -> Optional[Dict[str, Any]]:
-        """增加瀏覽次數"""
-        sql = "UPDATE posts SET view_count = view_count + 1 WHERE id = ?"
-        await self.adapter.execute_query(sql, [post_id])
-        return await self.get(post_id)
+    async def increment_view_count(self, post_id: int) -> None:
+        """增加瀏覽次數（寫入緩衝區，由背景批次寫回資料庫）"""
+        view_count_buffer.add(post_id)
     
     async def increment_like_count(self, post_id: int) -> Optional[Dict[str, Any]]:
         """增加按讚次數"""
         sql = "UPDATE posts SET like_count = like_count + 1 WHERE id = ?"
-        await self.adapter.execute_query(sql, [post_id])
-        return await self.get(post_id)
+        return await self._update_returning_one(post_id, sql, [post_id])
     
     async def decrement_like_count(self, post_id: int) -> Optional[Dict[str, Any]]:
         """減少按讚次數"""
         sql = "UPDATE posts SET like_count = CASE WHEN like_count > 0 THEN like_count - 1 ELSE 0 END WHERE id = ?"
-        await self.adapter.execute_query(sql, [post_id])
-        return await self.get(post_id)
+        return await self._update_returning_one(post_id, sql, [post_id])
     
     async def increment_comment_count(self, post_id: int) -> Optional[Dict[str, Any]]:
         """增加評論次數"""
         sql = "UPDATE posts SET comment_count = comment_count + 1 WHERE id = ?"
-        await self.adapter.execute_query(sql, [post_id])
-        return await self.get(post_id)
+        return await self._update_returning_one(post_id, sql, [post_id])
     
     async def decrement_comment_count(self, post_id: int) -> Optional[Dict[str, Any]]:
         """減少評論次數"""
         sql = "UPDATE posts SET comment_count = CASE WHEN comment_count > 0 THEN comment_count - 1 ELSE 0 END WHERE id = ?"
-        await self.adapter.execute_query(sql, [post_id])
-        return await self.get(post_id)
+        return await self._update_returning_one(post_id, sql, [post_id])
+    
+    def _search_query(self, query: str, school_id: Optional[int] = None):
+        """
+        組合搜尋語句，返回 (SELECT, 條件, 參數, 排序鍵, 是否遞減)
+        三個字以上使用 FTS5 索引並依 BM25 排序，較短的查詢 trigram 無法比對，退回 LIKE
+        """
+        if len(query) >= MIN_FTS_QUERY_LENGTH:
+            select_sql = SEARCH_SELECT
+            conditions = ["posts_fts MATCH ?"]
+            # 以片語形式查詢，避免使用者輸入被當成 FTS 語法
+            params = ['"' + query.replace('"', '""') + '"']
+            order_keys, descending = SEARCH_RANK_KEYS, False
+        else:
+            select_sql = "SELECT posts.*, NULL AS snippet FROM posts"
+            conditions = ["(posts.title LIKE ? OR posts.content LIKE ?)"]
+            params = [f"%{query}%", f"%{query}%"]
+            order_keys, descending = SEARCH_RECENT_KEYS, True
+        
+        conditions.extend(["posts.status = 'approved'", "posts.deleted_at IS NULL"])
+        if school_id:
+            conditions.append("posts.school_id = ?")
+            params.append(school_id)
+        
+        return select_sql, conditions, params, order_keys, descending
     
     async def search_posts(
         self, 
@@ -151,24 +262,36 @@ class CRUDPostD1(CRUDBase[Dict[str, Any], PostCreate, PostUpdate]):
         skip: int = 0, 
         limit: int = 100
     ) -> List[Dict[str, Any]]:
-        """搜尋貼文（根據標題或內容）"""
-        sql = """
-        SELECT * FROM posts 
-        WHERE (title LIKE ? OR content LIKE ?) 
-        AND status = 'approved'
-        AND deleted_at IS NULL
-        """
-        params = [f"%{query}%", f"%{query}%"]
-        
-        if school_id:
-            sql += " AND school_id = ?"
-            params.append(school_id)
+        """搜尋貼文（根據標題或內容，依相關度排序並附上摘要）"""
+        select_sql, conditions, params, order_keys, descending = self._search_query(query, school_id)
         
-        sql += " ORDER BY created_at DESC LIMIT ? OFFSET ?"
+        direction = "DESC" if descending else "ASC"
+        sql = f"{select_sql} WHERE {' AND '.join(conditions)}"
+        sql += f" ORDER BY {', '.join(f'{expression} {direction}' for expression, _ in order_keys)} LIMIT ? OFFSET ?"
         params.extend([limit, skip])
         
         return await self.adapter.custom_query(sql, params)
     
+    async def search_posts_page(
+        self, 
+        query: str, 
+        school_id: Optional[int] = None,
+        cursor: Optional[str] = None, 
+        limit: int = 100
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """搜尋貼文（游標分頁）"""
+        select_sql, conditions, params, order_keys, descending = self._search_query(query, school_id)
+        
+        return await self._paginate(
+            select_sql,
+            conditions,
+            params,
+            cursor=cursor,
+            limit=limit,
+            order_keys=order_keys,
+            descending=descending
+        )
+    
     async def get_popular_posts(
         self, 
         school_id: Optional[int] = None,
@@ -176,25 +299,54 @@ class CRUDPostD1(CRUDBase[Dict[str, Any], PostCreate, PostUpdate]):
         limit: int = 100,
         days: int = 7
     ) -> List[Dict[str, Any]]:
-        """獲取熱門貼文（根據按讚數和評論數）"""
+        """獲取熱門貼文（依預先計算的熱度分數，沿索引掃描不需排序）"""
         sql = """
         SELECT * FROM posts 
         WHERE status = 'approved'
         AND deleted_at IS NULL
-        AND created_at >= datetime('now', '-{} days')
-        """.format(days)
+        AND +created_at >= datetime('now', ?)
+        """
         
-        params = []
+        params = [f"-{int(days)} days"]
         
         if school_id:
             sql += " AND school_id = ?"
             params.append(school_id)
         
-        sql += " ORDER BY (like_count + comment_count * 2) DESC, created_at DESC LIMIT ? OFFSET ?"
+        sql += " ORDER BY hot_score DESC, id DESC LIMIT ? OFFSET ?"
         params.extend([limit, skip])
         
         return await self.adapter.custom_query(sql, params)
     
+    async def get_popular_posts_page(
+        self, 
+        school_id: Optional[int] = None,
+        cursor: Optional[str] = None, 
+        limit: int = 100,
+        days: int = 7
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """獲取熱門貼文（游標分頁）"""
+        conditions = [
+            "status = 'approved'",
+            "deleted_at IS NULL",
+            # 一元加號讓查詢規劃器不改用 created_at 索引，維持沿 hot_score 索引掃描
+            "+created_at >= datetime('now', ?)"
+        ]
+        params = [f"-{int(days)} days"]
+        
+        if school_id:
+            conditions.append("school_id = ?")
+            params.append(school_id)
+        
+        return await self._paginate(
+            "SELECT * FROM posts",
+            conditions,
+            params,
+            cursor=cursor,
+            limit=limit,
+            order_keys=HOT_SCORE_KEYS
+        )
+    
     async def get_post_statistics(self, school_id: Optional[int] = None) -> Dict[str, int]:
         """獲取貼文統計資訊"""
         sql_base = "SELECT status, COUNT(*) as count FROM posts"
@@ -1,7 +1,7 @@
 """
 D1 資料庫版本的學校 CRUD 操作
 """
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Union
 from app.crud.d1_base import CRUDBase
 from app.schemas.school import SchoolCreate, SchoolUpdate
 from datetime import datetime
@@ -20,11 +20,46 @@ class CRUDSchoolD1(CRUDBase[Dict[str, Any], SchoolCreate, SchoolUpdate]):
             "created_at": datetime.utcnow().isoformat()
         })
         
-        # 插入記錄並獲取 ID
-        new_id = await self.adapter.insert(self.table_name, school_data)
-        
-        # 返回新創建的學校
-        return await self.get(new_id)
+        # 插入記錄並直接取回新學校
+        return await self.adapter.insert_returning(self.table_name, school_data)
+    
+    async def get_or_create_by_domain(self, domain: str, name: str) -> Optional[Dict[str, Any]]:
+        """
+        依域名取得學校，不存在時建立
+        以 ON CONFLICT DO NOTHING 交給唯一鍵處理並行建立，名稱與其他學校衝突時返回 None
+        """
+        school_data = {
+            "name": name,
+            "domain": domain,
+            "is_active": True,
+            "created_at": datetime.utcnow().isoformat()
+        }
+        columns = ", ".join(school_data.keys())
+        placeholders = ", ".join("?" for _ in school_data)
+        rows = await self.adapter.custom_query(
+            f"INSERT INTO schools ({columns}) VALUES ({placeholders}) ON CONFLICT DO NOTHING RETURNING *",
+            list(school_data.values())
+        )
+        if rows:
+            return rows[0]
+        return await self.get_by_domain(domain)
+    
+    async def update(self, id: Any, obj_in: Union[SchoolUpdate, Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """更新學校（域名可能變更，清除域名對應快取）"""
+        school = await super().update(id=id, obj_in=obj_in)
+        self._forget_domains()
+        return school
+    
+    async def remove(self, id: Any) -> Optional[Dict[str, Any]]:
+        """刪除學校並清除域名對應快取"""
+        school = await super().remove(id)
+        self._forget_domains()
+        return school
+    
+    def _forget_domains(self):
+        # 延遲匯入：school_mapper 依賴本模組
+        from app.core.school_mapper import school_domain_map
+        school_domain_map.clear()
     
     async def get_by_domain(self, domain: str) -> Optional[Dict[str, Any]]:
         """根據域名獲取學校"""
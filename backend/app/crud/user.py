@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import Any, Dict, Optional, Union
 from sqlalchemy.orm import Session
 from app.crud.base import CRUDBase
 from app.models.user import User, UserRole
@@ -62,4 +62,31 @@ class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
         db.refresh(user)
         return user
 
+    def update(
+        self,
+        db: Session,
+        *,
+        db_obj: User,
+        obj_in: Union[UserUpdate, Dict[str, Any]]
+    ) -> User:
+        """
+        更新用戶並清除認證快取
+        """
+        user = super().update(db, db_obj=db_obj, obj_in=obj_in)
+        self._forget_principal(db_obj.id)
+        return user
+    
+    def remove(self, db: Session, *, id: int) -> User:
+        """
+        刪除用戶並清除認證快取
+        """
+        user = super().remove(db, id=id)
+        self._forget_principal(id)
+        return user
+    
+    def _forget_principal(self, user_id: Any):
+        # 延遲匯入：避免 CRUD 模組載入 FastAPI 依賴
+        from app.dependencies.auth import invalidate_principal
+        invalidate_principal(user_id)
+
 user = CRUDUser(User)
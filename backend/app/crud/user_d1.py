@@ -1,7 +1,7 @@
 """
 D1 資料庫版本的用戶 CRUD 操作
 """
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple, Union
 from app.crud.d1_base import CRUDBase
 from app.schemas.user import UserCreate, UserUpdate
 from app.core.security import get_password_hash, verify_password
@@ -34,11 +34,8 @@ class CRUDUserD1(CRUDBase[Dict[str, Any], UserCreate, UserUpdate]):
             "created_at": datetime.utcnow().isoformat()
         })
         
-        # 插入記錄並獲取 ID
-        new_id = await self.adapter.insert(self.table_name, user_data)
-        
-        # 返回新創建的用戶
-        return await self.get(new_id)
+        # 插入記錄並直接取回新用戶
+        return await self.adapter.insert_returning(self.table_name, user_data)
     
     async def get_by_email(self, email: str) -> Optional[Dict[str, Any]]:
         """根據 email 獲取用戶"""
@@ -65,6 +62,23 @@ class CRUDUserD1(CRUDBase[Dict[str, Any], UserCreate, UserUpdate]):
         """檢查用戶是否為超級用戶"""
         return user.get("is_superuser", False)
     
+    async def update(self, id: Any, obj_in: Union[UserUpdate, Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """更新用戶，並清除認證快取（啟用狀態、角色、密碼都經由此處變更）"""
+        user = await super().update(id=id, obj_in=obj_in)
+        self._forget_principal(id)
+        return user
+    
+    async def remove(self, id: Any) -> Optional[Dict[str, Any]]:
+        """刪除用戶並清除認證快取"""
+        user = await super().remove(id)
+        self._forget_principal(id)
+        return user
+    
+    def _forget_principal(self, user_id: Any):
+        # 延遲匯入：避免 CRUD 模組載入 FastAPI 依賴
+        from app.dependencies.auth import invalidate_principal
+        invalidate_principal(user_id)
+    
     async def update_password(self, user_id: int, new_password: str) -> Optional[Dict[str, Any]]:
         """更新用戶密碼"""
         hashed_password = get_password_hash(new_password)
@@ -116,6 +130,19 @@ class CRUDUserD1(CRUDBase[Dict[str, Any], UserCreate, UserUpdate]):
             order_by="created_at DESC"
         )
     
+    async def get_users_by_school_page(
+        self, 
+        school_id: int, 
+        cursor: Optional[str] = None, 
+        limit: int = 100
+    ) -> Tuple[list[Dict[str, Any]], Optional[str]]:
+        """根據學校 ID 以游標分頁獲取用戶列表"""
+        return await self.get_page(
+            cursor=cursor,
+            limit=limit,
+            where={"school_id": school_id}
+        )
+    
     async def get_users_by_role(
         self, 
         role: str, 
@@ -141,7 +168,6 @@ class CRUDUserD1(CRUDBase[Dict[str, Any], UserCreate, UserUpdate]):
         sql = """
         SELECT * FROM users 
         WHERE (username LIKE ? OR full_name LIKE ?) 
-        AND deleted_at IS NULL
         ORDER BY created_at DESC 
         LIMIT ? OFFSET ?
         """
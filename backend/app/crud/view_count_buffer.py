@@ -0,0 +1,115 @@
+"""
+貼文瀏覽次數的寫回緩衝區
+在記憶體中累計各貼文的瀏覽次數，定期或達到門檻時以批次 UPDATE 寫入 D1
+"""
+import asyncio
+from typing import Dict, List, Any, Optional
+from app.core.config import settings
+from app.db.d1_adapter import D1Adapter, get_d1_adapter
+
+# 每筆貼文佔用 3 個綁定參數（CASE 兩個、IN 一個），D1 單一語句上限 100 個
+POSTS_PER_STATEMENT = 33
+
+class ViewCountBuffer:
+    """瀏覽次數寫回緩衝區"""
+
+    def __init__(
+        self,
+        flush_interval: Optional[float] = None,
+        flush_threshold: Optional[int] = None,
+        adapter: Optional[D1Adapter] = None
+    ):
+        self.flush_interval = flush_interval or settings.VIEW_COUNT_FLUSH_INTERVAL
+        self.flush_threshold = flush_threshold or settings.VIEW_COUNT_FLUSH_THRESHOLD
+        self._adapter = adapter
+        self._pending: Dict[int, int] = {}
+        self._lock = asyncio.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._periodic_task: Optional[asyncio.Task] = None
+
+    @property
+    def adapter(self) -> D1Adapter:
+        return self._adapter or get_d1_adapter()
+
+    @property
+    def pending(self) -> int:
+        """尚未寫入的貼文數量"""
+        return len(self._pending)
+
+    def add(self, post_id: int, count: int = 1):
+        """累計一次瀏覽，達到門檻時於背景寫入"""
+        self._pending[post_id] = self._pending.get(post_id, 0) + count
+
+        if len(self._pending) >= self.flush_threshold and (
+            self._flush_task is None or self._flush_task.done()
+        ):
+            self._flush_task = asyncio.get_running_loop().create_task(self.flush())
+
+    def _compile(self, counts: Dict[int, int]) -> List[Dict[str, Any]]:
+        """將累計次數編譯為 UPDATE ... CASE 語句"""
+        queries = []
+        items = list(counts.items())
+        for i in range(0, len(items), POSTS_PER_STATEMENT):
+            chunk = items[i:i + POSTS_PER_STATEMENT]
+            cases = ' '.join(['WHEN ? THEN ?' for _ in chunk])
+            placeholders = ', '.join(['?' for _ in chunk])
+            params = []
+            for post_id, count in chunk:
+                params.extend([post_id, count])
+            params.extend([post_id for post_id, _ in chunk])
+            queries.append({
+                "sql": f"UPDATE posts SET view_count = view_count + CASE id {cases} ELSE 0 END WHERE id IN ({placeholders})",
+                "params": params
+            })
+        return queries
+
+    async def flush(self) -> int:
+        """將緩衝區寫入資料庫，返回寫入的貼文數量"""
+        async with self._lock:
+            if not self._pending:
+                return 0
+
+            counts = self._pending
+            self._pending = {}
+
+            try:
+                result = await self.adapter.execute_batch(self._compile(counts))
+                if not result.get('success'):
+                    raise Exception(f"View count flush failed: {result}")
+            except Exception as e:
+                # 寫入失敗時放回緩衝區，下次再試
+                for post_id, count in counts.items():
+                    self._pending[post_id] = self._pending.get(post_id, 0) + count
+                print(f"瀏覽次數寫入失敗: {str(e)}")
+                return 0
+
+            return len(counts)
+
+    async def _run_periodic(self):
+        """定期寫入緩衝區"""
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def start(self):
+        """啟動定期寫入（應用程式啟動時呼叫）"""
+        if self._periodic_task is None or self._periodic_task.done():
+            self._periodic_task = asyncio.get_running_loop().create_task(self._run_periodic())
+
+    async def stop(self):
+        """停止定期寫入並寫入剩餘的瀏覽次數（應用程式關閉時呼叫）"""
+        if self._periodic_task is not None:
+            self._periodic_task.cancel()
+            try:
+                await self._periodic_task
+            except asyncio.CancelledError:
+                pass
+            self._periodic_task = None
+
+        if self._flush_task is not None and not self._flush_task.done():
+            await self._flush_task
+
+        await self.flush()
+
+# 創建全域實例
+view_count_buffer = ViewCountBuffer()
@@ -5,14 +5,80 @@ CloudFlare D1 Database Adapter
 import httpx
 import json
 import asyncio
-from typing import List, Dict, Any, Optional, Union
+import importlib.util
+import time
+from functools import lru_cache
+from typing import List, Dict, Any, Optional, Tuple, Union
 from datetime import datetime
 from app.core.config import settings
+from app.core.metrics import metrics
+from app.db.d1_query_log import record_round_trip
+
+# HTTP/2 需要額外安裝 h2（httpx[http2]），未安裝時退回 HTTP/1.1
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+# SQL 模板快取容量
+SQL_CACHE_SIZE = 512
+
+@lru_cache(maxsize=SQL_CACHE_SIZE)
+def build_sql(
+    operation: str,
+    table: str,
+    columns: Tuple[str, ...] = (),
+    where_keys: Tuple[str, ...] = (),
+    order_by: Optional[str] = None,
+    has_limit: bool = False,
+    returning: bool = False
+) -> str:
+    """
+    依語句形狀產生 SQL 模板（LRU 快取）
+    LIMIT / OFFSET 一律以參數綁定，使相同形狀的查詢共用同一份 SQL
+    UPDATE / DELETE 必須有條件，避免空的 where 改寫或刪除整個資料表
+    """
+    if operation in ("update", "delete") and not where_keys:
+        raise ValueError(f"Refusing to {operation} {table} without a WHERE condition")
+    
+    where = f" WHERE {' AND '.join(f'{key} = ?' for key in where_keys)}" if where_keys else ""
+    
+    if operation == "select":
+        sql = f"SELECT * FROM {table}{where}"
+        if order_by:
+            sql += f" ORDER BY {order_by}"
+        if has_limit:
+            sql += " LIMIT ? OFFSET ?"
+    elif operation == "count":
+        sql = f"SELECT COUNT(*) as count FROM {table}{where}"
+    elif operation == "insert":
+        placeholders = ', '.join('?' for _ in columns)
+        sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})"
+    elif operation == "update":
+        sql = f"UPDATE {table} SET {', '.join(f'{col} = ?' for col in columns)}{where}"
+    elif operation == "delete":
+        sql = f"DELETE FROM {table}{where}"
+    else:
+        raise ValueError(f"Unknown SQL operation: {operation}")
+    
+    if returning:
+        sql += " RETURNING *"
+    return sql
 
 class D1Adapter:
     """CloudFlare D1 資料庫適配器"""
     
-    def __init__(self, account_id: str, database_id: str, api_token: str):
+    def __init__(
+        self,
+        account_id: str,
+        database_id: str,
+        api_token: str,
+        *,
+        max_connections: Optional[int] = None,
+        max_keepalive_connections: Optional[int] = None,
+        keepalive_expiry: Optional[float] = None,
+        connect_timeout: Optional[float] = None,
+        timeout: Optional[float] = None,
+        http2: Optional[bool] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None
+    ):
         self.account_id = account_id
         self.database_id = database_id
         self.api_token = api_token
@@ -21,48 +87,116 @@ class D1Adapter:
             "Authorization": f"Bearer {api_token}",
             "Content-Type": "application/json"
         }
+        
+        # 連線池設定，未指定時使用全域設定
+        self.limits = httpx.Limits(
+            max_connections=max_connections or settings.D1_POOL_MAX_CONNECTIONS,
+            max_keepalive_connections=max_keepalive_connections or settings.D1_POOL_MAX_KEEPALIVE,
+            keepalive_expiry=keepalive_expiry if keepalive_expiry is not None else settings.D1_POOL_KEEPALIVE_EXPIRY
+        )
+        self.timeout = httpx.Timeout(
+            timeout if timeout is not None else settings.D1_REQUEST_TIMEOUT,
+            connect=connect_timeout if connect_timeout is not None else settings.D1_CONNECT_TIMEOUT
+        )
+        self.http2 = (settings.D1_HTTP2 if http2 is None else http2) and HTTP2_AVAILABLE
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        # 進行中的 D1 請求數，用於計算連線池飽和度
+        self.in_flight = 0
     
-    async def execute_query(self, sql: str, params: Optional[List[Any]] = None) -> Dict[str, Any]:
-        """執行 SQL 查詢"""
-        async with httpx.AsyncClient() as client:
-            payload = {
-                "sql": sql
-            }
-            if params:
-                payload["params"] = params
-            
-            response = await client.post(
-                f"{self.base_url}/query",
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """取得共用的 HTTP 連線（首次使用時建立）"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
                 headers=self.headers,
-                json=payload
+                limits=self.limits,
+                timeout=self.timeout,
+                http2=self.http2,
+                transport=self._transport
             )
-            
-            if response.status_code != 200:
-                raise Exception(f"D1 Query failed: {response.text}")
-            
-            return response.json()
+        return self._client
+    
+    async def startup(self):
+        """應用程式啟動時預先建立連線池"""
+        _ = self.client
+    
+    async def aclose(self):
+        """關閉連線池（應用程式關閉時呼叫）"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+    
+    def pool_status(self) -> Dict[str, Any]:
+        """連線池使用狀況（進行中的請求數 / 最大連線數）"""
+        max_connections = self.limits.max_connections or 0
+        return {
+            "in_flight": self.in_flight,
+            "max_connections": max_connections,
+            "saturation": round(self.in_flight / max_connections, 3) if max_connections else 0.0
+        }
+    
+    async def _post(self, payload: Any) -> httpx.Response:
+        """送出 D1 查詢請求並追蹤進行中的請求數"""
+        self.in_flight += 1
+        try:
+            return await self.client.post("/query", json=payload)
+        finally:
+            self.in_flight -= 1
+    
+    async def execute_query(self, sql: str, params: Optional[List[Any]] = None) -> Dict[str, Any]:
+        """執行 SQL 查詢"""
+        payload = {
+            "sql": sql
+        }
+        if params:
+            payload["params"] = params
+        
+        started = time.perf_counter()
+        response = await self._post(payload)
+        network_ms = (time.perf_counter() - started) * 1000
+        
+        if response.status_code != 200:
+            raise Exception(f"D1 Query failed: {response.text}")
+        
+        result = response.json()
+        record_round_trip([sql], result, network_ms, len(response.request.content))
+        return result
     
     async def execute_batch(self, queries: List[Dict[str, Any]]) -> Dict[str, Any]:
         """批次執行多個 SQL 查詢"""
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{self.base_url}/query",
-                headers=self.headers,
-                json=queries
-            )
-            
-            if response.status_code != 200:
-                raise Exception(f"D1 Batch query failed: {response.text}")
-            
-            return response.json()
+        started = time.perf_counter()
+        response = await self._post(queries)
+        network_ms = (time.perf_counter() - started) * 1000
+        
+        if response.status_code != 200:
+            raise Exception(f"D1 Batch query failed: {response.text}")
+        
+        result = response.json()
+        record_round_trip([query["sql"] for query in queries], result, network_ms, len(response.request.content))
+        return result
+    
+    def _insert_sql(self, table: str, data: Dict[str, Any], returning: bool = False):
+        """組合 INSERT 語句與參數"""
+        columns = tuple(data.keys())
+        return build_sql("insert", table, columns, returning=returning), list(data.values())
+    
+    def _update_sql(self, table: str, data: Dict[str, Any], where: Dict[str, Any], returning: bool = False):
+        """組合 UPDATE 語句與參數"""
+        where = where or {}
+        sql = build_sql("update", table, tuple(data.keys()), tuple(where.keys()), returning=returning)
+        return sql, [*data.values(), *where.values()]
+    
+    def _delete_sql(self, table: str, where: Dict[str, Any], returning: bool = False):
+        """組合 DELETE 語句與參數"""
+        where = where or {}
+        sql = build_sql("delete", table, where_keys=tuple(where.keys()), returning=returning)
+        return sql, list(where.values())
     
     async def insert(self, table: str, data: Dict[str, Any]) -> int:
         """插入資料並返回新增記錄的 ID"""
-        columns = list(data.keys())
-        placeholders = ['?' for _ in columns]
-        values = [data[col] for col in columns]
-        
-        sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(placeholders)})"
+        sql, values = self._insert_sql(table, data)
         
         result = await self.execute_query(sql, values)
         
@@ -72,27 +206,32 @@ class D1Adapter:
         else:
             raise Exception(f"Insert failed: {result}")
     
+    async def insert_returning(self, table: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        """插入資料並以 RETURNING 直接返回新增的記錄"""
+        sql, values = self._insert_sql(table, data, returning=True)
+        
+        result = await self.execute_query(sql, values)
+        
+        if result['success'] and result['result'] and result['result'][0]['results']:
+            return result['result'][0]['results'][0]
+        else:
+            raise Exception(f"Insert failed: {result}")
+    
     async def select(self, table: str, where: Optional[Dict[str, Any]] = None, 
                     limit: Optional[int] = None, offset: Optional[int] = None,
                     order_by: Optional[str] = None) -> List[Dict[str, Any]]:
         """查詢資料"""
-        sql = f"SELECT * FROM {table}"
-        params = []
-        
-        if where:
-            conditions = []
-            for key, value in where.items():
-                conditions.append(f"{key} = ?")
-                params.append(value)
-            sql += f" WHERE {' AND '.join(conditions)}"
-        
-        if order_by:
-            sql += f" ORDER BY {order_by}"
-        
+        params = list(where.values()) if where else []
         if limit:
-            sql += f" LIMIT {limit}"
-            if offset:
-                sql += f" OFFSET {offset}"
+            params.extend([limit, offset or 0])
+        
+        sql = build_sql(
+            "select",
+            table,
+            where_keys=tuple(where.keys()) if where else (),
+            order_by=order_by,
+            has_limit=bool(limit)
+        )
         
         result = await self.execute_query(sql, params)
         
@@ -101,44 +240,60 @@ class D1Adapter:
         else:
             raise Exception(f"Select failed: {result}")
     
+    async def count(self, table: str, where: Optional[Dict[str, Any]] = None) -> int:
+        """計算記錄數量"""
+        sql = build_sql("count", table, where_keys=tuple(where.keys()) if where else ())
+        
+        result = await self.execute_query(sql, list(where.values()) if where else [])
+        
+        if result['success'] and result['result'][0]['results']:
+            return result['result'][0]['results'][0]['count']
+        elif result['success']:
+            return 0
+        else:
+            raise Exception(f"Count failed: {result}")
+    
     async def update(self, table: str, data: Dict[str, Any], where: Dict[str, Any]) -> int:
         """更新資料"""
-        set_clauses = []
-        params = []
-        
-        for key, value in data.items():
-            set_clauses.append(f"{key} = ?")
-            params.append(value)
+        sql, params = self._update_sql(table, data, where)
         
-        conditions = []
-        for key, value in where.items():
-            conditions.append(f"{key} = ?")
-            params.append(value)
+        result = await self.execute_query(sql, params)
         
-        sql = f"UPDATE {table} SET {', '.join(set_clauses)} WHERE {' AND '.join(conditions)}"
+        if result['success']:
+            return result['result'][0]['meta']['changes']
+        else:
+            raise Exception(f"Update failed: {result}")
+    
+    async def update_returning(self, table: str, data: Dict[str, Any], where: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """更新資料並以 RETURNING 返回更新後的記錄"""
+        sql, params = self._update_sql(table, data, where, returning=True)
         
         result = await self.execute_query(sql, params)
         
         if result['success']:
-            return result['result'][0]['meta']['changes']
+            return result['result'][0]['results']
         else:
             raise Exception(f"Update failed: {result}")
     
     async def delete(self, table: str, where: Dict[str, Any]) -> int:
         """刪除資料"""
-        conditions = []
-        params = []
+        sql, params = self._delete_sql(table, where)
         
-        for key, value in where.items():
-            conditions.append(f"{key} = ?")
-            params.append(value)
+        result = await self.execute_query(sql, params)
         
-        sql = f"DELETE FROM {table} WHERE {' AND '.join(conditions)}"
+        if result['success']:
+            return result['result'][0]['meta']['changes']
+        else:
+            raise Exception(f"Delete failed: {result}")
+    
+    async def delete_returning(self, table: str, where: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """刪除資料並以 RETURNING 返回被刪除的記錄"""
+        sql, params = self._delete_sql(table, where, returning=True)
         
         result = await self.execute_query(sql, params)
         
         if result['success']:
-            return result['result'][0]['meta']['changes']
+            return result['result'][0]['results']
         else:
             raise Exception(f"Delete failed: {result}")
     
@@ -167,13 +322,26 @@ class D1Session:
         self._pending_operations.append(('delete', instance))
     
     async def commit(self):
-        """提交所有待處理的操作"""
-        # 這裡實現批次操作
+        """提交所有待處理的操作（合併為單一批次請求）"""
+        if not self._pending_operations:
+            return
+        
+        # 先編譯所有語句，任何實例不合法時不送出請求
+        queries = []
         for operation, instance in self._pending_operations:
             if operation == 'add':
-                await self._insert_instance(instance)
+                queries.append(self._compile_insert(instance))
             elif operation == 'delete':
-                await self._delete_instance(instance)
+                queries.append(self._compile_delete(instance))
+        
+        result = await self.adapter.execute_batch(queries)
+        if not result.get('success'):
+            raise Exception(f"Commit failed: {result}")
+        
+        # 將產生的 ID 依序對應回新增的實例
+        for (operation, instance), statement_result in zip(self._pending_operations, result['result']):
+            if operation == 'add':
+                setattr(instance, 'id', statement_result['meta']['last_row_id'])
         
         self._pending_operations.clear()
     
@@ -185,8 +353,8 @@ class D1Session:
         """關閉會話"""
         self._pending_operations.clear()
     
-    async def _insert_instance(self, instance):
-        """插入實例到資料庫"""
+    def _compile_insert(self, instance) -> Dict[str, Any]:
+        """將實例編譯為 INSERT 語句"""
         table_name = getattr(instance, '__tablename__', None)
         if not table_name:
             raise ValueError("Instance must have __tablename__ attribute")
@@ -197,11 +365,11 @@ class D1Session:
             if value is not None:
                 data[column.name] = value
         
-        result_id = await self.adapter.insert(table_name, data)
-        setattr(instance, 'id', result_id)
+        sql, params = self.adapter._insert_sql(table_name, data)
+        return {"sql": sql, "params": params}
     
-    async def _delete_instance(self, instance):
-        """從資料庫刪除實例"""
+    def _compile_delete(self, instance) -> Dict[str, Any]:
+        """將實例編譯為 DELETE 語句"""
         table_name = getattr(instance, '__tablename__', None)
         if not table_name:
             raise ValueError("Instance must have __tablename__ attribute")
@@ -210,20 +378,30 @@ class D1Session:
         if id_value is None:
             raise ValueError("Instance must have an id to be deleted")
         
-        await self.adapter.delete(table_name, {'id': id_value})
+        sql, params = self.adapter._delete_sql(table_name, {'id': id_value})
+        return {"sql": sql, "params": params}
+
+metrics.register_cache("d1_sql_template", build_sql.cache_info)
 
 # 全域 D1 適配器實例
 d1_adapter = None
 
 def get_d1_adapter() -> D1Adapter:
-    """獲取 D1 適配器實例"""
+    """獲取 D1 適配器實例（依 D1_BACKEND 設定選擇實作）"""
     global d1_adapter
     if d1_adapter is None:
-        d1_adapter = D1Adapter(
-            account_id=settings.CLOUDFLARE_ACCOUNT_ID,
-            database_id=settings.CLOUDFLARE_D1_DATABASE_ID,
-            api_token=settings.CLOUDFLARE_API_TOKEN
-        )
+        if settings.D1_BACKEND == "sqlite":
+            from app.db.sqlite_adapter import SQLiteD1Adapter
+            d1_adapter = SQLiteD1Adapter(
+                database_path=settings.SQLITE_D1_PATH,
+                schema_path=settings.SQLITE_D1_SCHEMA_PATH or None
+            )
+        else:
+            d1_adapter = D1Adapter(
+                account_id=settings.CLOUDFLARE_ACCOUNT_ID,
+                database_id=settings.CLOUDFLARE_D1_DATABASE_ID,
+                api_token=settings.CLOUDFLARE_API_TOKEN
+            )
     return d1_adapter
 
 async def get_d1_session():
@@ -0,0 +1,74 @@
+"""
+D1 健康探測
+以 SELECT 1 量測 D1 往返延遲，結果快取 HEALTH_CHECK_TTL 秒，避免負載平衡器的探測直接打到 D1
+"""
+import asyncio
+import time
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+from app.db.d1_adapter import D1Adapter, get_d1_adapter
+
+class D1HealthProbe:
+    """快取的 D1 延遲探測：同一時間只會有一個探測查詢在執行"""
+
+    def __init__(
+        self,
+        adapter: Optional[D1Adapter] = None,
+        ttl: Optional[float] = None,
+        timeout: Optional[float] = None
+    ):
+        self._adapter = adapter
+        self.ttl = ttl if ttl is not None else settings.HEALTH_CHECK_TTL
+        self.timeout = timeout if timeout is not None else settings.HEALTH_CHECK_TIMEOUT
+        self._result: Optional[Dict[str, Any]] = None
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+    @property
+    def adapter(self) -> D1Adapter:
+        return self._adapter or get_d1_adapter()
+
+    def _fresh(self) -> bool:
+        return self._result is not None and time.monotonic() - self._checked_at < self.ttl
+
+    async def _probe(self) -> Dict[str, Any]:
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(self.adapter.execute_query("SELECT 1"), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            return {
+                "ok": False,
+                "latency_ms": round((time.perf_counter() - started) * 1000, 3),
+                "error": f"timeout after {self.timeout}s"
+            }
+        except Exception as e:
+            print(f"D1 健康探測失敗: {e}")
+            return {
+                "ok": False,
+                "latency_ms": round((time.perf_counter() - started) * 1000, 3),
+                "error": str(e)
+            }
+
+        latency_ms = (time.perf_counter() - started) * 1000
+        return {
+            "ok": latency_ms <= settings.HEALTH_MAX_D1_LATENCY_MS,
+            "latency_ms": round(latency_ms, 3),
+            "error": None
+        }
+
+    async def check(self) -> Dict[str, Any]:
+        """返回最近一次的探測結果，過期時重新探測"""
+        if not self._fresh():
+            async with self._lock:
+                # 等待鎖期間可能已由其他請求完成探測
+                if not self._fresh():
+                    self._result = await self._probe()
+                    self._checked_at = time.monotonic()
+        return {**self._result, "age_s": round(time.monotonic() - self._checked_at, 3)}
+
+    def invalidate(self):
+        self._result = None
+
+# 創建全域實例
+d1_health_probe = D1HealthProbe()
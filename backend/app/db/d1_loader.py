@@ -0,0 +1,100 @@
+"""
+D1 批次載入器（DataLoader）
+將同一個事件迴圈週期內的多個 get(id) 合併為 WHERE id IN (...) 查詢
+"""
+import asyncio
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.db.d1_adapter import D1Adapter
+
+# D1 單一語句最多綁定 100 個參數
+MAX_IDS_PER_QUERY = 100
+
+_current_loader: ContextVar[Optional["D1Loader"]] = ContextVar("d1_loader", default=None)
+
+class D1Loader:
+    """以請求為範圍的主鍵批次載入器"""
+
+    def __init__(self, adapter: D1Adapter):
+        self.adapter = adapter
+        self._cache: Dict[Tuple[str, Any], asyncio.Future] = {}
+        self._queue: Dict[str, Dict[Any, asyncio.Future]] = {}
+        self._dispatch_scheduled = False
+
+    def load(self, table: str, id: Any) -> asyncio.Future:
+        """排入一筆主鍵查詢，相同的 (table, id) 只查詢一次"""
+        key = (table, id)
+        future = self._cache.get(key)
+        if future is not None:
+            return future
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._cache[key] = future
+        self._queue.setdefault(table, {})[id] = future
+
+        # 等到目前這一輪排程的協程都排入後再一起送出
+        if not self._dispatch_scheduled:
+            self._dispatch_scheduled = True
+            loop.call_soon(lambda: asyncio.ensure_future(self._dispatch()))
+
+        return future
+
+    def forget(self, table: str, id: Any):
+        """寫入後清除快取，下次讀取會重新查詢"""
+        self._cache.pop((table, id), None)
+
+    async def _dispatch(self):
+        """將佇列中的主鍵依資料表合併為批次查詢"""
+        queue = self._queue
+        self._queue = {}
+        self._dispatch_scheduled = False
+
+        queries = []
+        pending: List[Dict[Any, asyncio.Future]] = []
+        for table, futures in queue.items():
+            ids = list(futures.keys())
+            for i in range(0, len(ids), MAX_IDS_PER_QUERY):
+                chunk = ids[i:i + MAX_IDS_PER_QUERY]
+                placeholders = ', '.join(['?' for _ in chunk])
+                queries.append({
+                    "sql": f"SELECT * FROM {table} WHERE id IN ({placeholders})",
+                    "params": chunk
+                })
+                pending.append({id: futures[id] for id in chunk})
+
+        try:
+            result = await self.adapter.execute_batch(queries)
+            if not result.get('success'):
+                raise Exception(f"Batch select failed: {result}")
+        except Exception as e:
+            for futures in pending:
+                for key, future in futures.items():
+                    if not future.done():
+                        future.set_exception(e)
+            # 失敗的結果不保留，避免同一請求內重試仍拿到錯誤
+            for table, futures in queue.items():
+                for id in futures:
+                    self._cache.pop((table, id), None)
+            return
+
+        for futures, statement_result in zip(pending, result['result']):
+            rows = {row['id']: row for row in statement_result['results']}
+            for id, future in futures.items():
+                if not future.done():
+                    future.set_result(rows.get(id))
+
+def get_d1_loader() -> Optional[D1Loader]:
+    """取得目前請求的批次載入器（不在請求範圍內時為 None）"""
+    return _current_loader.get()
+
+@contextmanager
+def d1_loader_scope(adapter: D1Adapter):
+    """建立一個批次載入器範圍（每個 API 請求一個）"""
+    token = _current_loader.set(D1Loader(adapter))
+    try:
+        yield
+    finally:
+        _current_loader.reset(token)
@@ -0,0 +1,62 @@
+"""
+D1 資料庫遷移
+依檔名順序套用 workers/api-d1/migrations/*.sql，並以 wrangler 相同的 d1_migrations 表記錄已套用的檔案
+"""
+import sqlite3
+from pathlib import Path
+from typing import List, Optional, Set, Tuple
+
+from app.db.d1_adapter import D1Adapter
+
+MIGRATIONS_PATH = Path(__file__).resolve().parents[3] / "workers" / "api-d1" / "migrations"
+
+# 與 wrangler d1 migrations 使用的記錄表相同，兩種工具可交替使用
+MIGRATIONS_TABLE_SQL = (
+    "CREATE TABLE IF NOT EXISTS d1_migrations ("
+    "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+    "name TEXT UNIQUE, "
+    "applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP)"
+)
+
+def split_sql_statements(sql: str) -> List[str]:
+    """將 SQL 腳本拆成完整語句（保留 CREATE TRIGGER ... BEGIN ... END 內的分號）"""
+    statements = []
+    buffer = ""
+    for line in sql.splitlines(keepends=True):
+        buffer += line
+        if sqlite3.complete_statement(buffer):
+            statement = buffer.strip().rstrip(';').strip()
+            if statement:
+                statements.append(statement)
+            buffer = ""
+    if buffer.strip():
+        statements.append(buffer.strip())
+    return statements
+
+def pending_migrations(applied: Set[str], migrations_path: Optional[Path] = None) -> List[Tuple[str, List[str]]]:
+    """返回尚未套用的遷移 [(檔名, 語句列表)]，依檔名排序"""
+    path = migrations_path or MIGRATIONS_PATH
+    if not path.exists():
+        return []
+
+    migrations = []
+    for file in sorted(path.glob("*.sql")):
+        if file.name not in applied:
+            migrations.append((file.name, split_sql_statements(file.read_text(encoding="utf-8"))))
+    return migrations
+
+async def apply_migrations(adapter: D1Adapter, migrations_path: Optional[Path] = None) -> List[str]:
+    """套用尚未執行的遷移，每個檔案與其記錄在同一個批次（交易）中完成，返回套用的檔名"""
+    await adapter.execute_query(MIGRATIONS_TABLE_SQL)
+    rows = await adapter.custom_query("SELECT name FROM d1_migrations")
+    applied = {row["name"] for row in rows}
+
+    names = []
+    for name, statements in pending_migrations(applied, migrations_path):
+        queries = [{"sql": sql, "params": []} for sql in statements]
+        queries.append({"sql": "INSERT INTO d1_migrations (name) VALUES (?)", "params": [name]})
+        result = await adapter.execute_batch(queries)
+        if not result.get('success'):
+            raise Exception(f"Migration {name} failed: {result}")
+        names.append(name)
+    return names
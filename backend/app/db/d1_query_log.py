@@ -0,0 +1,229 @@
+"""
+D1 查詢記錄
+在 D1Adapter 每次往返時記錄 SQL 指紋、筆數、D1 執行時間、網路時間與傳輸量，
+提供請求範圍的統計（Server-Timing）、慢查詢記錄與依指紋彙總的直方圖
+"""
+import re
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Deque, Dict, List, Optional
+
+from app.core.config import settings
+from app.core.metrics import (
+    d1_execution_seconds_total,
+    d1_round_trip_duration_seconds,
+    d1_round_trips_total,
+    d1_statements_total,
+    metrics
+)
+
+# 直方圖區間上限（毫秒），最後一格為 +Inf
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST = re.compile(r"\?(?:\s*,\s*\?)+")
+_VALUES_LIST = re.compile(r"\(\.\.\.\)(?:\s*,\s*\(\.\.\.\))+")
+_WHITESPACE = re.compile(r"\s+")
+
+@lru_cache(maxsize=1024)
+def fingerprint(sql: str) -> str:
+    """將 SQL 正規化為指紋：去除常數並合併 IN (...) 與多列 VALUES，使相同形狀的查詢歸為一類"""
+    normalized = _WHITESPACE.sub(" ", sql).strip()
+    normalized = _STRING_LITERAL.sub("?", normalized)
+    normalized = _NUMBER_LITERAL.sub("?", normalized)
+    normalized = _PLACEHOLDER_LIST.sub("...", normalized)
+    normalized = _VALUES_LIST.sub("(...)", normalized)
+    return normalized
+
+@dataclass
+class QueryRecord:
+    """單一語句的執行記錄"""
+    fingerprint: str
+    rows: int
+    d1_ms: float
+    network_ms: float
+    payload_bytes: int
+    batch_size: int = 1
+
+@dataclass
+class RequestQueryLog:
+    """單一 API 請求內的 D1 查詢記錄"""
+    records: List[QueryRecord] = field(default_factory=list)
+    round_trips: int = 0
+    network_ms: float = 0.0
+
+    @property
+    def d1_ms(self) -> float:
+        return sum(record.d1_ms for record in self.records)
+
+    def fingerprint_counts(self) -> Counter:
+        return Counter(record.fingerprint for record in self.records)
+
+    def server_timing(self) -> str:
+        """組成 Server-Timing 標頭：網路等待時間與 D1 執行時間"""
+        return (
+            f'd1;dur={self.network_ms:.1f};desc="{len(self.records)} queries / {self.round_trips} round trips", '
+            f'd1-exec;dur={self.d1_ms:.1f}'
+        )
+
+class FingerprintStats:
+    """單一指紋的彙總統計"""
+
+    def __init__(self):
+        self.count = 0
+        self.rows = 0
+        self.d1_ms = 0.0
+        self.network_ms = 0.0
+        self.max_network_ms = 0.0
+        self.payload_bytes = 0
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.max_per_request = 0
+        self.routes: Counter = Counter()
+
+    def observe(self, record: QueryRecord):
+        self.count += 1
+        self.rows += record.rows
+        self.d1_ms += record.d1_ms
+        self.network_ms += record.network_ms
+        self.max_network_ms = max(self.max_network_ms, record.network_ms)
+        self.payload_bytes += record.payload_bytes
+        for i, bound in enumerate(LATENCY_BUCKETS_MS):
+            if record.network_ms <= bound:
+                self.buckets[i] += 1
+                break
+        else:
+            self.buckets[-1] += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "rows": self.rows,
+            "avg_d1_ms": round(self.d1_ms / self.count, 3) if self.count else 0,
+            "avg_network_ms": round(self.network_ms / self.count, 3) if self.count else 0,
+            "max_network_ms": round(self.max_network_ms, 3),
+            "payload_bytes": self.payload_bytes,
+            "histogram_ms": {
+                **{str(bound): count for bound, count in zip(LATENCY_BUCKETS_MS, self.buckets)},
+                "+Inf": self.buckets[-1]
+            },
+            "max_per_request": self.max_per_request,
+            "routes": dict(self.routes.most_common(5))
+        }
+
+class D1QueryStats:
+    """全域的 D1 查詢統計（依指紋彙總）與慢查詢記錄"""
+
+    def __init__(self, slow_query_ms: Optional[float] = None, slow_log_size: Optional[int] = None):
+        self.slow_query_ms = slow_query_ms if slow_query_ms is not None else settings.D1_SLOW_QUERY_MS
+        self.fingerprints: Dict[str, FingerprintStats] = {}
+        self.slow_queries: Deque[Dict[str, Any]] = deque(maxlen=slow_log_size or settings.D1_SLOW_QUERY_LOG_SIZE)
+        self.started_at = time.time()
+
+    def observe(self, record: QueryRecord):
+        stats = self.fingerprints.get(record.fingerprint)
+        if stats is None:
+            stats = self.fingerprints[record.fingerprint] = FingerprintStats()
+        stats.observe(record)
+
+        if record.network_ms >= self.slow_query_ms:
+            print(f"D1 慢查詢 ({record.network_ms:.1f}ms, D1 {record.d1_ms:.1f}ms, {record.rows} 筆): {record.fingerprint}")
+            self.slow_queries.append({
+                "fingerprint": record.fingerprint,
+                "network_ms": round(record.network_ms, 3),
+                "d1_ms": round(record.d1_ms, 3),
+                "rows": record.rows,
+                "batch_size": record.batch_size,
+                "at": time.time()
+            })
+
+    def observe_request(self, route: str, log: RequestQueryLog):
+        """請求結束時記錄各指紋在單一請求內的次數，用來找出 N+1 查詢"""
+        for query_fingerprint, count in log.fingerprint_counts().items():
+            stats = self.fingerprints.get(query_fingerprint)
+            if stats is None:
+                continue
+            stats.max_per_request = max(stats.max_per_request, count)
+            stats.routes[route] += count
+            if count >= settings.D1_N_PLUS_ONE_THRESHOLD:
+                print(f"D1 可能的 N+1 查詢：{route} 單次請求執行 {count} 次 {query_fingerprint}")
+
+    def snapshot(self) -> Dict[str, Any]:
+        """依總網路時間排序的統計資料"""
+        fingerprints = sorted(
+            self.fingerprints.items(),
+            key=lambda item: item[1].network_ms,
+            reverse=True
+        )
+        return {
+            "since": self.started_at,
+            "slow_query_ms": self.slow_query_ms,
+            "fingerprints": [
+                {"fingerprint": query_fingerprint, **stats.to_dict()}
+                for query_fingerprint, stats in fingerprints
+            ],
+            "slow_queries": list(self.slow_queries)
+        }
+
+    def reset(self):
+        self.fingerprints.clear()
+        self.slow_queries.clear()
+        self.started_at = time.time()
+
+_current_log: ContextVar[Optional[RequestQueryLog]] = ContextVar("d1_query_log", default=None)
+
+def get_query_log() -> Optional[RequestQueryLog]:
+    """取得目前請求的查詢記錄（不在請求範圍內時為 None）"""
+    return _current_log.get()
+
+@contextmanager
+def d1_query_log_scope():
+    """建立一個請求範圍的查詢記錄"""
+    log = RequestQueryLog()
+    token = _current_log.set(log)
+    try:
+        yield log
+    finally:
+        _current_log.reset(token)
+
+def record_round_trip(
+    statements: List[str],
+    result: Optional[Dict[str, Any]],
+    network_ms: float,
+    payload_bytes: int = 0
+):
+    """記錄一次 D1 往返（單一查詢或批次）中的每個語句"""
+    results = (result or {}).get("result") or []
+    log = get_query_log()
+    if log is not None:
+        log.round_trips += 1
+        log.network_ms += network_ms
+
+    kind = "batch" if len(statements) > 1 else "query"
+    d1_round_trips_total.inc(kind=kind)
+    d1_round_trip_duration_seconds.observe(network_ms / 1000, kind=kind)
+    d1_statements_total.inc(len(statements))
+
+    for i, sql in enumerate(statements):
+        statement_result = results[i] if i < len(results) else {}
+        meta = statement_result.get("meta") or {}
+        record = QueryRecord(
+            fingerprint=fingerprint(sql),
+            rows=len(statement_result.get("results") or []),
+            d1_ms=float(meta.get("duration") or 0),
+            network_ms=network_ms,
+            payload_bytes=payload_bytes,
+            batch_size=len(statements)
+        )
+        d1_execution_seconds_total.inc(record.d1_ms / 1000)
+        query_stats.observe(record)
+        if log is not None:
+            log.records.append(record)
+
+# 創建全域實例
+query_stats = D1QueryStats()
+metrics.register_cache("d1_sql_fingerprint", fingerprint.cache_info)
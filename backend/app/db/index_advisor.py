@@ -0,0 +1,318 @@
+"""
+D1 索引建議工具
+以本機 SQLite 重播各 *_d1 CRUD 模組實際送出的查詢，透過 EXPLAIN QUERY PLAN 找出全表掃描與暫存 B-tree 排序，
+並產生能消除問題的複合／部分索引
+"""
+import inspect
+import re
+import sqlite3
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app.db.sqlite_adapter import SQLiteD1Adapter
+
+# 重播查詢時各參數名稱使用的範例值
+SAMPLE_VALUES: Dict[str, Any] = {
+    "status": "approved",
+    "query": "forumkit",
+    "domain": "example.edu.tw",
+    "email": "user@example.edu.tw",
+    "email_hash": "0" * 64,
+    "name": "ForumKit",
+    "role": "user",
+    "password": "password",
+}
+
+# 只分析讀取方法，寫入語句都以主鍵定位
+READ_METHOD_PREFIXES = ("get_", "search_")
+
+# 各資料表的 INTEGER PRIMARY KEY，即 rowid，所有索引都已隱含在最後一欄
+ROWID_COLUMN = "id"
+
+TABLE_PATTERN = re.compile(r"\bFROM\s+(\w+)", re.IGNORECASE)
+WHERE_PATTERN = re.compile(r"\bWHERE\s+(.*?)(?:\s+GROUP BY|\s+ORDER BY|\s+LIMIT|$)", re.IGNORECASE | re.DOTALL)
+ORDER_PATTERN = re.compile(r"\bORDER BY\s+(.*?)(?:\s+LIMIT|$)", re.IGNORECASE | re.DOTALL)
+EQUALITY_PATTERN = re.compile(r"^(?:\w+\.)?(\w+)\s*=\s*\?$")
+LITERAL_PATTERN = re.compile(r"^(?:\w+\.)?\w+\s+(?:IS NULL|=\s*'[^']*')$", re.IGNORECASE)
+ORDER_TERM_PATTERN = re.compile(r"^(?:\w+\.)?(\w+)(?:\s+(ASC|DESC))?$", re.IGNORECASE)
+
+@dataclass
+class QueryPlan:
+    """單一查詢的執行計畫與問題"""
+    sql: str
+    params: List[Any]
+    sources: List[str]
+    details: List[str]
+    remaining: List[str] = field(default_factory=list)
+
+    @property
+    def problems(self) -> List[str]:
+        """全表掃描（不含虛擬表）與為 ORDER BY 建立的暫存 B-tree"""
+        return [
+            detail for detail in self.details
+            if re.match(r"^SCAN \w+$", detail) or "TEMP B-TREE" in detail
+        ]
+
+@dataclass
+class IndexSuggestion:
+    """建議新增的索引"""
+    name: str
+    table: str
+    columns: List[str]
+    where: Optional[str] = None
+    sources: List[str] = field(default_factory=list)
+
+    @property
+    def sql(self) -> str:
+        sql = f"CREATE INDEX IF NOT EXISTS {self.name} ON {self.table}({', '.join(self.columns)})"
+        if self.where:
+            sql += f" WHERE {self.where}"
+        return sql
+
+class RecordingSQLiteAdapter(SQLiteD1Adapter):
+    """記錄所有執行過的語句的 SQLite 適配器"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.statements: List[Tuple[str, List[Any]]] = []
+
+    def _run_statement(self, cursor: sqlite3.Cursor, sql: str, params: Optional[List[Any]]) -> Dict[str, Any]:
+        self.statements.append((sql, list(params or [])))
+        return super()._run_statement(cursor, sql, params)
+
+def _sample_value(parameter: inspect.Parameter) -> Any:
+    """依參數名稱與型別產生範例值"""
+    if parameter.name in SAMPLE_VALUES:
+        return SAMPLE_VALUES[parameter.name]
+    if parameter.name == "id" or parameter.name.endswith("_id"):
+        return 1
+    if parameter.annotation is str or "str" in str(parameter.annotation):
+        return "sample"
+    return 1
+
+def _call_variants(method) -> List[Dict[str, Any]]:
+    """產生呼叫參數組合：只給必要參數，以及另外填入預設為 None 的選用篩選條件"""
+    required, optional = {}, {}
+    for name, parameter in inspect.signature(method).parameters.items():
+        if name == "cursor":
+            continue
+        if parameter.default is inspect.Parameter.empty:
+            required[name] = _sample_value(parameter)
+        elif parameter.default is None:
+            optional[name] = _sample_value(parameter)
+
+    variants = [required]
+    if optional:
+        variants.append({**required, **optional})
+    return variants
+
+def _read_methods(crud) -> Iterable[Tuple[str, Any]]:
+    """CRUD 類別自己定義的讀取方法"""
+    for name, function in vars(type(crud)).items():
+        if name.startswith(READ_METHOD_PREFIXES) and inspect.iscoroutinefunction(function):
+            yield name, getattr(crud, name)
+
+async def replay_queries(adapter: RecordingSQLiteAdapter, cruds: Sequence[Any]) -> Dict[str, Tuple[List[Any], List[str]]]:
+    """以範例參數呼叫每個 CRUD 讀取方法，返回 {SQL: (參數, [來源方法])}"""
+    queries: Dict[str, Tuple[List[Any], List[str]]] = {}
+    for crud in cruds:
+        original = crud.adapter
+        crud.adapter = adapter
+        try:
+            for name, method in _read_methods(crud):
+                for kwargs in _call_variants(method):
+                    start = len(adapter.statements)
+                    try:
+                        await method(**kwargs)
+                    except Exception as e:
+                        print(f"重播 {type(crud).__name__}.{name} 失敗: {e}")
+                        continue
+                    source = f"{type(crud).__name__}.{name}({', '.join(sorted(kwargs))})"
+                    for sql, params in adapter.statements[start:]:
+                        if sql.lstrip().upper().startswith("SELECT"):
+                            queries.setdefault(sql, (params, []))[1].append(source)
+        finally:
+            crud.adapter = original
+    return queries
+
+def explain(connection: sqlite3.Connection, sql: str, params: List[Any]) -> List[str]:
+    """取得查詢計畫的各步驟描述"""
+    return [row[3] for row in connection.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()]
+
+def _split_conditions(where: str) -> List[str]:
+    """將 WHERE 子句以頂層 AND 拆開（括號內的條件不拆）"""
+    conditions, depth, current = [], 0, ""
+    for token in re.split(r"(\(|\)|\s+AND\s+)", where, flags=re.IGNORECASE):
+        if token == "(":
+            depth += 1
+        elif token == ")":
+            depth -= 1
+        if depth == 0 and re.fullmatch(r"\s+AND\s+", token, flags=re.IGNORECASE):
+            conditions.append(current.strip())
+            current = ""
+        else:
+            current += token
+    if current.strip():
+        conditions.append(current.strip())
+    return conditions
+
+def suggest_index(sql: str) -> Optional[IndexSuggestion]:
+    """
+    由查詢形狀推導索引：等值條件欄位在前、排序欄位在後
+    字面常數條件（例如 deleted_at IS NULL）作為部分索引條件
+    """
+    table_match = TABLE_PATTERN.search(sql)
+    if not table_match:
+        return None
+    table = table_match.group(1)
+
+    equality, literals = [], []
+    where_match = WHERE_PATTERN.search(sql)
+    if where_match:
+        for condition in _split_conditions(where_match.group(1)):
+            equality_match = EQUALITY_PATTERN.match(condition)
+            if equality_match:
+                if equality_match.group(1) not in equality:
+                    equality.append(equality_match.group(1))
+            elif LITERAL_PATTERN.match(condition):
+                literals.append(re.sub(r"^\w+\.", "", condition))
+
+    order = []
+    order_match = ORDER_PATTERN.search(sql)
+    if order_match:
+        terms = [term.strip() for term in order_match.group(1).split(",")]
+        matches = [ORDER_TERM_PATTERN.match(term) for term in terms]
+        # 排序鍵含運算式（例如 bm25）時無法以索引排序
+        if not all(matches):
+            return None
+        directions = {(match.group(2) or "ASC").upper() for match in matches}
+        for match in matches:
+            column = match.group(1)
+            if column in equality:
+                continue
+            # 方向一致時索引可雙向掃描，只有混合方向才需要寫明
+            order.append(f"{column} {(match.group(2) or 'ASC').upper()}" if len(directions) > 1 else column)
+        if order and order[-1] == ROWID_COLUMN:
+            order.pop()
+
+    columns = equality + order
+    if not columns:
+        return None
+
+    plain_columns = [column.split()[0] for column in columns]
+    name = f"idx_{table}_{'_'.join(plain_columns)}"
+    if literals:
+        name += "_partial"
+    return IndexSuggestion(
+        name=name,
+        table=table,
+        columns=columns,
+        where=" AND ".join(literals) or None
+    )
+
+@dataclass
+class AdvisorReport:
+    """索引建議結果"""
+    flagged: List[QueryPlan]
+    suggestions: List[IndexSuggestion]
+    redundant: List[str]
+
+    @property
+    def unresolved(self) -> List[QueryPlan]:
+        """建立建議索引後仍有問題的查詢（例如依 bm25 排序的全文搜尋）"""
+        return [plan for plan in self.flagged if plan.remaining]
+
+def _index_columns(connection: sqlite3.Connection, table: str) -> Dict[str, Tuple[List[str], bool]]:
+    """資料表上各索引的 {名稱: (欄位, 是否為一般索引)}（排除 UNIQUE 與部分索引）"""
+    indexes = {}
+    for row in connection.execute(f"PRAGMA index_list({table})").fetchall():
+        name, unique, origin, partial = row[1], row[2], row[3], row[4]
+        columns = [info[2] for info in connection.execute(f"PRAGMA index_info({name})").fetchall()]
+        indexes[name] = (columns, not unique and not partial and origin == "c")
+    return indexes
+
+def find_redundant(connection: sqlite3.Connection, suggestions: Sequence[IndexSuggestion]) -> List[str]:
+    """找出欄位為建議索引前綴的既有單純索引，建立建議索引後即可移除"""
+    redundant = []
+    for suggestion in suggestions:
+        if suggestion.where:
+            continue
+        covering = [column.split()[0] for column in suggestion.columns]
+        for name, (columns, plain) in _index_columns(connection, suggestion.table).items():
+            if (
+                plain
+                and name != suggestion.name
+                and name not in redundant
+                and len(columns) < len(covering)
+                and covering[:len(columns)] == columns
+            ):
+                redundant.append(name)
+    return redundant
+
+async def advise(cruds: Sequence[Any], migrations_path: Optional[str] = None) -> AdvisorReport:
+    """
+    重播查詢並產生索引建議
+    建議索引會逐一在記憶體資料庫中建立並重新分析，只保留確實消除問題的索引
+    """
+    adapter = RecordingSQLiteAdapter(":memory:", migrations_path=migrations_path)
+    try:
+        queries = await replay_queries(adapter, cruds)
+        connection = adapter.connection
+
+        plans = [
+            QueryPlan(sql=sql, params=params, sources=sources, details=explain(connection, sql, params))
+            for sql, (params, sources) in queries.items()
+        ]
+        flagged = [plan for plan in plans if plan.problems]
+
+        candidates = []
+        for plan in flagged:
+            suggestion = suggest_index(plan.sql)
+            if suggestion is not None:
+                candidates.append((plan, suggestion))
+        # 欄位較多的索引先建立，較短的前綴索引通常就不再需要
+        candidates.sort(key=lambda item: len(item[1].columns), reverse=True)
+
+        suggestions: List[IndexSuggestion] = []
+        for plan, suggestion in candidates:
+            details = explain(connection, plan.sql, plan.params)
+            if not [d for d in details if d in plan.problems]:
+                # 已被先前建立的索引解決，將來源記在該索引下
+                for existing in suggestions:
+                    if any(re.search(rf"\bINDEX {existing.name}\b", d) for d in details):
+                        existing.sources.extend(s for s in plan.sources if s not in existing.sources)
+                continue
+
+            connection.execute(suggestion.sql)
+            remaining = [d for d in explain(connection, plan.sql, plan.params) if d in plan.problems]
+            if remaining == plan.problems:
+                connection.execute(f"DROP INDEX {suggestion.name}")
+                continue
+            suggestion.sources.extend(plan.sources)
+            suggestions.append(suggestion)
+
+        for plan in flagged:
+            plan.remaining = [d for d in explain(connection, plan.sql, plan.params) if d in plan.problems]
+
+        return AdvisorReport(
+            flagged=flagged,
+            suggestions=suggestions,
+            redundant=find_redundant(connection, suggestions)
+        )
+    finally:
+        await adapter.aclose()
+
+def render_migration(report: AdvisorReport) -> str:
+    """將建議索引輸出為遷移檔內容"""
+    lines = ["-- Generated by migration_tools/index_advisor.py"]
+    for suggestion in report.suggestions:
+        lines.append("")
+        for source in sorted(suggestion.sources):
+            lines.append(f"-- {source}")
+        lines.append(f"{suggestion.sql};")
+    if report.redundant:
+        lines.append("")
+        lines.append("-- Covered by the composite indexes above")
+        for name in report.redundant:
+            lines.append(f"DROP INDEX IF EXISTS {name};")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,166 @@
+"""
+本機 SQLite 版本的 D1 適配器
+與 D1Adapter 介面及回傳格式相同，用於離線測試、壓力測試與單機部署
+"""
+import asyncio
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+
+from app.db.d1_adapter import D1Adapter
+from app.db.d1_migrations import MIGRATIONS_TABLE_SQL, pending_migrations
+from app.db.d1_query_log import record_round_trip
+
+# 預設使用 Worker 的 D1 schema，確保本機與正式環境結構一致
+DEFAULT_SCHEMA_PATH = Path(__file__).resolve().parents[3] / "workers" / "api-d1" / "schema.sql"
+
+class SQLiteD1Adapter(D1Adapter):
+    """以本機 SQLite 檔案實作的 D1 適配器"""
+
+    def __init__(
+        self,
+        database_path: str,
+        schema_path: Optional[str] = None,
+        migrations_path: Optional[str] = None
+    ):
+        # 不呼叫 D1Adapter.__init__：本機模式不需要 Cloudflare 憑證與 HTTP 連線池
+        self.database_path = database_path
+        self.schema_path = Path(schema_path) if schema_path else DEFAULT_SCHEMA_PATH
+        self.migrations_path = Path(migrations_path) if migrations_path else None
+        self._connection: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self.in_flight = 0
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """取得 SQLite 連線（首次使用時建立並套用 schema）"""
+        if self._connection is None:
+            connection = sqlite3.connect(
+                self.database_path,
+                check_same_thread=False,
+                isolation_level=None
+            )
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA foreign_keys = ON")
+            if self.database_path != ":memory:":
+                connection.execute("PRAGMA journal_mode = WAL")
+            self._ensure_schema(connection)
+            self._connection = connection
+        return self._connection
+
+    def _ensure_schema(self, connection: sqlite3.Connection):
+        """資料庫為空時套用 schema.sql，並套用尚未執行的遷移"""
+        existing = connection.execute(
+            "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table'"
+        ).fetchone()[0]
+        if existing == 0 and self.schema_path.exists():
+            connection.executescript(self.schema_path.read_text(encoding="utf-8"))
+
+        connection.execute(MIGRATIONS_TABLE_SQL)
+        applied = {row[0] for row in connection.execute("SELECT name FROM d1_migrations")}
+        for name, statements in pending_migrations(applied, self.migrations_path):
+            connection.execute("BEGIN")
+            try:
+                for sql in statements:
+                    connection.execute(sql)
+                connection.execute("INSERT INTO d1_migrations (name) VALUES (?)", [name])
+                connection.execute("COMMIT")
+            except sqlite3.Error:
+                connection.execute("ROLLBACK")
+                raise
+
+    async def startup(self):
+        """應用程式啟動時開啟資料庫"""
+        with self._lock:
+            _ = self.connection
+
+    async def aclose(self):
+        """關閉資料庫連線"""
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def pool_status(self) -> Dict[str, Any]:
+        """
+        本機模式以單一連線依序執行，等待中的請求都計入進行中
+        任何一個查詢都會佔滿唯一的連線，飽和度不代表負載，因此不回報（就緒檢查略過此項）
+        """
+        return {
+            "in_flight": self.in_flight,
+            "max_connections": 1,
+            "saturation": None
+        }
+
+    async def _run(self, statements: List[Dict[str, Any]]) -> Dict[str, Any]:
+        self.in_flight += 1
+        try:
+            return await asyncio.to_thread(self._execute, statements)
+        finally:
+            self.in_flight -= 1
+
+    def _run_statement(self, cursor: sqlite3.Cursor, sql: str, params: Optional[List[Any]]) -> Dict[str, Any]:
+        """執行單一語句並組成 D1 格式的結果"""
+        started = time.perf_counter()
+        cursor.execute(sql, params or [])
+        rows = [dict(row) for row in cursor.fetchall()]
+        changes = cursor.rowcount if cursor.rowcount > 0 else 0
+        return {
+            "results": rows,
+            "success": True,
+            "meta": {
+                "last_row_id": cursor.lastrowid or 0,
+                "changes": changes,
+                "duration": (time.perf_counter() - started) * 1000,
+                "rows_read": len(rows),
+                "rows_written": changes
+            }
+        }
+
+    def _execute(self, statements: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """在同一個交易中執行所有語句（與 D1 批次語意相同）"""
+        with self._lock:
+            connection = self.connection
+            cursor = connection.cursor()
+            try:
+                cursor.execute("BEGIN")
+                results = [
+                    self._run_statement(cursor, statement["sql"], statement.get("params"))
+                    for statement in statements
+                ]
+                cursor.execute("COMMIT")
+            except Exception:
+                if connection.in_transaction:
+                    cursor.execute("ROLLBACK")
+                raise
+            finally:
+                cursor.close()
+
+        return {
+            "success": True,
+            "errors": [],
+            "messages": [],
+            "result": results
+        }
+
+    async def execute_query(self, sql: str, params: Optional[List[Any]] = None) -> Dict[str, Any]:
+        """執行 SQL 查詢"""
+        started = time.perf_counter()
+        try:
+            result = await self._run([{"sql": sql, "params": params}])
+        except sqlite3.Error as e:
+            raise Exception(f"D1 Query failed: {e}")
+        record_round_trip([sql], result, (time.perf_counter() - started) * 1000)
+        return result
+
+    async def execute_batch(self, queries: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """批次執行多個 SQL 查詢"""
+        started = time.perf_counter()
+        try:
+            result = await self._run(queries)
+        except sqlite3.Error as e:
+            raise Exception(f"D1 Batch query failed: {e}")
+        record_round_trip([query["sql"] for query in queries], result, (time.perf_counter() - started) * 1000)
+        return result
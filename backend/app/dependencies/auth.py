@@ -1,16 +1,71 @@
-from typing import Optional
+from types import MappingProxyType
+from typing import Any, Mapping, Optional, Tuple
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-from sqlalchemy.orm import Session
+from sqlalchemy import inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
 from app.core.config import settings
+from app.core.metrics import metrics
 from app.core.security import verify_token
+from app.core.ttl_cache import MISSING, TTLCache
 from app.db.session import get_db
 from app.models.user import User
 from app.crud import user as user_crud
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}/auth/login")
 
+# 用戶 ID -> 用戶欄位值的唯讀快照（不保留任何 Session 的物件，提交或關閉 Session 不會使其過期）；
+# 啟用狀態、角色與密碼變更時由 user CRUD 主動失效，其餘變更以短 TTL 收斂
+principal_cache = TTLCache(
+    ttl=settings.AUTH_PRINCIPAL_CACHE_TTL,
+    maxsize=settings.AUTH_PRINCIPAL_CACHE_SIZE
+)
+metrics.register_cache("auth_principal", principal_cache.cache_info)
+
+
+def invalidate_principal(user_id) -> None:
+    """
+    清除用戶的認證快取
+    """
+    try:
+        principal_cache.invalidate(int(user_id))
+    except (TypeError, ValueError):
+        pass
+
+
+def _snapshot(user: User) -> Tuple[type, Mapping[str, Any]]:
+    """
+    複製剛載入的用戶的欄位值（不含關聯）
+    """
+    mapper = inspect(user).mapper
+    return mapper.class_, MappingProxyType({attr.key: getattr(user, attr.key) for attr in mapper.column_attrs})
+
+
+def _from_snapshot(db: Session, snapshot: Tuple[type, Mapping[str, Any]]) -> User:
+    """
+    以快照建立本次請求專用的用戶物件
+    標記為已從資料庫載入的 detached 狀態後以 merge(load=False) 加入目前的 Session，不查詢資料庫
+    """
+    model, values = snapshot
+    user = model(**values)
+    make_transient_to_detached(user)
+    return db.merge(user, load=False) if db is not None else user
+
+
+def _load_user(db: Session, user_id: int) -> Optional[User]:
+    """
+    從快取或資料庫取得用戶
+    """
+    cached = principal_cache.get(user_id)
+    if cached is not MISSING:
+        return _from_snapshot(db, cached)
+
+    user = user_crud.get(db, id=user_id)
+    if user is not None:
+        principal_cache.set(user_id, _snapshot(user))
+    return user
+
 
 async def get_current_user(
     db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)
@@ -25,13 +80,11 @@ async def get_current_user(
 
     try:
         payload = verify_token(token)
-        user_id: Optional[int] = payload.get("sub")
-        if user_id is None:
-            raise credentials_exception
-    except JWTError:
+        user_id: Optional[int] = int(payload.get("sub"))
+    except (JWTError, AttributeError, TypeError, ValueError):
         raise credentials_exception
 
-    user = user_crud.get(db, id=user_id)
+    user = _load_user(db, user_id)
     if user is None:
         raise credentials_exception
 
@@ -1,15 +1,61 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from app.core.config import settings
+from app.core.google_auth import google_token_verifier
+from app.core.school_mapper import school_domain_map
+from app.core.metrics import (
+    CONTENT_TYPE,
+    http_request_duration_seconds,
+    http_requests_in_flight,
+    http_requests_total,
+    metrics
+)
 from app.routers import auth, users, test_auth, posts, comments, reviews
 from app.api.api_v1.api import api_router
+from app.db.d1_adapter import get_d1_adapter
+from app.db.d1_health import d1_health_probe
+from app.db.d1_loader import d1_loader_scope
+from app.db.d1_query_log import d1_query_log_scope, query_stats
+from app.crud.view_count_buffer import view_count_buffer
+from app.services.outbox import outbox_worker
+from app.services.ig_graph import ig_graph_client
+from app.services.render_pool import render_pool
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """應用程式生命週期：啟動時建立 D1 連線池與背景工作，關閉時釋放"""
+    d1_adapter = get_d1_adapter()
+    await d1_adapter.startup()
+    await view_count_buffer.start()
+    if settings.OUTBOX_WORKER_ENABLED:
+        await outbox_worker.start()
+    try:
+        await school_domain_map.load()
+    except Exception as e:
+        # 載入失敗不影響啟動，之後依需要逐一查詢
+        print(f"載入學校域名對應失敗: {e}")
+    try:
+        yield
+    finally:
+        # 先寫回緩衝的瀏覽次數，再關閉連線池
+        await outbox_worker.stop()
+        await view_count_buffer.stop()
+        await d1_adapter.aclose()
+        await google_token_verifier.key_set.aclose()
+        await ig_graph_client.aclose()
+        # 關閉行程池會等待執行中的渲染結束，不在事件迴圈中阻塞
+        await asyncio.to_thread(render_pool.shutdown)
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
     version=settings.VERSION,
     description="ForumKit - 匿名校園討論平台 API (使用 CloudFlare D1)",
-    openapi_url=f"{settings.API_V1_STR}/openapi.json"
+    openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    lifespan=lifespan
 )
 
 # CORS 設定 - 允許前端訪問
@@ -22,6 +68,54 @@ app.add_middleware(
     expose_headers=["*"]
 )
 
+# 每個請求建立獨立的 D1 批次載入器，合併同時發出的 get(id) 查詢
+@app.middleware("http")
+async def d1_loader_middleware(request, call_next):
+    with d1_loader_scope(get_d1_adapter()):
+        return await call_next(request)
+
+def _route_template(request) -> str:
+    """取得請求對應的完整路由樣板（含 include_router 前綴），避免以實際路徑造成標籤爆量"""
+    route = request.scope.get("route")
+    path_format = getattr(route, "path_format", None)
+    if path_format is None:
+        return request.url.path
+    # 子路由的 path_format 不含前綴：以實際路徑扣掉代入參數後的相對路徑取得前綴
+    concrete = path_format
+    for name, value in request.path_params.items():
+        concrete = concrete.replace(f"{{{name}}}", str(value))
+    path = request.url.path
+    if not path.endswith(concrete):
+        return path_format
+    return path[:len(path) - len(concrete)] + path_format
+
+# 記錄每個請求的 D1 查詢，以 Server-Timing 標頭回報並依路由彙總到查詢統計
+@app.middleware("http")
+async def d1_query_log_middleware(request, call_next):
+    with d1_query_log_scope() as log:
+        response = await call_next(request)
+    if log.records:
+        response.headers["Server-Timing"] = log.server_timing()
+        query_stats.observe_request(_route_template(request), log)
+    return response
+
+# 記錄請求延遲（依路由樣板）與處理中的請求數；最後註冊因此位於最外層，涵蓋其他中介層的耗時
+@app.middleware("http")
+async def metrics_middleware(request, call_next):
+    started = time.perf_counter()
+    http_requests_in_flight.inc()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        http_requests_in_flight.dec()
+        # 未匹配的路徑（404 掃描等）合併為同一標籤，避免標籤數量無限成長
+        route = _route_template(request) if request.scope.get("route") is not None else "<unmatched>"
+        http_request_duration_seconds.observe(time.perf_counter() - started, method=request.method, route=route)
+        http_requests_total.inc(method=request.method, route=route, status=status_code)
+
 # 掛載路由
 app.include_router(test_auth.router, prefix=f"{settings.API_V1_STR}/test")
 app.include_router(api_router, prefix=settings.API_V1_STR)
@@ -49,6 +143,40 @@ async def health_check():
         "version": settings.VERSION
     }
 
+@app.get("/ready")
+async def readiness_check():
+    """
+    就緒檢查端點
+    D1 延遲（快取的 SELECT 1 探測）、連線池飽和度、外送佇列積壓或渲染佇列長度超過門檻時返回 503，
+    讓負載平衡器移除此實例
+    """
+    d1 = await d1_health_probe.check()
+    pool = get_d1_adapter().pool_status()
+    pool_ok = pool["saturation"] is None or pool["saturation"] < settings.HEALTH_MAX_POOL_SATURATION
+    outbox = await outbox_worker.backlog_status()
+    render_ok = render_pool.pending <= settings.HEALTH_MAX_RENDER_PENDING
+    ready = d1["ok"] and pool_ok and outbox["ok"] and render_ok
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "status": "ready" if ready else "degraded",
+            "checks": {
+                "d1": d1,
+                "d1_pool": {**pool, "ok": pool_ok},
+                "view_count_buffer": {"pending": view_count_buffer.pending},
+                "outbox": outbox,
+                "render_pool": {"pending": render_pool.pending, "ok": render_ok}
+            },
+            "version": settings.VERSION
+        }
+    )
+
+if settings.METRICS_ENABLED:
+    @app.get("/metrics", include_in_schema=False)
+    async def prometheus_metrics():
+        """Prometheus 指標端點"""
+        return Response(content=metrics.render(), media_type=CONTENT_TYPE)
+
 # 全域錯誤處理
 @app.exception_handler(Exception)
 async def global_exception_handler(request, exc):
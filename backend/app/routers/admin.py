@@ -8,6 +8,9 @@ from app.models.user import User, UserRole
 from app.services.admin import admin_service
 from app.schemas.user import User as UserSchema, RoleAssignment, UserQuery
 from app.services.user import user_service
+from app.db.d1_query_log import query_stats
+from app.crud.outbox_d1 import outbox_d1
+from app.services.outbox import outbox_worker
 from app.models.user import User as UserModel
 
 router = APIRouter()
@@ -64,6 +67,57 @@ async def get_admin_info(
         }
     }
 
+@router.get("/d1/queries", response_model=Dict[str, Any])
+async def get_d1_query_stats(
+    *,
+    current_user: User = Depends(deps.get_current_active_user_with_role(UserRole.ADMIN))
+):
+    """
+    獲取 D1 查詢統計（依 SQL 指紋彙總的延遲直方圖、單次請求最大次數與慢查詢記錄，僅限管理員）
+    """
+    return query_stats.snapshot()
+
+@router.delete("/d1/queries", response_model=Dict[str, Any])
+async def reset_d1_query_stats(
+    *,
+    current_user: User = Depends(deps.get_current_active_user_with_role(UserRole.ADMIN))
+):
+    """
+    重設 D1 查詢統計（僅限管理員）
+    """
+    query_stats.reset()
+    return {"message": "D1 查詢統計已重設"}
+
+@router.get("/outbox/dead", response_model=List[Dict[str, Any]])
+async def get_outbox_dead_letters(
+    *,
+    skip: int = 0,
+    limit: int = 100,
+    current_user: User = Depends(deps.get_current_active_user_with_role(UserRole.ADMIN))
+):
+    """
+    獲取發送失敗並轉入死信的 IG / Discord 外送工作（僅限管理員）
+    """
+    return await outbox_d1.get_dead_letters(skip=skip, limit=limit)
+
+@router.post("/outbox/{job_id}/requeue", response_model=Dict[str, Any])
+async def requeue_outbox_job(
+    *,
+    job_id: int,
+    current_user: User = Depends(deps.get_current_active_user_with_role(UserRole.ADMIN))
+):
+    """
+    將死信工作重新排入外送佇列（僅限管理員）
+    """
+    job = await outbox_d1.requeue(job_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail={"code": "OUTBOX_JOB_NOT_FOUND", "message": "死信工作不存在"}
+        )
+    outbox_worker.notify()
+    return job
+
 @router.post("/assign-role", response_model=UserSchema)
 async def assign_role(
     *,
@@ -3,10 +3,9 @@ from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from datetime import timedelta
 from typing import Any
 from pydantic import BaseModel
-from google.oauth2 import id_token
-from google.auth.transport import requests
 
 from app.core.config import settings
+from app.core.google_auth import google_token_verifier
 from app.core.security import create_access_token
 from app.core.school_mapper import is_valid_edu_email, get_school_id_by_email_d1
 from app.db.database import get_db
@@ -31,11 +30,7 @@ async def google_auth(
     """
     try:
         # 驗證 Google ID token
-        idinfo = id_token.verify_oauth2_token(
-            id_token_str,
-            requests.Request(),
-            settings.GOOGLE_CLIENT_ID
-        )
+        idinfo = await google_token_verifier.verify(id_token_str)
         
         # 檢查是否為教育信箱
         email = idinfo['email']
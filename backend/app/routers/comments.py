@@ -1,9 +1,10 @@
-from typing import List
-from fastapi import APIRouter, Depends, Query
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
 
 from app.api import deps
-from app.schemas.comment import CommentCreate, CommentDetail
+from app.crud.comment_d1 import comment_d1
+from app.schemas.comment import CommentCreate, CommentDetail, CommentPage
 from app.services import comment as comment_service
 from app.models.user import User
 
@@ -47,4 +48,32 @@ def get_post_comments(
         post_id=post_id,
         skip=skip,
         limit=limit
-    ) 
\ No newline at end of file
+    )
+
+@router.get("/schools/{school_id}", response_model=CommentPage)
+async def get_school_comments(
+    school_id: int,
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100)
+) -> CommentPage:
+    """
+    獲取學校已通過的留言
+    - 依時間由新到舊排序
+    - 游標分頁，以回傳的 next_cursor 取得下一頁
+    """
+    try:
+        comments, next_cursor = await comment_d1.get_comments_by_school_page(
+            school_id=school_id,
+            cursor=cursor,
+            limit=limit,
+            status="approved"
+        )
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={
+                "code": "INVALID_CURSOR",
+                "message": "無效的分頁游標"
+            }
+        )
+    return {"items": comments, "next_cursor": next_cursor}
@@ -80,9 +80,8 @@ async def update_template(
 
 # 圖片渲染路由
 @router.post("/render/{post_id}")
-def render_post(
+async def render_post(
     *,
-    db: Session = Depends(deps.get_db),
     post_id: int,
     template_id: int = None,
     current_user: User = Depends(deps.get_current_active_user)
@@ -90,8 +89,7 @@ def render_post(
     """
     渲染貼文為 IG 圖片
     """
-    output_path = ig_render_service.render_post(
-        db=db,
+    output_path = await ig_render_service.render_post(
         post_id=post_id,
         template_id=template_id
     )
@@ -102,17 +100,15 @@ def render_post(
     )
 
 @router.post("/preview")
-def preview_template(
+async def preview_template(
     *,
-    db: Session = Depends(deps.get_db),
     preview_in: IGTemplatePreview,
     current_user: User = Depends(deps.get_current_active_user_with_role(UserRole.ADMIN))
 ):
     """
     預覽模板效果（僅限管理員）
     """
-    output_path = ig_render_service.render_post(
-        db=db,
+    output_path = await ig_render_service.render_post(
         post_id=preview_in.post_id,
         template_id=preview_in.template_id
     )
@@ -1,9 +1,10 @@
-from typing import List
+from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
 
 from app.api import deps
-from app.schemas.post import PostCreate, PostRead, PostList, PostReview
+from app.crud.post_d1 import post_d1
+from app.schemas.post import PostCreate, PostRead, PostList, PostReview, PostPage, PostSearchPage
 from app.services import post as post_service
 from app.models.user import User
 
@@ -59,6 +60,86 @@ def list_posts(
             "comment_count": 0
         }]
 
+def invalid_cursor_error() -> HTTPException:
+    """分頁游標無法解析"""
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail={
+            "code": "INVALID_CURSOR",
+            "message": "無效的分頁游標"
+        }
+    )
+
+@router.get("/feed", response_model=PostPage)
+async def list_school_posts(
+    *,
+    school_id: int,
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100)
+) -> PostPage:
+    """
+    獲取學校已通過的貼文動態
+    - 游標分頁，以回傳的 next_cursor 取得下一頁
+    """
+    try:
+        posts, next_cursor = await post_d1.get_posts_by_school_page(
+            school_id=school_id,
+            cursor=cursor,
+            limit=limit,
+            status="approved"
+        )
+    except ValueError:
+        raise invalid_cursor_error()
+    return {"items": posts, "next_cursor": next_cursor}
+
+@router.get("/search", response_model=PostSearchPage)
+async def search_posts(
+    *,
+    q: str = Query(..., min_length=1),
+    school_id: Optional[int] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100)
+) -> PostSearchPage:
+    """
+    搜尋貼文
+    - 依相關度排序，snippet 以 <mark> 標示關鍵字
+    - 游標分頁，以回傳的 next_cursor 取得下一頁
+    """
+    try:
+        posts, next_cursor = await post_d1.search_posts_page(
+            query=q,
+            school_id=school_id,
+            cursor=cursor,
+            limit=limit
+        )
+    except ValueError:
+        raise invalid_cursor_error()
+    return {"items": posts, "next_cursor": next_cursor}
+
+@router.get("/popular", response_model=PostPage)
+async def list_popular_posts(
+    *,
+    school_id: Optional[int] = None,
+    days: int = Query(7, ge=1, le=90),
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100)
+) -> PostPage:
+    """
+    獲取熱門貼文
+    - 依按讚數與評論數排序
+    - 游標分頁，以回傳的 next_cursor 取得下一頁
+    """
+    try:
+        posts, next_cursor = await post_d1.get_popular_posts_page(
+            school_id=school_id,
+            cursor=cursor,
+            limit=limit,
+            days=days
+        )
+    except ValueError:
+        raise invalid_cursor_error()
+    return {"items": posts, "next_cursor": next_cursor}
+
 @router.post("/", response_model=PostRead)
 def create_post(
     *,
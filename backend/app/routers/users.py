@@ -1,10 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
 from app.api import deps
 from app.dependencies.auth import get_current_active_user, check_permissions
 from app.models.user import User
-from app.schemas.user import User as UserSchema, UserCreate
+from app.schemas.user import User as UserSchema, UserCreate, UserPage
 from app.crud import user as user_crud
+from app.crud.user_d1 import user_d1
 
 router = APIRouter()
 
@@ -65,4 +67,31 @@ def reviewer_only(
     """
     僅審核員可訪問的端點
     """
-    return {"message": "您有審核員權限"} 
\ No newline at end of file
+    return {"message": "您有審核員權限"}
+
+@router.get("/schools/{school_id}", response_model=UserPage)
+async def list_school_users(
+    school_id: int,
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    current_user: User = Depends(check_permissions(["admin"]))
+):
+    """
+    獲取學校用戶列表（僅限管理員）
+    - 游標分頁，以回傳的 next_cursor 取得下一頁
+    """
+    try:
+        users, next_cursor = await user_d1.get_users_by_school_page(
+            school_id=school_id,
+            cursor=cursor,
+            limit=limit
+        )
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={
+                "code": "INVALID_CURSOR",
+                "message": "無效的分頁游標"
+            }
+        )
+    return {"items": users, "next_cursor": next_cursor}
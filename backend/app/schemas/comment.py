@@ -31,6 +31,11 @@ class CommentRead(CommentBase):
     class Config:
         from_attributes = True
 
+# 游標分頁的留言列表
+class CommentPage(BaseModel):
+    items: List[CommentRead]
+    next_cursor: Optional[str] = None
+
 # 完整留言資訊（包含作者和回覆）
 class CommentDetail(CommentRead):
     author: Optional[User] = None
@@ -66,6 +66,19 @@ class PostList(BaseModel):
     class Config:
         from_attributes = True
 
+# 游標分頁的貼文列表
+class PostPage(BaseModel):
+    items: List[PostList]
+    next_cursor: Optional[str] = None
+
+# 搜尋結果（附上標示關鍵字的摘要）
+class PostSearchResult(PostList):
+    snippet: Optional[str] = None
+
+class PostSearchPage(BaseModel):
+    items: List[PostSearchResult]
+    next_cursor: Optional[str] = None
+
 class PostInDBBase(PostBase):
     id: int
     author_id: int
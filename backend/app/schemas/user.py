@@ -37,6 +37,11 @@ class User(UserInDBBase):
 class UserInDB(UserInDBBase):
     hashed_password: str
 
+# 游標分頁的用戶列表
+class UserPage(BaseModel):
+    items: List[User]
+    next_cursor: Optional[str] = None
+
 class RoleAssignment(BaseModel):
     email: EmailStr
     role: UserRole
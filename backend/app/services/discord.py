@@ -1,13 +1,18 @@
 import aiohttp
+from datetime import datetime
 from typing import Optional, Dict, Any
 from fastapi import HTTPException, status
 from sqlalchemy.orm import Session
 
 from app.crud import discord_settings as settings_crud
 from app.crud import post as post_crud
+from app.crud.discord_settings_d1 import discord_settings_d1
+from app.crud.post_d1 import post_d1
 from app.schemas.discord_settings import DiscordSettingsCreate, DiscordSettingsUpdate
+from app.models.post import PostStatus
 from app.models.user import User, UserRole
 from app.core.config import settings
+from app.core.metrics import track_publish
 
 class DiscordService:
     async def create_settings(
@@ -91,30 +96,50 @@ class DiscordService:
                 detail="需要管理員權限"
             )
 
+        return await self.deliver_post(post_id=post_id)
+
+    async def can_deliver(self, school_id: int) -> bool:
+        """學校在 D1 已設定 Discord webhook 時才能推播"""
+        return await discord_settings_d1.get_by_school(school_id) is not None
+
+    async def deliver_post(
+        self,
+        *,
+        post_id: int
+    ) -> Dict[str, Any]:
+        """
+        將貼文送到學校的 Discord webhook（管理員發布與外送佇列共用）
+        貼文與 webhook 設定都從 D1 讀取，外送佇列工作者不需要 SQLAlchemy Session
+        """
         # 獲取貼文
-        post = post_crud.post.get(db, id=post_id)
-        if not post:
+        post = await post_d1.get(post_id)
+        if not post or post.get("deleted_at"):
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="貼文不存在"
             )
 
+        # 只推播已通過審核的貼文；排入後被拒絕的貼文以 4xx 回報，外送佇列直接轉入死信
+        if post["status"] != PostStatus.approved:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="貼文尚未通過審核"
+            )
+
         # 獲取 Discord 設定
-        discord_settings = settings_crud.discord_settings.get_by_school(
-            db=db,
-            school_id=post.school_id
-        )
-        if not discord_settings or not discord_settings.post_webhook_url:
+        discord_settings = await discord_settings_d1.get_by_school(post["school_id"])
+        if not discord_settings:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="學校未設定 Discord webhook"
             )
 
         # 準備訊息內容
-        post_url = f"{settings.FRONTEND_URL}/posts/{post.id}"
+        post_url = f"{settings.FRONTEND_URL}/posts/{post['id']}"
+        created_at = datetime.fromisoformat(post["created_at"].replace("Z", "+00:00"))
         embed = {
-            "title": post.title,
-            "description": post.content[:1000],  # Discord 限制描述長度
+            "title": post["title"],
+            "description": post["content"][:1000],  # Discord 限制描述長度
             "url": post_url,
             "color": 0x3498db,  # 藍色
             "fields": [
@@ -125,7 +150,7 @@ class DiscordService:
                 },
                 {
                     "name": "發布時間",
-                    "value": post.created_at.strftime("%Y-%m-%d %H:%M:%S"),
+                    "value": created_at.strftime("%Y-%m-%d %H:%M:%S"),
                     "inline": True
                 }
             ]
@@ -133,14 +158,15 @@ class DiscordService:
 
         # 發送 webhook
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    discord_settings.post_webhook_url,
-                    json={"embeds": [embed]}
-                ) as response:
-                    if response.status != 204:
-                        raise Exception(f"Discord API 回應錯誤: {response.status}")
-                    return {"success": True}
+            async with track_publish("discord", "post"):
+                async with aiohttp.ClientSession() as session:
+                    async with session.post(
+                        discord_settings["webhook_url"],
+                        json={"embeds": [embed]}
+                    ) as response:
+                        if response.status != 204:
+                            raise Exception(f"Discord API 回應錯誤: {response.status}")
+            return {"success": True}
         except Exception as e:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -205,14 +231,15 @@ class DiscordService:
 
         # 發送 webhook
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    discord_settings.report_webhook_url,
-                    json={"embeds": [embed]}
-                ) as response:
-                    if response.status != 204:
-                        raise Exception(f"Discord API 回應錯誤: {response.status}")
-                    return {"success": True}
+            async with track_publish("discord", "report"):
+                async with aiohttp.ClientSession() as session:
+                    async with session.post(
+                        discord_settings.report_webhook_url,
+                        json={"embeds": [embed]}
+                    ) as response:
+                        if response.status != 204:
+                            raise Exception(f"Discord API 回應錯誤: {response.status}")
+            return {"success": True}
         except Exception as e:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
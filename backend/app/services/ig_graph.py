@@ -0,0 +1,216 @@
+"""
+Instagram Graph API 非同步客戶端
+共用 httpx 連線池，設定逾時，依 Graph API 的用量標頭（X-App-Usage、X-Business-Use-Case-Usage）
+在接近上限時暫停送出，遇到限流或暫時性錯誤時退避重試
+建立與發布媒體的 POST 不是冪等的，只在請求確定未送達（無法連線）或被限流拒絕時重試，
+5xx 與讀取逾時（可能已執行）交由呼叫端決定
+"""
+import asyncio
+import json
+import random
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+
+from app.core.config import settings
+
+# 代表限流的 Graph API 錯誤碼（應用程式、用戶、頁面與 Business Use Case 限制）
+RATE_LIMIT_CODES = {4, 17, 32, 613, 80001, 80002, 80004}
+USAGE_HEADERS = ("x-app-usage", "x-business-use-case-usage", "x-ad-account-usage")
+# 請求尚未送到伺服器的連線錯誤，非冪等的請求也可以安全重試
+NOT_SENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout)
+
+class InstagramGraphError(Exception):
+    """Graph API 呼叫失敗"""
+
+    def __init__(
+        self,
+        message: str,
+        status_code: Optional[int] = None,
+        code: Optional[int] = None,
+        retryable: bool = False,
+        sent: bool = True
+    ):
+        super().__init__(message)
+        self.status_code = status_code
+        self.code = code
+        self.retryable = retryable
+        # False 表示伺服器確定沒有執行請求（無法連線、被限流拒絕），非冪等的請求也可以重送
+        self.sent = sent
+
+def _usage_from_headers(headers: httpx.Headers) -> Dict[str, float]:
+    """
+    解析用量標頭，返回最高使用百分比與需等待的秒數
+    X-App-Usage 為 {"call_count": 28, "total_time": 25, ...}；
+    X-Business-Use-Case-Usage 為 {"<id>": [{"call_count": ..., "estimated_time_to_regain_access": 分鐘}]}
+    """
+    percent = 0.0
+    regain_seconds = 0.0
+    for name in USAGE_HEADERS:
+        raw = headers.get(name)
+        if not raw:
+            continue
+        try:
+            data = json.loads(raw)
+        except ValueError:
+            continue
+        entries = []
+        if isinstance(data, dict) and any(isinstance(value, list) for value in data.values()):
+            for value in data.values():
+                entries.extend(item for item in value if isinstance(item, dict))
+        elif isinstance(data, dict):
+            entries.append(data)
+        for entry in entries:
+            for key in ("call_count", "total_cputime", "total_time", "acc_id_util_pct"):
+                value = entry.get(key)
+                if isinstance(value, (int, float)):
+                    percent = max(percent, float(value))
+            regain = entry.get("estimated_time_to_regain_access")
+            if isinstance(regain, (int, float)):
+                regain_seconds = max(regain_seconds, float(regain) * 60)
+    return {"percent": percent, "regain_seconds": regain_seconds}
+
+class InstagramGraphClient:
+    """Instagram Graph API 客戶端（各請求共用同一個連線池）"""
+
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        *,
+        timeout: Optional[float] = None,
+        max_connections: Optional[int] = None,
+        max_retries: Optional[int] = None,
+        backoff_base: Optional[float] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None
+    ):
+        self.base_url = base_url or f"{settings.IG_GRAPH_BASE_URL}/{settings.IG_GRAPH_API_VERSION}"
+        self.timeout = httpx.Timeout(
+            timeout if timeout is not None else settings.IG_GRAPH_TIMEOUT,
+            connect=settings.IG_GRAPH_CONNECT_TIMEOUT
+        )
+        self.limits = httpx.Limits(
+            max_connections=max_connections or settings.IG_GRAPH_MAX_CONNECTIONS,
+            max_keepalive_connections=max_connections or settings.IG_GRAPH_MAX_CONNECTIONS
+        )
+        self.max_retries = max_retries if max_retries is not None else settings.IG_GRAPH_MAX_RETRIES
+        self.backoff_base = backoff_base if backoff_base is not None else settings.IG_GRAPH_BACKOFF_BASE
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        # 用量接近上限或被限流時，所有請求暫停到此時間（monotonic）
+        self._paused_until = 0.0
+        self.usage_percent = 0.0
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """取得共用的 HTTP 連線（首次使用時建立）"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                limits=self.limits,
+                transport=self._transport
+            )
+        return self._client
+
+    async def aclose(self):
+        """關閉連線池（應用程式關閉時呼叫）"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _pause(self, seconds: float):
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def _record_usage(self, headers: httpx.Headers):
+        usage = _usage_from_headers(headers)
+        self.usage_percent = usage["percent"]
+        if usage["regain_seconds"]:
+            self._pause(usage["regain_seconds"])
+        elif usage["percent"] >= settings.IG_GRAPH_USAGE_PAUSE_PERCENT:
+            # 接近上限時主動放慢，避免被封鎖更久
+            self._pause(settings.IG_GRAPH_USAGE_PAUSE_SECONDS)
+
+    def _backoff(self, attempt: int) -> float:
+        return self.backoff_base * 2 ** attempt * random.uniform(0.5, 1.0)
+
+    def _error(self, response: httpx.Response) -> InstagramGraphError:
+        try:
+            error = response.json().get("error", {})
+        except ValueError:
+            error = {}
+        code = error.get("code")
+        retryable = (
+            response.status_code == 429
+            or response.status_code >= 500
+            or code in RATE_LIMIT_CODES
+            or bool(error.get("is_transient"))
+        )
+        message = error.get("message") or response.text[:200]
+        return InstagramGraphError(
+            f"Graph API {response.status_code}: {message}",
+            status_code=response.status_code,
+            code=code,
+            retryable=retryable,
+            sent=not (response.status_code == 429 or code in RATE_LIMIT_CODES)
+        )
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        token: str,
+        params: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        送出 Graph API 請求，限流與暫時性錯誤時退避重試
+        POST 只在無法連線或被限流時重試，其餘錯誤直接拋出
+        （retryable 標示錯誤是否為暫時性，sent 標示請求是否可能已被執行）
+        """
+        query = {**(params or {}), "access_token": token}
+        idempotent = method.upper() != "POST"
+        for attempt in range(self.max_retries + 1):
+            wait = self._paused_until - time.monotonic()
+            if wait > 0:
+                if wait > settings.IG_GRAPH_MAX_PAUSE:
+                    raise InstagramGraphError(
+                        f"Graph API 用量已達上限，約 {wait:.0f} 秒後恢復",
+                        retryable=True,
+                        sent=False
+                    )
+                await asyncio.sleep(wait)
+
+            try:
+                response = await self.client.request(method, path, params=query)
+            except httpx.TransportError as e:
+                error = InstagramGraphError(
+                    f"Graph API 連線失敗: {e}",
+                    retryable=True,
+                    sent=not isinstance(e, NOT_SENT_ERRORS)
+                )
+            else:
+                self._record_usage(response.headers)
+                if response.status_code < 400:
+                    return response.json()
+                error = self._error(response)
+                if not error.sent:
+                    # 被限流拒絕
+                    retry_after = response.headers.get("retry-after")
+                    self._pause(float(retry_after) if retry_after and retry_after.isdigit() else self._backoff(attempt))
+
+            retry = error.retryable and (idempotent or not error.sent)
+
+            if not retry or attempt == self.max_retries:
+                raise error
+            await asyncio.sleep(self._backoff(attempt))
+
+        raise error
+
+    async def get(self, path: str, token: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        return await self.request("GET", path, token, params)
+
+    async def post(self, path: str, token: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        return await self.request("POST", path, token, params)
+
+# 創建全域實例
+ig_graph_client = InstagramGraphClient()
@@ -1,21 +1,23 @@
-import os
-import requests
 from typing import Optional, Dict, Any
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from fastapi import HTTPException, status
 from sqlalchemy.orm import Session
 
 from app.crud import ig_account as account_crud
-from app.crud import post as post_crud
+from app.crud.ig_account_d1 import ig_account_d1
+from app.crud.ig_template_d1 import ig_template_d1
+from app.crud.post_d1 import post_d1
 from app.schemas.ig_account import IGAccountCreate, IGAccountUpdate, IGPostPublish
+from app.models.post import PostStatus
 from app.models.user import User, UserRole
 from app.services.ig_render import ig_render_service
+from app.services.ig_graph import InstagramGraphClient, InstagramGraphError, ig_graph_client
 from app.core.config import settings
+from app.core.metrics import track_publish
 
 class IGPublishService:
-    def __init__(self):
-        self.api_version = "v18.0"
-        self.base_url = f"https://graph.facebook.com/{self.api_version}"
+    def __init__(self, graph: Optional[InstagramGraphClient] = None):
+        self.graph = graph or ig_graph_client
 
     async def create_account(
         self,
@@ -118,19 +120,38 @@ class IGPublishService:
                 detail="需要管理員權限"
             )
 
+        return await self.deliver_post(
+            post_id=post_id,
+            caption=publish_in.caption
+        )
+
+    async def deliver_post(
+        self,
+        *,
+        post_id: int,
+        caption: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        產生貼文圖片並發布到學校的 IG 帳號（管理員發布與外送佇列共用）
+        貼文、帳號與模板都從 D1 讀取，外送佇列工作者不需要 SQLAlchemy Session
+        """
         # 獲取貼文
-        post = post_crud.post.get(db, id=post_id)
-        if not post:
+        post = await post_d1.get(post_id)
+        if not post or post.get("deleted_at"):
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="貼文不存在"
             )
 
+        # 只推播已通過審核的貼文；排入後被拒絕的貼文以 4xx 回報，外送佇列直接轉入死信
+        if post["status"] != PostStatus.approved:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="貼文尚未通過審核"
+            )
+
         # 獲取 IG 帳號
-        account = account_crud.ig_account.get_by_school(
-            db=db,
-            school_id=post.school_id
-        )
+        account = await ig_account_d1.get_active_by_school(post["school_id"])
         if not account:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -138,31 +159,39 @@ class IGPublishService:
             )
 
         # 檢查 token 是否過期
-        if datetime.now() >= account.token_expires_at:
+        if self._token_expired(account.get("token_expires_at")):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="IG access token 已過期，請更新"
             )
 
         try:
-            # 生成圖片
-            image_path = ig_render_service.render_post(
-                db=db,
-                post_id=post_id
-            )
+            async with track_publish("instagram"):
+                # 生成圖片
+                image_path = await ig_render_service.render(post)
 
-            # 上傳圖片到 IG
-            container_id = await self._create_media_container(
-                account.access_token,
-                image_path,
-                publish_in.caption or post.title
-            )
+                # 上傳圖片到 IG（重送只會多出未發布的容器，可以重試）
+                container_id = await self._create_media_container(
+                    account["access_token"],
+                    image_path,
+                    caption or post["title"]
+                )
 
-            # 發布貼文
-            result = await self._publish_media(
-                account.access_token,
-                container_id
-            )
+                # 發布貼文
+                try:
+                    result = await self._publish_media(
+                        account["access_token"],
+                        container_id
+                    )
+                except InstagramGraphError as e:
+                    if e.retryable and e.sent:
+                        # 請求已送出後逾時或 5xx：貼文可能已經上線，重送會重複發文
+                        # 以 4xx 回報，外送佇列直接轉入死信，由管理員到 IG 確認後再決定是否重新排入
+                        raise HTTPException(
+                            status_code=status.HTTP_409_CONFLICT,
+                            detail=f"發布結果未知，請確認 IG 是否已發布: {str(e)}"
+                        )
+                    raise
 
             return {
                 "success": True,
@@ -170,6 +199,16 @@ class IGPublishService:
                 "permalink": result.get("permalink", "")
             }
 
+        except HTTPException:
+            # 找不到模板、渲染佇列已滿、發布結果未知等，保留原本的狀態碼
+            raise
+        except InstagramGraphError as e:
+            # 發布前的暫時性錯誤以 502 回報（外送佇列會重試整個工作）；
+            # 權杖失效、參數錯誤等重試也不會成功，以 4xx 回報（外送佇列會直接轉入死信）
+            raise HTTPException(
+                status_code=status.HTTP_502_BAD_GATEWAY if e.retryable else status.HTTP_400_BAD_REQUEST,
+                detail=f"發布失敗: {str(e)}"
+            )
         except Exception as e:
             # 記錄錯誤
             error_msg = f"發布失敗: {str(e)}"
@@ -180,41 +219,47 @@ class IGPublishService:
                 detail=error_msg
             )
 
+    async def can_deliver(self, school_id: int) -> bool:
+        """學校在 D1 已設定 IG 帳號且有啟用中的模板時才能推播"""
+        if not await ig_account_d1.get_active_by_school(school_id):
+            return False
+        return await ig_template_d1.get_active() is not None
+
+    @staticmethod
+    def _token_expired(expires_at: Optional[str]) -> bool:
+        """權杖到期時間為 ISO 字串（未標示時區時視為 UTC）；未設定時視為長期權杖"""
+        if not expires_at:
+            return False
+        expires = datetime.fromisoformat(expires_at.replace("Z", "+00:00"))
+        if expires.tzinfo is None:
+            expires = expires.replace(tzinfo=timezone.utc)
+        return datetime.now(timezone.utc) >= expires
+
     async def _validate_token(self, token: str) -> bool:
         """
         驗證 access token
         """
         try:
-            response = requests.get(
-                f"{self.base_url}/me",
-                params={"access_token": token}
-            )
-            response.raise_for_status()
+            await self.graph.get("/me", token)
             return True
-        except Exception as e:
+        except InstagramGraphError as e:
             raise Exception(f"Token 驗證失敗: {str(e)}")
 
     async def _create_media_container(
         self,
         token: str,
-        image_path: str,
+        image_url: str,
         caption: str
     ) -> str:
         """
         創建媒體容器
         """
-        # 上傳圖片
-        with open(image_path, "rb") as image:
-            response = requests.post(
-                f"{self.base_url}/me/media",
-                params={
-                    "access_token": token,
-                    "image_url": image_path,
-                    "caption": caption
-                }
-            )
-            response.raise_for_status()
-            return response.json()["id"]
+        result = await self.graph.post(
+            "/me/media",
+            token,
+            {"image_url": image_url, "caption": caption}
+        )
+        return result["id"]
 
     async def _publish_media(
         self,
@@ -224,14 +269,10 @@ class IGPublishService:
         """
         發布媒體
         """
-        response = requests.post(
-            f"{self.base_url}/me/media_publish",
-            params={
-                "access_token": token,
-                "creation_id": container_id
-            }
+        return await self.graph.post(
+            "/me/media_publish",
+            token,
+            {"creation_id": container_id}
         )
-        response.raise_for_status()
-        return response.json()
 
 ig_publish_service = IGPublishService() 
\ No newline at end of file
@@ -1,15 +1,18 @@
 import os
-from typing import Optional, List
+from typing import Any, Dict, Optional, List
 from datetime import datetime
-from PIL import Image, ImageDraw, ImageFont
 from fastapi import HTTPException, status, UploadFile
 from sqlalchemy.orm import Session
 
 from app.crud import ig_template as template_crud
-from app.crud import post as post_crud
+from app.crud.ig_template_d1 import ig_template_d1
+from app.crud.post_d1 import post_d1
 from app.schemas.ig_template import IGTemplateCreate, IGTemplateUpdate
 from app.models.user import User, UserRole
 from app.core.config import settings
+from app.services.ig_render_worker import render_image
+from app.services.render_cache import file_version, render_key, render_output_cache
+from app.services.render_pool import render_pool
 
 class IGRenderService:
     def __init__(self):
@@ -17,6 +20,19 @@ class IGRenderService:
         self.output_dir = os.path.join(settings.UPLOAD_DIR, "ig_output")
         os.makedirs(self.upload_dir, exist_ok=True)
         os.makedirs(self.output_dir, exist_ok=True)
+        # 背景圖片路徑 -> 資源版本；替換背景時遞增，使渲染子行程中的快取失效
+        self._asset_versions: Dict[str, int] = {}
+
+    def invalidate_template_assets(self, background_path: str):
+        """背景圖片被替換時呼叫，之後的渲染會重新解碼"""
+        self._asset_versions[background_path] = self._asset_versions.get(background_path, 0) + 1
+
+    @staticmethod
+    def _post_timestamp(created_at, format: str) -> str:
+        """圖片上的時間為貼文的建立時間（D1 的記錄為 ISO 字串），同一篇貼文每次渲染都相同"""
+        if isinstance(created_at, str):
+            created_at = datetime.fromisoformat(created_at.replace("Z", "+00:00"))
+        return created_at.strftime(format)
 
     async def create_template(
         self,
@@ -40,6 +56,7 @@ class IGRenderService:
         background_path = os.path.join(self.upload_dir, f"{template_in.name}_{background_file.filename}")
         with open(background_path, "wb") as f:
             f.write(await background_file.read())
+        self.invalidate_template_assets(background_path)
 
         # 創建模板
         template = template_crud.ig_template.create(
@@ -52,93 +69,71 @@ class IGRenderService:
 
         return template
 
-    def render_post(
+    async def render_post(
         self,
-        db: Session,
         *,
         post_id: int,
         template_id: Optional[int] = None
     ) -> str:
         """
-        渲染貼文為 IG 圖片
+        渲染貼文為 IG 圖片，返回輸出檔案路徑
         """
         # 獲取貼文
-        post = post_crud.post.get(db, id=post_id)
-        if not post:
+        post = await post_d1.get(post_id)
+        if not post or post.get("deleted_at"):
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="貼文不存在"
             )
 
+        return await self.render(post, template_id=template_id)
+
+    async def render(
+        self,
+        post: Dict[str, Any],
+        *,
+        template_id: Optional[int] = None
+    ) -> str:
+        """
+        以模板渲染已載入的貼文（D1 記錄），返回輸出檔案路徑
+        """
         # 獲取模板
         if template_id:
-            template = template_crud.ig_template.get(db, id=template_id)
+            template = await ig_template_d1.get(template_id)
         else:
-            template = template_crud.ig_template.get_active(db)
-        
+            template = await ig_template_d1.get_active()
+
         if not template:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="模板不存在"
             )
 
-        # 創建圖片
-        background = Image.open(template.background_image)
-        draw = ImageDraw.Draw(background)
-
-        # 渲染文字區域
-        for text_area in template.config["text_areas"]:
-            if text_area["id"] == "title":
-                text = post.title
-            elif text_area["id"] == "content":
-                text = post.content
-            else:
-                continue
-
-            # 設置字體
-            font = ImageFont.truetype(
-                text_area["font"],
-                text_area["font_size"]
-            )
-
-            # 繪製文字
-            draw.text(
-                (text_area["x"], text_area["y"]),
-                text,
-                font=font,
-                fill=text_area["color"],
-                align=text_area["align"]
-            )
-
-        # 添加時間戳
-        timestamp_config = template.config["timestamp"]
-        timestamp = datetime.now().strftime(timestamp_config["format"])
-        font = ImageFont.truetype(
-            timestamp_config["font"],
-            timestamp_config["font_size"]
+        config = template["config"]
+        job = {
+            "background_image": template["background_image"],
+            "asset_version": self._asset_versions.get(template["background_image"], 0),
+            "config": config,
+            "title": post["title"],
+            "content": post["content"],
+            "timestamp": self._post_timestamp(post["created_at"], config["timestamp"]["format"]),
+            "logo_path": settings.LOGO_PATH
+        }
+
+        # 相同的貼文、模板與資源檔案使用同一個輸出檔案
+        key = render_key({
+            **job,
+            "template_id": template["id"],
+            "template_updated_at": template.get("updated_at"),
+            "background_version": file_version(template["background_image"]),
+            "logo_version": file_version(settings.LOGO_PATH) if "logo" in config else None
+        })
+
+        # 在渲染行程池中繪製，不阻塞事件迴圈
+        return await render_output_cache.get_or_render(
+            key,
+            lambda output_path: render_pool.run(render_image, {**job, "output_path": output_path})
         )
-        draw.text(
-            (timestamp_config["x"], timestamp_config["y"]),
-            timestamp,
-            font=font,
-            fill=timestamp_config["color"]
-        )
-
-        # 添加 LOGO
-        if "logo" in template.config:
-            logo_config = template.config["logo"]
-            logo = Image.open(settings.LOGO_PATH)
-            logo = logo.resize((logo_config["width"], logo_config["height"]))
-            background.paste(logo, (logo_config["x"], logo_config["y"]))
-
-        # 保存圖片
-        output_path = os.path.join(
-            self.output_dir,
-            f"post_{post_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png"
-        )
-        background.save(output_path, "PNG")
-
-        return output_path
 
     def get_templates(
         self,
@@ -198,6 +193,7 @@ class IGRenderService:
                 content = background_file.file.read()
                 f.write(content)
             template_in.background_image = background_path
+            self.invalidate_template_assets(background_path)
 
         return template_crud.ig_template.update(
             db=db,
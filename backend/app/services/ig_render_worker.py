@@ -0,0 +1,103 @@
+"""
+IG 圖片渲染（在渲染行程池中執行）
+只依賴 Pillow、設定與傳入的參數，不存取資料庫，子行程啟動時不需載入整個應用程式
+解碼後的背景、字型與縮放後的 LOGO 快取在各子行程中；檔案的修改時間與大小以及
+模板資源版本都是快取鍵的一部分，背景被替換後自然不會再命中舊的快取
+"""
+import os
+import time
+from functools import lru_cache
+from typing import Any, Dict, Tuple
+
+from PIL import Image, ImageDraw, ImageFont
+
+from app.core.config import settings
+
+def _file_key(path: str) -> Tuple[str, int, int]:
+    stat = os.stat(path)
+    return path, stat.st_mtime_ns, stat.st_size
+
+@lru_cache(maxsize=settings.IG_RENDER_BACKGROUND_CACHE_SIZE)
+def _load_background(path: str, mtime_ns: int, size: int, version: int) -> Image.Image:
+    """解碼背景圖片（使用時需複製，避免繪製到快取的圖片上）"""
+    with Image.open(path) as image:
+        image.load()
+        return image.copy()
+
+@lru_cache(maxsize=settings.IG_RENDER_FONT_CACHE_SIZE)
+def _load_font(path: str, size: int) -> ImageFont.FreeTypeFont:
+    return ImageFont.truetype(path, size)
+
+@lru_cache(maxsize=settings.IG_RENDER_LOGO_CACHE_SIZE)
+def _load_logo(path: str, mtime_ns: int, size: int, width: int, height: int) -> Image.Image:
+    """載入並縮放 LOGO（只作為 paste 的來源，不會被修改）"""
+    with Image.open(path) as image:
+        return image.resize((width, height))
+
+def get_background(path: str, version: int = 0) -> Image.Image:
+    """取得可繪製的背景圖片副本"""
+    return _load_background(*_file_key(path), version).copy()
+
+def get_logo(path: str, width: int, height: int) -> Image.Image:
+    return _load_logo(*_file_key(path), width, height)
+
+def clear_asset_cache():
+    """清除目前行程中的模板資源快取"""
+    _load_background.cache_clear()
+    _load_font.cache_clear()
+    _load_logo.cache_clear()
+
+def render_image(job: Dict[str, Any]) -> Tuple[str, float]:
+    """
+    依模板設定繪製貼文圖片並寫入 output_path
+    job 包含 background_image、asset_version、config、title、content、timestamp、logo_path、output_path
+    返回輸出路徑與渲染耗時（秒）
+    """
+    started = time.perf_counter()
+    config = job["config"]
+
+    # 創建圖片
+    background = get_background(job["background_image"], job.get("asset_version", 0))
+    draw = ImageDraw.Draw(background)
+
+    # 渲染文字區域
+    for text_area in config["text_areas"]:
+        if text_area["id"] == "title":
+            text = job["title"]
+        elif text_area["id"] == "content":
+            text = job["content"]
+        else:
+            continue
+
+        # 設置字體
+        font = _load_font(text_area["font"], text_area["font_size"])
+
+        # 繪製文字
+        draw.text(
+            (text_area["x"], text_area["y"]),
+            text,
+            font=font,
+            fill=text_area["color"],
+            align=text_area["align"]
+        )
+
+    # 添加時間戳
+    timestamp_config = config["timestamp"]
+    font = _load_font(timestamp_config["font"], timestamp_config["font_size"])
+    draw.text(
+        (timestamp_config["x"], timestamp_config["y"]),
+        job["timestamp"],
+        font=font,
+        fill=timestamp_config["color"]
+    )
+
+    # 添加 LOGO
+    if "logo" in config:
+        logo_config = config["logo"]
+        logo = get_logo(job["logo_path"], logo_config["width"], logo_config["height"])
+        background.paste(logo, (logo_config["x"], logo_config["y"]))
+
+    # 保存圖片
+    background.save(job["output_path"], "PNG")
+
+    return job["output_path"], time.perf_counter() - started
@@ -0,0 +1,202 @@
+"""
+發布外送佇列工作者
+從 D1 的 outbox 表領取 IG / Discord 發布工作，依目的地限制並行數，失敗時以指數退避重試，超過次數轉入死信
+"""
+import asyncio
+import json
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+from fastapi import HTTPException
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.crud.outbox_d1 import CRUDOutboxD1, outbox_d1
+from app.services.discord import discord_service
+from app.services.ig_publish import ig_publish_service
+
+OutboxHandler = Callable[[Dict[str, Any]], Awaitable[Any]]
+
+outbox_jobs_total = metrics.counter(
+    "forumkit_outbox_jobs_total",
+    "Outbox jobs processed by destination and result",
+    ("destination", "result")
+)
+
+# 發布服務從 D1 讀取貼文、帳號與設定，工作者不需要 SQLAlchemy Session
+async def _deliver_ig(job: Dict[str, Any]):
+    payload = json.loads(job["payload"]) if job.get("payload") else {}
+    return await ig_publish_service.deliver_post(post_id=job["post_id"], caption=payload.get("caption"))
+
+async def _deliver_discord(job: Dict[str, Any]):
+    return await discord_service.deliver_post(post_id=job["post_id"])
+
+def _is_permanent(error: Exception) -> bool:
+    """4xx 的 HTTPException（設定缺漏、權杖過期等）重試也不會成功，直接轉入死信"""
+    return isinstance(error, HTTPException) and error.status_code < 500
+
+def _describe(error: Exception) -> str:
+    if isinstance(error, HTTPException):
+        return f"{error.status_code}: {error.detail}"
+    return f"{type(error).__name__}: {error}"
+
+class OutboxWorker:
+    """外送佇列工作者：每個目的地一個領取迴圈，處理中的工作數不超過該目的地的並行上限"""
+
+    def __init__(
+        self,
+        handlers: Optional[Dict[str, OutboxHandler]] = None,
+        concurrency: Optional[Dict[str, int]] = None,
+        crud: Optional[CRUDOutboxD1] = None,
+        poll_interval: Optional[float] = None,
+        max_attempts: Optional[int] = None,
+        backoff_base: Optional[float] = None,
+        backoff_max: Optional[float] = None,
+        lease_seconds: Optional[float] = None,
+        job_timeout: Optional[float] = None
+    ):
+        self.handlers = handlers or {"ig": _deliver_ig, "discord": _deliver_discord}
+        self.concurrency = concurrency or {
+            "ig": settings.OUTBOX_IG_CONCURRENCY,
+            "discord": settings.OUTBOX_DISCORD_CONCURRENCY
+        }
+        self.crud = crud or outbox_d1
+        self.poll_interval = poll_interval or settings.OUTBOX_POLL_INTERVAL
+        self.max_attempts = max_attempts or settings.OUTBOX_MAX_ATTEMPTS
+        self.backoff_base = backoff_base or settings.OUTBOX_BACKOFF_BASE
+        self.backoff_max = backoff_max or settings.OUTBOX_BACKOFF_MAX
+        self.lease_seconds = lease_seconds or settings.OUTBOX_LEASE_SECONDS
+        self.job_timeout = job_timeout or settings.OUTBOX_JOB_TIMEOUT
+        self._wakeups: Dict[str, asyncio.Event] = {}
+        self._pollers: Dict[str, asyncio.Task] = {}
+        self._active: Dict[str, Set[asyncio.Task]] = {destination: set() for destination in self.handlers}
+        # 就緒檢查用的積壓數量，與 D1 探測相同快取 HEALTH_CHECK_TTL 秒
+        self._backlog: Optional[Dict[str, Any]] = None
+        self._backlog_checked_at = 0.0
+        self._backlog_lock = asyncio.Lock()
+
+    @property
+    def in_progress(self) -> int:
+        """目前處理中的工作數"""
+        return sum(len(tasks) for tasks in self._active.values())
+
+    async def _check_backlog(self) -> Dict[str, Any]:
+        try:
+            backlog = await asyncio.wait_for(self.crud.backlog(), timeout=settings.HEALTH_CHECK_TIMEOUT)
+        except Exception as e:
+            print(f"查詢外送佇列積壓失敗: {e}")
+            return {"ok": False, "due": None, "oldest_due_s": None, "error": _describe(e)}
+        return {**backlog, "ok": backlog["due"] <= settings.HEALTH_MAX_OUTBOX_BACKLOG, "error": None}
+
+    async def backlog_status(self) -> Dict[str, Any]:
+        """到期未處理的工作數（快取的結果），超過 HEALTH_MAX_OUTBOX_BACKLOG 時視為降級"""
+        if self._backlog is None or time.monotonic() - self._backlog_checked_at >= settings.HEALTH_CHECK_TTL:
+            async with self._backlog_lock:
+                if self._backlog is None or time.monotonic() - self._backlog_checked_at >= settings.HEALTH_CHECK_TTL:
+                    self._backlog = await self._check_backlog()
+                    self._backlog_checked_at = time.monotonic()
+        return self._backlog
+
+    def notify(self):
+        """有新工作寫入時喚醒領取迴圈，不必等到下一次輪詢"""
+        for event in self._wakeups.values():
+            event.set()
+
+    def _backoff(self, attempts: int) -> float:
+        delay = min(self.backoff_base * 2 ** max(attempts - 1, 0), self.backoff_max)
+        # 加入抖動，避免同時失敗的工作同時重試
+        return delay * random.uniform(0.5, 1.0)
+
+    async def process(self, destination: str, job: Dict[str, Any]):
+        """執行單一工作並依結果完成、重試或轉入死信"""
+        try:
+            await asyncio.wait_for(self.handlers[destination](job), timeout=self.job_timeout)
+        except asyncio.CancelledError:
+            # 工作者關閉：保留 processing 狀態，租約到期後由其他工作者重新領取
+            raise
+        except Exception as e:
+            error = _describe(e)
+            if _is_permanent(e) or job["attempts"] >= self.max_attempts:
+                print(f"外送工作 #{job['id']} ({destination}) 轉入死信: {error}")
+                outbox_jobs_total.inc(destination=destination, result="dead")
+                await self.crud.dead_letter(job["id"], error)
+            else:
+                delay = self._backoff(job["attempts"])
+                print(f"外送工作 #{job['id']} ({destination}) 第 {job['attempts']} 次失敗，{delay:.0f} 秒後重試: {error}")
+                outbox_jobs_total.inc(destination=destination, result="retry")
+                await self.crud.retry_later(job["id"], error, delay)
+            return
+
+        outbox_jobs_total.inc(destination=destination, result="done")
+        await self.crud.complete(job["id"])
+
+    async def _run_job(self, destination: str, job: Dict[str, Any]):
+        try:
+            await self.process(destination, job)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # 更新佇列狀態失敗（D1 無法連線）：租約到期後會重新領取
+            print(f"外送工作 #{job['id']} 狀態更新失敗: {e}")
+
+    async def _wait(self, destination: str):
+        event = self._wakeups[destination]
+        try:
+            await asyncio.wait_for(event.wait(), timeout=self.poll_interval)
+        except asyncio.TimeoutError:
+            pass
+        event.clear()
+
+    async def _poll(self, destination: str):
+        active = self._active[destination]
+        limit = max(self.concurrency.get(destination, 1), 1)
+        while True:
+            if len(active) >= limit:
+                await asyncio.wait(active, return_when=asyncio.FIRST_COMPLETED)
+                continue
+
+            try:
+                jobs = await self.crud.claim(destination, limit - len(active), self.lease_seconds)
+            except Exception as e:
+                print(f"領取外送工作失敗 ({destination}): {e}")
+                jobs = []
+
+            if not jobs:
+                await self._wait(destination)
+                continue
+
+            for job in jobs:
+                task = asyncio.get_running_loop().create_task(self._run_job(destination, job))
+                active.add(task)
+                task.add_done_callback(active.discard)
+
+    async def start(self):
+        """啟動各目的地的領取迴圈（應用程式啟動時呼叫）"""
+        loop = asyncio.get_running_loop()
+        for destination in self.handlers:
+            task = self._pollers.get(destination)
+            if task is None or task.done():
+                self._wakeups[destination] = asyncio.Event()
+                self._pollers[destination] = loop.create_task(self._poll(destination))
+
+    async def stop(self, timeout: Optional[float] = None):
+        """停止領取，等待處理中的工作完成（逾時則取消，租約到期後重新領取）"""
+        for task in self._pollers.values():
+            task.cancel()
+        for task in self._pollers.values():
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._pollers.clear()
+
+        tasks = [task for tasks in self._active.values() for task in tasks]
+        if tasks:
+            _, pending = await asyncio.wait(tasks, timeout=timeout if timeout is not None else settings.OUTBOX_SHUTDOWN_TIMEOUT)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+# 創建全域實例
+outbox_worker = OutboxWorker()
@@ -21,11 +21,25 @@ from app.models.user import User, UserRole
 from app.models.post import PostStatus
 from app.models.review_log import ReviewAction
 from app.models.global_review_log import GlobalReviewAction
+from app.crud.post_d1 import post_d1
 from app.services.school_feature import school_feature_service
-from app.services.ig_publish import ig_publish_service
 from app.services.discord import discord_service
+from app.services.ig_publish import ig_publish_service
+from app.services.outbox import outbox_worker
 
 class PostService:
+    async def _destinations(self, db: Session, school_id: int) -> List[str]:
+        """
+        依學校的功能開關決定要外送的目的地
+        發布設定尚未寫入 D1 的目的地不排入（工作者無法發送，只會轉入死信）
+        """
+        features = await school_feature_service.get_features(db, school_id=school_id)
+        publishers = {"ig": ig_publish_service, "discord": discord_service}
+        return [
+            destination for destination, publisher in publishers.items()
+            if features[destination] and await publisher.can_deliver(school_id)
+        ]
+
     async def create_post(
         self,
         db: Session,
@@ -35,37 +49,9 @@ class PostService:
     ) -> dict:
         """
         創建貼文
+        新貼文待審核，審核通過時才寫入 IG / Discord 的外送工作
         """
-        post = post_crud.post.create(
-            db=db,
-            obj_in=post_in
-        )
-
-        # 檢查並觸發 IG 推播
-        if await school_feature_service.is_feature_enabled(db, school_id=post.school_id, feature="ig"):
-            try:
-                await ig_publish_service.publish_post(
-                    db=db,
-                    post_id=post.id,
-                    admin=author
-                )
-            except Exception as e:
-                # 記錄錯誤但不中斷流程
-                print(f"IG 推播失敗: {str(e)}")
-
-        # 檢查並觸發 Discord 推播
-        if await school_feature_service.is_feature_enabled(db, school_id=post.school_id, feature="discord"):
-            try:
-                await discord_service.publish_post(
-                    db=db,
-                    post_id=post.id,
-                    admin=author
-                )
-            except Exception as e:
-                # 記錄錯誤但不中斷流程
-                print(f"Discord 推播失敗: {str(e)}")
-
-        return post
+        return await post_d1.create(post_in, author_id=author.id if author else None)
 
     async def update_post(
         self,
@@ -77,8 +63,9 @@ class PostService:
     ) -> dict:
         """
         更新貼文
+        已通過審核的貼文重新推播更新後的內容
         """
-        post = post_crud.post.get(db, id=post_id)
+        post = await post_d1.get(post_id)
         if not post:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -86,42 +73,58 @@ class PostService:
             )
 
         # 檢查權限
-        if post.author_id != author.id and author.role != UserRole.ADMIN:
+        if post["author_id"] != author.id and author.role != UserRole.ADMIN:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="沒有權限修改此貼文"
             )
 
-        post = post_crud.post.update(
-            db=db,
-            db_obj=post,
-            obj_in=post_in
-        )
+        approved = (post_in.status or post["status"]) == PostStatus.approved
+        destinations = await self._destinations(db, post["school_id"]) if approved else []
+        post = await post_d1.update_with_outbox(post_id, post_in, destinations)
+        if destinations:
+            outbox_worker.notify()
+        return post
 
-        # 檢查並觸發 IG 推播
-        if await school_feature_service.is_feature_enabled(db, school_id=post.school_id, feature="ig"):
-            try:
-                await ig_publish_service.publish_post(
-                    db=db,
-                    post_id=post.id,
-                    admin=author
-                )
-            except Exception as e:
-                # 記錄錯誤但不中斷流程
-                print(f"IG 推播失敗: {str(e)}")
+    async def approve_post(
+        self,
+        db: Session,
+        *,
+        post_id: int,
+        reviewer: User,
+        review_comment: Optional[str] = None
+    ) -> dict:
+        """
+        審核通過貼文
+        IG / Discord 推播寫入外送佇列（與審核結果同一個批次），由背景工作者發送
+        """
+        # 檢查權限
+        if reviewer.role not in [UserRole.REVIEWER, UserRole.ADMIN, UserRole.DEV]:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="需要審核員權限"
+            )
 
-        # 檢查並觸發 Discord 推播
-        if await school_feature_service.is_feature_enabled(db, school_id=post.school_id, feature="discord"):
-            try:
-                await discord_service.publish_post(
-                    db=db,
-                    post_id=post.id,
-                    admin=author
-                )
-            except Exception as e:
-                # 記錄錯誤但不中斷流程
-                print(f"Discord 推播失敗: {str(e)}")
+        post = await post_d1.get(post_id)
+        if not post or post.get("deleted_at"):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="貼文不存在"
+            )
+
+        # 已通過的貼文不重複推播
+        if post["status"] == PostStatus.approved:
+            return post
 
+        destinations = await self._destinations(db, post["school_id"])
+        post = await post_d1.approve_post(
+            post_id,
+            reviewer.id,
+            review_comment=review_comment,
+            destinations=destinations
+        )
+        if destinations:
+            outbox_worker.notify()
         return post
 
 post_service = PostService()
@@ -0,0 +1,162 @@
+"""
+IG 渲染結果快取（以內容定址）
+輸出檔名為渲染輸入（模板、資源檔案版本、文字、設定）的雜湊，相同的預覽或重送直接返回既有檔案；
+輸出目錄的總大小有上限，超過時依最近使用時間淘汰
+"""
+import asyncio
+import hashlib
+import json
+import os
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.ttl_cache import CacheInfo
+
+# 逾時的渲染在子行程中繼續執行，稍後才寫出暫存檔；超過此秒數仍未出現的暫存檔不再追蹤
+ABANDONED_TMP_TTL = 3600.0
+
+def render_key(inputs: Dict[str, Any]) -> str:
+    """計算渲染輸入的雜湊（字典鍵排序，值無法序列化時以字串表示）"""
+    encoded = json.dumps(inputs, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+def file_version(path: Optional[str]) -> Optional[list]:
+    """資源檔案的修改時間與大小；檔案不存在時為 None"""
+    try:
+        stat = os.stat(path)
+    except (OSError, TypeError):
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+class RenderOutputCache:
+    """輸出目錄的 LRU 索引（同一行程內相同的渲染只執行一次）"""
+
+    def __init__(self, directory: str, max_bytes: Optional[int] = None):
+        self.directory = directory
+        self.max_bytes = max_bytes if max_bytes is not None else settings.IG_RENDER_OUTPUT_CACHE_MAX_BYTES
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        # 放棄等待的渲染的暫存路徑 -> 放棄時間（monotonic）
+        self._abandoned: Dict[str, float] = {}
+        self._loaded = False
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.png")
+
+    def _load(self):
+        """
+        首次使用時掃描輸出目錄（含舊版以時間命名的檔案），依修改時間排序
+        並移除先前行程遺留的暫存檔（超過渲染逾時仍未更名，不會再被使用）
+        """
+        if self._loaded:
+            return
+        self._loaded = True
+        os.makedirs(self.directory, exist_ok=True)
+        files = []
+        stale_before = time.time() - settings.IG_RENDER_TIMEOUT
+        for entry in os.scandir(self.directory):
+            if not entry.is_file():
+                continue
+            stat = entry.stat()
+            if entry.name.endswith(".png"):
+                files.append((stat.st_mtime, entry.name[:-4], stat.st_size))
+            elif entry.name.startswith(".") and entry.name.endswith(".tmp") and stat.st_mtime < stale_before:
+                self._remove(entry.path)
+        for _, name, size in sorted(files):
+            self._entries[name] = size
+            self.total_bytes += size
+        self._evict()
+
+    @staticmethod
+    def _remove(path: str) -> bool:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def _sweep_abandoned(self):
+        """移除逾時渲染稍後才寫出的暫存檔"""
+        now = time.monotonic()
+        for tmp_path, abandoned_at in list(self._abandoned.items()):
+            if self._remove(tmp_path) or now - abandoned_at > ABANDONED_TMP_TTL:
+                del self._abandoned[tmp_path]
+
+    def _add(self, key: str, size: int):
+        self.total_bytes += size - self._entries.pop(key, 0)
+        self._entries[key] = size
+        self._evict()
+
+    def _evict(self):
+        # 至少保留最新的一個檔案
+        while self.total_bytes > self.max_bytes and len(self._entries) > 1:
+            key, size = self._entries.popitem(last=False)
+            self.total_bytes -= size
+            self._remove(self.path_for(key))
+
+    def _hit(self, key: str) -> Optional[str]:
+        if key not in self._entries:
+            return None
+        path = self.path_for(key)
+        if not os.path.exists(path):
+            # 檔案被外部刪除
+            self.total_bytes -= self._entries.pop(key)
+            return None
+        self._entries.move_to_end(key)
+        # 更新修改時間，重新啟動後仍保留使用順序
+        os.utime(path)
+        return path
+
+    async def get_or_render(self, key: str, render: Callable[[str], Awaitable[Any]]) -> str:
+        """
+        返回 key 對應的輸出檔案；不存在時呼叫 render(暫存路徑) 產生
+        暫存檔完成後才更名為正式檔名，中途失敗不會留下不完整的快取
+        """
+        self._load()
+        path = self._hit(key)
+        if path:
+            self.hits += 1
+            return path
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.hits += 1
+            return await asyncio.shield(inflight)
+
+        self.misses += 1
+        self._sweep_abandoned()
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        path = self.path_for(key)
+        tmp_path = os.path.join(self.directory, f".{key}.{uuid.uuid4().hex}.tmp")
+        try:
+            await render(tmp_path)
+            os.replace(tmp_path, path)
+            self._add(key, os.path.getsize(path))
+        except BaseException as e:
+            if not self._remove(tmp_path):
+                # 渲染逾時時子行程可能仍在執行，之後才寫出暫存檔
+                self._abandoned[tmp_path] = time.monotonic()
+            future.set_exception(e)
+            # 沒有其他等待者時避免 "exception was never retrieved" 警告
+            future.exception()
+            raise
+        else:
+            future.set_result(path)
+        finally:
+            self._inflight.pop(key, None)
+        return path
+
+    def cache_info(self) -> CacheInfo:
+        return CacheInfo(self.hits, self.misses, self.max_bytes, len(self._entries))
+
+# 創建全域實例
+render_output_cache = RenderOutputCache(os.path.join(settings.UPLOAD_DIR, "ig_output"))
+metrics.register_cache("ig_render_output", render_output_cache.cache_info)
@@ -0,0 +1,120 @@
+"""
+渲染行程池
+以有上限的 ProcessPoolExecutor 執行 CPU 密集的圖片渲染，不阻塞事件迴圈；
+等待中的工作超過上限時直接拒絕（503），避免積壓的批次渲染拖垮 API
+"""
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Callable, Optional, Tuple
+
+from fastapi import HTTPException, status
+
+from app.core.config import settings
+from app.core.metrics import metrics
+
+render_queue_depth = metrics.gauge(
+    "forumkit_render_queue_depth",
+    "Renders submitted to the render pool and not yet finished"
+)
+render_duration_seconds = metrics.histogram(
+    "forumkit_render_duration_seconds",
+    "Render time by stage (queue wait, render in worker, total)",
+    ("stage",),
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+)
+render_rejected_total = metrics.counter(
+    "forumkit_render_rejected_total",
+    "Renders rejected because the render queue was full"
+)
+
+class RenderPool:
+    """渲染行程池的非同步介面"""
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        max_queue: Optional[int] = None,
+        timeout: Optional[float] = None,
+        start_method: Optional[str] = None
+    ):
+        self.max_workers = max_workers or settings.IG_RENDER_WORKERS or os.cpu_count() or 1
+        self.max_queue = max_queue if max_queue is not None else settings.IG_RENDER_MAX_QUEUE
+        self.timeout = timeout or settings.IG_RENDER_TIMEOUT
+        self.start_method = start_method or settings.IG_RENDER_START_METHOD
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pending = 0
+        # 完成回呼在行程池的管理執行緒中執行
+        self._lock = threading.Lock()
+
+    @property
+    def pending(self) -> int:
+        """已送出但尚未完成的渲染數（含執行中，以及逾時後仍在子行程中執行的渲染）"""
+        return self._pending
+
+    def _release(self, future: Optional[Future]):
+        with self._lock:
+            self._pending -= 1
+        render_queue_depth.dec()
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        """取得行程池（首次使用時建立）"""
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context(self.start_method)
+            )
+        return self._executor
+
+    async def run(self, fn: Callable[[Any], Tuple[Any, float]], job: Any) -> Any:
+        """
+        在行程池中執行 fn(job)，fn 返回 (結果, 渲染耗時秒數)
+        佇列已滿時拋出 503；逾時拋出 504（尚未送入子行程的渲染會被取消；已送入的渲染無法中止，
+        結果被捨棄，但完成前仍計入等待中的渲染數）
+        """
+        with self._lock:
+            if self._pending >= self.max_workers + self.max_queue:
+                render_rejected_total.inc()
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail={"code": "RENDER_QUEUE_FULL", "message": "圖片渲染佇列已滿，請稍後再試"}
+                )
+            self._pending += 1
+        render_queue_depth.inc()
+
+        started = time.perf_counter()
+        try:
+            submitted = self.executor.submit(fn, job)
+        except BaseException:
+            self._release(None)
+            raise
+        # 名額在子行程真正結束（或未開始即取消）時才釋放，而不是在呼叫端停止等待時
+        submitted.add_done_callback(self._release)
+
+        try:
+            # 逾時時取消等待會一併取消尚未送入子行程的渲染
+            result, render_seconds = await asyncio.wait_for(asyncio.wrap_future(submitted), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            raise HTTPException(
+                status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+                detail={"code": "RENDER_TIMEOUT", "message": "圖片渲染逾時"}
+            )
+
+        total = time.perf_counter() - started
+        render_duration_seconds.observe(render_seconds, stage="render")
+        render_duration_seconds.observe(max(total - render_seconds, 0.0), stage="queue")
+        render_duration_seconds.observe(total, stage="total")
+        return result
+
+    def shutdown(self):
+        """關閉行程池（應用程式關閉時呼叫），不等待尚未開始的渲染"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+# 創建全域實例
+render_pool = RenderPool()
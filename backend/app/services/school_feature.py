@@ -1,4 +1,5 @@
-from typing import Optional, Dict, Any, List
+from types import MappingProxyType
+from typing import Optional, Dict, Any, List, Mapping
 from fastapi import HTTPException, status
 from sqlalchemy.orm import Session
 
@@ -9,8 +10,31 @@ from app.schemas.school_feature_toggle import (
     SchoolFeatureToggleUpdate
 )
 from app.models.user import User, UserRole
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.ttl_cache import MISSING, TTLCache
+
+# 功能名稱與開關欄位的對應
+FEATURE_FIELDS = {
+    "ig": "enable_ig",
+    "discord": "enable_discord",
+    "comments": "enable_comments",
+    "cross_school": "enable_cross_school"
+}
 
 class SchoolFeatureService:
+    def __init__(self):
+        # 學校 ID -> 各功能是否啟用；開關極少變動，由 create_toggle / update_toggle 主動失效
+        self._feature_cache = TTLCache(
+            ttl=settings.FEATURE_TOGGLE_CACHE_TTL,
+            maxsize=settings.FEATURE_TOGGLE_CACHE_SIZE
+        )
+        metrics.register_cache("school_feature_toggle", self._feature_cache.cache_info)
+
+    def invalidate_features(self, school_id: int):
+        """清除學校的功能開關快取"""
+        self._feature_cache.invalidate(school_id)
+
     async def create_toggle(
         self,
         db: Session,
@@ -29,7 +53,7 @@ class SchoolFeatureService:
             )
 
         # 檢查是否已存在
-        existing = toggle_crud.school_feature_toggle.get_by_school(
+        existing = toggle_crud.get_by_school(
             db=db,
             school_id=toggle_in.school_id
         )
@@ -41,17 +65,19 @@ class SchoolFeatureService:
 
         # 檢查 IG 模板是否存在
         if toggle_in.ig_template_id:
-            template = template_crud.ig_template.get(db, id=toggle_in.ig_template_id)
+            template = template_crud.get(db, id=toggle_in.ig_template_id)
             if not template:
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
                     detail="IG 模板不存在"
                 )
 
-        return toggle_crud.school_feature_toggle.create(
+        toggle = toggle_crud.create(
             db=db,
             obj_in=toggle_in
         )
+        self.invalidate_features(toggle.school_id)
+        return toggle
 
     async def update_toggle(
         self,
@@ -71,7 +97,7 @@ class SchoolFeatureService:
                 detail="需要管理員權限"
             )
 
-        toggle = toggle_crud.school_feature_toggle.get(db, id=toggle_id)
+        toggle = toggle_crud.get(db, id=toggle_id)
         if not toggle:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -80,18 +106,23 @@ class SchoolFeatureService:
 
         # 檢查 IG 模板是否存在
         if toggle_in.ig_template_id:
-            template = template_crud.ig_template.get(db, id=toggle_in.ig_template_id)
+            template = template_crud.get(db, id=toggle_in.ig_template_id)
             if not template:
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
                     detail="IG 模板不存在"
                 )
 
-        return toggle_crud.school_feature_toggle.update(
+        # 更新可能變更 school_id，新舊學校的快取都要失效
+        previous_school_id = toggle.school_id
+        toggle = toggle_crud.update(
             db=db,
             db_obj=toggle,
             obj_in=toggle_in
         )
+        self.invalidate_features(previous_school_id)
+        self.invalidate_features(toggle.school_id)
+        return toggle
 
     async def get_toggle(
         self,
@@ -102,7 +133,7 @@ class SchoolFeatureService:
         """
         獲取學校功能開關設定
         """
-        return toggle_crud.school_feature_toggle.get_by_school(
+        return toggle_crud.get_by_school(
             db=db,
             school_id=school_id
         )
@@ -117,12 +148,33 @@ class SchoolFeatureService:
         """
         獲取所有學校功能開關設定
         """
-        return toggle_crud.school_feature_toggle.get_multi(
+        return toggle_crud.get_multi(
             db=db,
             skip=skip,
             limit=limit
         )
 
+    async def get_features(
+        self,
+        db: Session,
+        *,
+        school_id: int
+    ) -> Mapping[str, bool]:
+        """
+        一次取得學校所有功能的啟用狀態（快取 FEATURE_TOGGLE_CACHE_TTL 秒）
+        返回快取中的唯讀對應，呼叫端無法修改其他請求看到的結果
+        """
+        features = self._feature_cache.get(school_id)
+        if features is MISSING:
+            toggle = await self.get_toggle(db, school_id=school_id)
+            # 未設定開關的學校同樣快取（全部停用），避免每次都查詢資料庫
+            features = MappingProxyType({
+                feature: bool(toggle and getattr(toggle, field))
+                for feature, field in FEATURE_FIELDS.items()
+            })
+            self._feature_cache.set(school_id, features)
+        return features
+
     async def is_feature_enabled(
         self,
         db: Session,
@@ -133,17 +185,7 @@ class SchoolFeatureService:
         """
         檢查特定功能是否啟用
         """
-        toggle = await self.get_toggle(db, school_id=school_id)
-        if not toggle:
-            return False
-
-        feature_map = {
-            "ig": toggle.enable_ig,
-            "discord": toggle.enable_discord,
-            "comments": toggle.enable_comments,
-            "cross_school": toggle.enable_cross_school
-        }
-
-        return feature_map.get(feature, False)
+        features = await self.get_features(db, school_id=school_id)
+        return features.get(feature, False)
 
 school_feature_service = SchoolFeatureService() 
\ No newline at end of file
@@ -0,0 +1,195 @@
+import asyncio
+import json
+
+import httpx
+
+from app.db.d1_adapter import D1Adapter, D1Session, build_sql
+
+
+def make_adapter(handler):
+    return D1Adapter(
+        account_id="account",
+        database_id="database",
+        api_token="token",
+        transport=httpx.MockTransport(handler),
+    )
+
+
+def d1_response(results=None, meta=None):
+    return {
+        "success": True,
+        "result": [{"results": results or [], "meta": meta or {}}],
+    }
+
+
+def test_queries_share_one_client():
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200, json=d1_response([{"id": 1}]))
+
+    adapter = make_adapter(handler)
+
+    async def run():
+        client = adapter.client
+        await adapter.select("posts", where={"id": 1}, limit=1)
+        await adapter.custom_query("SELECT 1")
+        assert adapter.client is client
+        await adapter.aclose()
+
+    asyncio.run(run())
+
+    assert len(requests) == 2
+    assert requests[0].url.path.endswith("/d1/database/database/query")
+    assert requests[0].headers["Authorization"] == "Bearer token"
+    assert json.loads(requests[0].content) == {
+        "sql": "SELECT * FROM posts WHERE id = ? LIMIT ? OFFSET ?",
+        "params": [1, 1, 0],
+    }
+
+
+def test_aclose_recreates_client_on_next_use():
+    adapter = make_adapter(lambda request: httpx.Response(200, json=d1_response()))
+
+    async def run():
+        first = adapter.client
+        await adapter.aclose()
+        assert first.is_closed
+        assert adapter.client is not first
+        await adapter.aclose()
+
+    asyncio.run(run())
+
+
+class FakeColumn:
+    def __init__(self, name):
+        self.name = name
+
+
+class FakePost:
+    __tablename__ = "posts"
+
+    class __table__:
+        columns = [FakeColumn("id"), FakeColumn("title"), FakeColumn("school_id")]
+
+    def __init__(self, id=None, title=None, school_id=None):
+        self.id = id
+        self.title = title
+        self.school_id = school_id
+
+
+def test_session_commit_sends_one_batch():
+    requests = []
+
+    def handler(request):
+        requests.append(json.loads(request.content))
+        return httpx.Response(200, json={
+            "success": True,
+            "result": [
+                {"results": [], "meta": {"last_row_id": 11, "changes": 1}},
+                {"results": [], "meta": {"last_row_id": 0, "changes": 1}},
+                {"results": [], "meta": {"last_row_id": 12, "changes": 1}},
+            ],
+        })
+
+    adapter = make_adapter(handler)
+    session = D1Session(adapter)
+    first = FakePost(title="a", school_id=1)
+    second = FakePost(title="b", school_id=1)
+    session.add(first)
+    session.delete(FakePost(id=3))
+    session.add(second)
+
+    asyncio.run(session.commit())
+
+    assert len(requests) == 1
+    assert [query["sql"] for query in requests[0]] == [
+        "INSERT INTO posts (title, school_id) VALUES (?, ?)",
+        "DELETE FROM posts WHERE id = ?",
+        "INSERT INTO posts (title, school_id) VALUES (?, ?)",
+    ]
+    assert (first.id, second.id) == (11, 12)
+    assert session._pending_operations == []
+
+
+def test_writes_use_returning():
+    statements = []
+
+    def handler(request):
+        body = json.loads(request.content)
+        statements.append(body["sql"])
+        return httpx.Response(200, json=d1_response([{"id": 7, "title": "a"}]))
+
+    adapter = make_adapter(handler)
+
+    async def run():
+        created = await adapter.insert_returning("posts", {"title": "a"})
+        updated = await adapter.update_returning("posts", {"title": "a"}, {"id": 7})
+        deleted = await adapter.delete_returning("posts", {"id": 7})
+        await adapter.aclose()
+        return created, updated, deleted
+
+    created, updated, deleted = asyncio.run(run())
+
+    assert created == {"id": 7, "title": "a"}
+    assert updated == deleted == [{"id": 7, "title": "a"}]
+    assert statements == [
+        "INSERT INTO posts (title) VALUES (?) RETURNING *",
+        "UPDATE posts SET title = ? WHERE id = ? RETURNING *",
+        "DELETE FROM posts WHERE id = ? RETURNING *",
+    ]
+
+
+def test_sql_templates_are_cached_by_shape():
+    statements = []
+
+    def handler(request):
+        body = json.loads(request.content)
+        statements.append(body)
+        return httpx.Response(200, json=d1_response([{"count": 3}]))
+
+    adapter = make_adapter(handler)
+
+    async def run():
+        await adapter.select("comments", where={"post_id": 1}, limit=20, offset=40, order_by="created_at ASC")
+        await adapter.select("comments", where={"post_id": 2}, limit=10, order_by="created_at ASC")
+        count = await adapter.count("comments", where={"post_id": 2})
+        await adapter.aclose()
+        return count
+
+    build_sql.cache_clear()
+    assert asyncio.run(run()) == 3
+    assert statements[0]["sql"] == statements[1]["sql"]
+    assert statements[0]["params"] == [1, 20, 40]
+    assert statements[1]["params"] == [2, 10, 0]
+    assert statements[2]["sql"] == "SELECT COUNT(*) as count FROM comments WHERE post_id = ?"
+    assert build_sql.cache_info().hits == 1
+
+
+def test_update_and_delete_require_a_where_condition():
+    requests = []
+    adapter = make_adapter(lambda request: requests.append(request) or httpx.Response(200, json=d1_response()))
+
+    async def run():
+        for call in (
+            adapter.update("posts", {"status": "approved"}, {}),
+            adapter.update_returning("posts", {"status": "approved"}, None),
+            adapter.delete("posts", {}),
+            adapter.delete_returning("posts", None),
+        ):
+            try:
+                await call
+            except ValueError:
+                continue
+            raise AssertionError("unconditional write was sent")
+        # 查詢與計數仍可不帶條件
+        await adapter.select("posts")
+        await adapter.count("posts")
+        await adapter.aclose()
+
+    asyncio.run(run())
+    assert [json.loads(request.content)["sql"] for request in requests] == [
+        "SELECT * FROM posts",
+        "SELECT COUNT(*) as count FROM posts",
+    ]
@@ -0,0 +1,135 @@
+import asyncio
+
+import httpx
+
+from app.db.d1_adapter import D1Adapter
+from app.db.d1_health import D1HealthProbe
+from app.db.sqlite_adapter import SQLiteD1Adapter
+
+
+def make_adapter(handler):
+    return D1Adapter(
+        account_id="account",
+        database_id="database",
+        api_token="token",
+        max_connections=4,
+        transport=httpx.MockTransport(handler),
+    )
+
+
+def ok_response():
+    return httpx.Response(200, json={"success": True, "result": [{"results": [{"1": 1}], "meta": {"duration": 0.1}}]})
+
+
+def test_probe_result_is_cached_within_ttl():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return ok_response()
+
+    probe = D1HealthProbe(adapter=make_adapter(handler), ttl=60)
+
+    async def scenario():
+        results = await asyncio.gather(*(probe.check() for _ in range(5)))
+        await probe.check()
+        return results
+
+    results = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert all(result["ok"] for result in results)
+    assert results[0]["error"] is None
+
+    probe.invalidate()
+    asyncio.run(probe.check())
+    assert len(calls) == 2
+
+
+def test_probe_reports_timeout_and_errors():
+    async def slow_handler(request):
+        await asyncio.sleep(0.5)
+        return ok_response()
+
+    probe = D1HealthProbe(adapter=make_adapter(slow_handler), ttl=0, timeout=0.05)
+    result = asyncio.run(probe.check())
+    assert result["ok"] is False
+    assert "timeout" in result["error"]
+
+    probe = D1HealthProbe(adapter=make_adapter(lambda request: httpx.Response(500, text="boom")), ttl=0)
+    result = asyncio.run(probe.check())
+    assert result["ok"] is False
+    assert "boom" in result["error"]
+
+
+def test_pool_status_tracks_in_flight_requests():
+    release = asyncio.Event()
+
+    async def handler(request):
+        await release.wait()
+        return ok_response()
+
+    adapter = make_adapter(handler)
+
+    async def scenario():
+        tasks = [asyncio.create_task(adapter.execute_query("SELECT 1")) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        during = adapter.pool_status()
+        release.set()
+        await asyncio.gather(*tasks)
+        return during
+
+    during = asyncio.run(scenario())
+    assert during == {"in_flight": 2, "max_connections": 4, "saturation": 0.5}
+    assert adapter.pool_status()["in_flight"] == 0
+
+
+def test_readiness_gates_on_outbox_backlog_and_render_queue(monkeypatch):
+    from app import main
+
+    async def d1_ok():
+        return {"ok": True, "latency_ms": 1.0, "error": None, "age_s": 0.0}
+
+    backlog = {"ok": True, "due": 0, "oldest_due_s": 0, "error": None}
+
+    async def backlog_status():
+        return backlog
+
+    monkeypatch.setattr(main.d1_health_probe, "check", d1_ok)
+    monkeypatch.setattr(main, "get_d1_adapter", lambda: make_adapter(lambda request: ok_response()))
+    monkeypatch.setattr(main.outbox_worker, "backlog_status", backlog_status)
+    monkeypatch.setattr(main.settings, "HEALTH_MAX_RENDER_PENDING", 2)
+
+    response = asyncio.run(main.readiness_check())
+    assert response.status_code == 200
+
+    monkeypatch.setattr(main.render_pool, "_pending", 3)
+    response = asyncio.run(main.readiness_check())
+    assert response.status_code == 503
+    assert b'"render_pool":{"pending":3,"ok":false}' in response.body
+
+    monkeypatch.setattr(main.render_pool, "_pending", 0)
+    backlog.update(ok=False, due=5000)
+    response = asyncio.run(main.readiness_check())
+    assert response.status_code == 503
+    assert b'"due":5000' in response.body
+
+
+def test_readiness_ignores_saturation_of_the_local_connection(tmp_path, monkeypatch):
+    from app import main
+
+    async def d1_ok():
+        return {"ok": True, "latency_ms": 1.0, "error": None, "age_s": 0.0}
+
+    async def backlog_status():
+        return {"ok": True, "due": 0, "oldest_due_s": 0, "error": None}
+
+    adapter = SQLiteD1Adapter(str(tmp_path / "forumkit.sqlite3"))
+    monkeypatch.setattr(main.d1_health_probe, "check", d1_ok)
+    monkeypatch.setattr(main, "get_d1_adapter", lambda: adapter)
+    monkeypatch.setattr(main.outbox_worker, "backlog_status", backlog_status)
+
+    # 唯一的連線正在執行查詢（例如外送佇列的領取迴圈）
+    adapter.in_flight = 1
+    response = asyncio.run(main.readiness_check())
+    assert response.status_code == 200
+    assert b'"d1_pool":{"in_flight":1,"max_connections":1,"saturation":null,"ok":true}' in response.body
@@ -0,0 +1,85 @@
+import asyncio
+import json
+
+import httpx
+
+from app.crud.d1_base import CRUDBase
+from app.db.d1_adapter import D1Adapter
+from app.db.d1_loader import d1_loader_scope
+
+
+def make_crud(handler, table_name="posts"):
+    crud = CRUDBase(table_name)
+    crud.adapter = D1Adapter(
+        account_id="account",
+        database_id="database",
+        api_token="token",
+        transport=httpx.MockTransport(handler),
+    )
+    return crud
+
+
+def test_concurrent_gets_are_coalesced():
+    requests = []
+
+    def handler(request):
+        queries = json.loads(request.content)
+        requests.append(queries)
+        return httpx.Response(200, json={
+            "success": True,
+            "result": [
+                {"results": [{"id": id} for id in query["params"] if id != 404], "meta": {}}
+                for query in queries
+            ],
+        })
+
+    crud = make_crud(handler)
+
+    async def run():
+        with d1_loader_scope(crud.adapter):
+            return await asyncio.gather(
+                crud.get(1), crud.get(2), crud.get(1), crud.get(404)
+            )
+
+    results = asyncio.run(run())
+
+    assert results == [{"id": 1}, {"id": 2}, {"id": 1}, None]
+    assert len(requests) == 1
+    assert requests[0] == [
+        {"sql": "SELECT * FROM posts WHERE id IN (?, ?, ?)", "params": [1, 2, 404]}
+    ]
+
+
+def test_update_forgets_cached_row():
+    calls = []
+
+    def handler(request):
+        body = json.loads(request.content)
+        calls.append(body)
+        if isinstance(body, list):
+            return httpx.Response(200, json={
+                "success": True,
+                "result": [{"results": [{"id": 1, "title": f"v{len(calls)}"}], "meta": {}}],
+            })
+        return httpx.Response(200, json={
+            "success": True,
+            "result": [{"results": [{"id": 1, "title": "new"}], "meta": {"changes": 1}}],
+        })
+
+    crud = make_crud(handler)
+
+    async def run():
+        with d1_loader_scope(crud.adapter):
+            before = await crud.get(1)
+            again = await crud.get(1)
+            updated = await crud.update(1, {"title": "new"})
+            after = await crud.get(1)
+            return before, again, updated, after
+
+    before, again, updated, after = asyncio.run(run())
+
+    assert before is again
+    assert updated["title"] == "new"
+    assert after["title"] == "v3"
+    assert calls[1]["sql"].endswith("RETURNING *")
+    assert len(calls) == 3
@@ -0,0 +1,103 @@
+import asyncio
+
+import httpx
+
+from app.db.d1_adapter import D1Adapter
+from app.db.d1_query_log import (
+    D1QueryStats,
+    QueryRecord,
+    RequestQueryLog,
+    d1_query_log_scope,
+    fingerprint,
+    query_stats,
+)
+
+
+def make_adapter(handler):
+    return D1Adapter(
+        account_id="account",
+        database_id="database",
+        api_token="token",
+        transport=httpx.MockTransport(handler),
+    )
+
+
+def test_fingerprint_collapses_literals_and_lists():
+    assert fingerprint("SELECT *  FROM posts\n WHERE id IN (?, ?, ?) AND status = 'approved' LIMIT 10") == (
+        "SELECT * FROM posts WHERE id IN (...) AND status = ? LIMIT ?"
+    )
+    assert fingerprint("INSERT INTO t (a, b) VALUES (?, ?), (?, ?), (?, ?)") == "INSERT INTO t (a, b) VALUES (...)"
+
+
+def test_round_trips_are_recorded_in_request_scope():
+    def handler(request):
+        return httpx.Response(200, json={
+            "success": True,
+            "result": [
+                {"results": [{"id": 1}, {"id": 2}], "meta": {"duration": 1.5}},
+                {"results": [], "meta": {"duration": 0.5}},
+            ],
+        })
+
+    adapter = make_adapter(handler)
+
+    async def run():
+        with d1_query_log_scope() as log:
+            await adapter.execute_query("SELECT * FROM posts WHERE id = ?", [1])
+            await adapter.execute_batch([
+                {"sql": "SELECT * FROM posts WHERE id = ?", "params": [2]},
+                {"sql": "UPDATE posts SET like_count = like_count + 1 WHERE id = ?", "params": [2]},
+            ])
+        await adapter.aclose()
+        return log
+
+    log = asyncio.run(run())
+
+    assert log.round_trips == 2
+    assert [record.batch_size for record in log.records] == [1, 2, 2]
+    assert [record.rows for record in log.records] == [2, 2, 0]
+    assert log.d1_ms == 1.5 + 1.5 + 0.5
+    assert all(record.payload_bytes > 0 for record in log.records)
+    assert log.fingerprint_counts()["SELECT * FROM posts WHERE id = ?"] == 2
+    assert log.server_timing().startswith('d1;dur=')
+    assert '3 queries / 2 round trips' in log.server_timing()
+
+
+def test_slow_queries_and_histograms():
+    stats = D1QueryStats(slow_query_ms=100, slow_log_size=2)
+    for network_ms in (3, 40, 120, 5000):
+        stats.observe(QueryRecord("SELECT ?", rows=1, d1_ms=1, network_ms=network_ms, payload_bytes=10))
+
+    snapshot = stats.snapshot()
+    histogram = snapshot["fingerprints"][0]["histogram_ms"]
+    assert histogram["5"] == histogram["50"] == histogram["250"] == histogram["+Inf"] == 1
+    assert [entry["network_ms"] for entry in snapshot["slow_queries"]] == [120, 5000]
+
+
+def test_request_counts_expose_n_plus_one_routes():
+    stats = D1QueryStats()
+    log = RequestQueryLog()
+    for _ in range(12):
+        record = QueryRecord("SELECT * FROM users WHERE id = ?", rows=1, d1_ms=1, network_ms=2, payload_bytes=10)
+        stats.observe(record)
+        log.records.append(record)
+
+    stats.observe_request("/api/v1/posts/", log)
+
+    entry = stats.snapshot()["fingerprints"][0]
+    assert entry["max_per_request"] == 12
+    assert entry["routes"] == {"/api/v1/posts/": 12}
+
+
+def test_global_stats_collect_outside_requests():
+    query_stats.reset()
+    adapter = make_adapter(lambda request: httpx.Response(200, json={"success": True, "result": [{"results": []}]}))
+
+    async def run():
+        await adapter.custom_query("SELECT 1")
+        await adapter.aclose()
+
+    asyncio.run(run())
+
+    assert [entry["fingerprint"] for entry in query_stats.snapshot()["fingerprints"]] == ["SELECT ?"]
+    query_stats.reset()
@@ -1,94 +1,95 @@
-import sys
-import types
-import os
-sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 import asyncio
-from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+from app.crud.discord_settings_d1 import discord_settings_d1
+from app.crud.post_d1 import post_d1
+from app.db.sqlite_adapter import SQLiteD1Adapter
+from app.models.user import UserRole
+from app.schemas.post import PostCreate
+from app.services import discord
+from app.services.discord import discord_service
+
 
-# create stub aiohttp module
-aiohttp = types.ModuleType('aiohttp')
 class DummyResponse:
     def __init__(self, status=204):
         self.status = status
+
     async def __aenter__(self):
         return self
+
     async def __aexit__(self, exc_type, exc, tb):
         pass
-class DummySession:
-    async def __aenter__(self):
-        return self
-    async def __aexit__(self, exc_type, exc, tb):
-        pass
-    def post(self, url, json):
-        return DummyResponse()
-aiohttp.ClientSession = lambda *args, **kwargs: DummySession()
-sys.modules['aiohttp'] = aiohttp
-
-
-# stub sqlalchemy.orm.Session
-sqlalchemy = types.ModuleType('sqlalchemy')
-orm = types.ModuleType('sqlalchemy.orm')
-class Session:  # simple placeholder
-    pass
-orm.Session = Session
-sqlalchemy.orm = orm
-sys.modules['sqlalchemy'] = sqlalchemy
-sys.modules['sqlalchemy.orm'] = orm
-
-# stub config settings
-config = types.ModuleType('app.core.config')
-config.settings = types.SimpleNamespace(FRONTEND_URL='http://frontend')
-sys.modules['app.core.config'] = config
-
-# stub CRUD modules
-post_obj = types.SimpleNamespace(
-    id=1,
-    title='Test',
-    content='content',
-    created_at=datetime.now(),
-    school_id=1
-)
-post_module = types.ModuleType('app.crud.post')
-post_module.post = types.SimpleNamespace(get=lambda db, id: post_obj)
-sys.modules['app.crud.post'] = post_module
-
-discord_entity = types.SimpleNamespace(
-    post_webhook_url='http://webhook',
-    report_webhook_url='http://report',
-    FRONTEND_URL='http://frontend'
-)
-crud_ds_module = types.ModuleType('app.crud.discord_settings')
-crud_ds_module.discord_settings = types.SimpleNamespace(
-    get_by_school=lambda db, school_id: discord_entity,
-    get=lambda db, id: discord_entity,
-    create=lambda *a, **k: discord_entity,
-    update=lambda *a, **k: discord_entity,
-)
-sys.modules['app.crud.discord_settings'] = crud_ds_module
-
-# stub schema module
-schema_module = types.ModuleType('app.schemas.discord_settings')
-schema_module.DiscordSettingsCreate = type('DiscordSettingsCreate', (), {})
-schema_module.DiscordSettingsUpdate = type('DiscordSettingsUpdate', (), {})
-sys.modules['app.schemas.discord_settings'] = schema_module
-
-# stub user model
-model_user = types.ModuleType('app.models.user')
-class UserRole:
-    ADMIN = 'admin'
-class User:
-    def __init__(self, role):
-        self.role = role
-        self.username = 'tester'
-model_user.UserRole = UserRole
-model_user.User = User
-sys.modules['app.models.user'] = model_user
-
-# import the service after stubs are ready
-from app.services.discord import discord_service
 
 
-def test_publish_post_success():
-    admin = model_user.User(UserRole.ADMIN)
+@pytest.fixture
+def webhooks(tmp_path, monkeypatch):
+    adapter = SQLiteD1Adapter(str(tmp_path / "forumkit.sqlite3"))
+    monkeypatch.setattr(post_d1, "adapter", adapter)
+    monkeypatch.setattr(discord_settings_d1, "adapter", adapter)
+
+    async def seed():
+        await adapter.insert("schools", {"name": "A", "domain": "a.edu.tw"})
+        await adapter.insert("discord_settings", {"school_id": 1, "webhook_url": "http://webhook"})
+        await post_d1.create(PostCreate(title="Test", content="content", school_id=1))
+        await post_d1.create(PostCreate(title="Pending", content="content", school_id=1))
+        await adapter.update("posts", {"status": "approved"}, {"id": 1})
+
+    asyncio.run(seed())
+
+    sent = []
+    status = {"code": 204}
+
+    class DummySession:
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, exc_type, exc, tb):
+            pass
+
+        def post(self, url, json):
+            sent.append((url, json))
+            return DummyResponse(status["code"])
+
+    monkeypatch.setattr(discord.aiohttp, "ClientSession", lambda *args, **kwargs: DummySession())
+    yield sent, status
+    asyncio.run(adapter.aclose())
+
+
+def test_publish_post_success(webhooks):
+    sent, _ = webhooks
+    admin = SimpleNamespace(role=UserRole.ADMIN)
     result = asyncio.run(discord_service.publish_post(db=None, post_id=1, admin=admin))
     assert result == {'success': True}
+
+    url, body = sent[0]
+    assert url == "http://webhook"
+    embed = body["embeds"][0]
+    assert embed["title"] == "Test"
+    assert embed["url"].endswith("/posts/1")
+
+
+def test_publish_post_requires_admin_and_settings(webhooks):
+    sent, status = webhooks
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(discord_service.publish_post(db=None, post_id=1, admin=SimpleNamespace(role=UserRole.USER)))
+    assert error.value.status_code == 403
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(discord_service.deliver_post(post_id=99))
+    assert error.value.status_code == 404
+
+    # 未通過審核的貼文不推播
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(discord_service.deliver_post(post_id=2))
+    assert error.value.status_code == 400
+    assert sent == []
+
+    # webhook 失敗時以 5xx 回報，外送佇列會稍後重試
+    status["code"] = 500
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(discord_service.deliver_post(post_id=1))
+    assert error.value.status_code == 500
+    assert len(sent) == 1
@@ -0,0 +1,111 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jose import jwk, jwt
+
+from app.core.google_auth import GoogleKeySet, GoogleTokenVerifier
+
+CLIENT_ID = "client.apps.googleusercontent.com"
+
+
+def make_key(kid):
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    private_pem = private_key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    )
+    public_pem = private_key.public_key().public_bytes(
+        serialization.Encoding.PEM,
+        serialization.PublicFormat.SubjectPublicKeyInfo,
+    )
+    public_jwk = jwk.construct(public_pem, "RS256").to_dict()
+    public_jwk = {key: value.decode() if isinstance(value, bytes) else value for key, value in public_jwk.items()}
+    return private_pem, {**public_jwk, "kid": kid, "use": "sig"}
+
+
+def sign(private_pem, kid, **claims):
+    now = int(time.time())
+    payload = {
+        "iss": "https://accounts.google.com",
+        "aud": CLIENT_ID,
+        "sub": "1234",
+        "email": "student@test.edu.tw",
+        "iat": now,
+        "exp": now + 3600,
+        **claims,
+    }
+    return jwt.encode(payload, private_pem, algorithm="RS256", headers={"kid": kid})
+
+
+class FakeGoogle:
+    """以本機金鑰模擬 Google 的 JWKS 端點"""
+
+    def __init__(self, *keys, cache_control="public, max-age=3600"):
+        self.keys = list(keys)
+        self.cache_control = cache_control
+        self.requests = 0
+
+    def handler(self, request):
+        self.requests += 1
+        return httpx.Response(200, json={"keys": self.keys}, headers={"Cache-Control": self.cache_control})
+
+    def verifier(self):
+        key_set = GoogleKeySet(transport=httpx.MockTransport(self.handler), min_refresh_interval=0)
+        return GoogleTokenVerifier(client_id=CLIENT_ID, key_set=key_set)
+
+
+def test_tokens_are_verified_locally_with_cached_keys():
+    private_pem, public_jwk = make_key("k1")
+    google = FakeGoogle(public_jwk)
+    verifier = google.verifier()
+
+    async def scenario():
+        tokens = [sign(private_pem, "k1", sub=str(i)) for i in range(5)]
+        claims = await asyncio.gather(*(verifier.verify(token) for token in tokens))
+        again = await verifier.verify(tokens[0])
+        return claims, again
+
+    claims, again = asyncio.run(scenario())
+    assert [claim["sub"] for claim in claims] == ["0", "1", "2", "3", "4"]
+    assert again["sub"] == "0"
+    assert google.requests == 1
+
+
+def test_invalid_tokens_are_rejected():
+    private_pem, public_jwk = make_key("k1")
+    other_pem, _ = make_key("k1")
+    verifier = FakeGoogle(public_jwk).verifier()
+
+    for token in (
+        sign(private_pem, "k1", aud="someone-else"),
+        sign(private_pem, "k1", iss="https://evil.example.com"),
+        sign(private_pem, "k1", exp=int(time.time()) - 3600),
+        sign(other_pem, "k1"),
+        "not-a-token",
+    ):
+        with pytest.raises(ValueError):
+            asyncio.run(verifier.verify(token))
+
+
+def test_key_rotation_and_cache_control_trigger_refetch():
+    old_pem, old_jwk = make_key("old")
+    new_pem, new_jwk = make_key("new")
+    google = FakeGoogle(old_jwk, cache_control="max-age=0")
+    verifier = google.verifier()
+
+    asyncio.run(verifier.verify(sign(old_pem, "old")))
+    # max-age=0：下一次驗證需重新取得金鑰
+    asyncio.run(verifier.verify(sign(old_pem, "old", sub="other")))
+    assert google.requests == 2
+
+    google.keys = [new_jwk]
+    google.cache_control = "max-age=3600"
+    asyncio.run(verifier.verify(sign(new_pem, "new")))
+    assert google.requests == 3
+    asyncio.run(verifier.verify(sign(new_pem, "new", sub="other")))
+    assert google.requests == 3
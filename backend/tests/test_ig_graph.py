@@ -0,0 +1,145 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from app.services.ig_graph import InstagramGraphClient, InstagramGraphError, _usage_from_headers
+
+
+class FakeGraph:
+    """以本機處理函式模擬 Graph API，依序回傳預先設定的回應"""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def handler(self, request):
+        self.requests.append(request)
+        return self.responses.pop(0)
+
+    def client(self, **options):
+        options.setdefault("backoff_base", 0.001)
+        return InstagramGraphClient(
+            "https://graph.test/v18.0",
+            transport=httpx.MockTransport(self.handler),
+            **options
+        )
+
+
+def graph_error(status_code, code, message="error", **extra):
+    return httpx.Response(status_code, json={"error": {"code": code, "message": message, **extra}})
+
+
+def test_rate_limited_posts_are_retried():
+    graph = FakeGraph(
+        graph_error(400, 4, "Application request limit reached"),
+        httpx.Response(429, text="too many requests"),
+        httpx.Response(200, json={"id": "container-1"}),
+    )
+    client = graph.client()
+
+    result = asyncio.run(client.post("/me/media", "token", {"image_url": "https://cdn/1.png", "caption": "hi"}))
+    assert result == {"id": "container-1"}
+    assert len(graph.requests) == 3
+    request = graph.requests[-1]
+    assert request.url.path == "/v18.0/me/media"
+    assert request.url.params["access_token"] == "token"
+    assert request.url.params["caption"] == "hi"
+
+
+def test_posts_are_not_retried_when_they_may_have_run():
+    graph = FakeGraph(httpx.Response(503, text="unavailable"))
+    client = graph.client()
+
+    # 5xx 時媒體可能已建立，交由呼叫端決定是否重送
+    with pytest.raises(InstagramGraphError) as exc:
+        asyncio.run(client.post("/me/media_publish", "token", {"creation_id": "1"}))
+    assert exc.value.retryable is True
+    assert exc.value.sent is True
+    assert len(graph.requests) == 1
+
+    def read_timeout(request):
+        graph.requests.append(request)
+        raise httpx.ReadTimeout("timed out", request=request)
+
+    graph.handler = read_timeout
+    with pytest.raises(InstagramGraphError) as exc:
+        asyncio.run(graph.client().post("/me/media_publish", "token", {"creation_id": "1"}))
+    assert exc.value.sent is True
+    assert len(graph.requests) == 2
+
+    # 被限流拒絕的請求確定沒有執行
+    graph = FakeGraph(*[httpx.Response(429, text="too many requests")] * 2)
+    with pytest.raises(InstagramGraphError) as exc:
+        asyncio.run(graph.client(max_retries=1).post("/me/media_publish", "token", {"creation_id": "1"}))
+    assert exc.value.sent is False
+
+
+def test_posts_are_retried_when_they_were_not_sent():
+    attempts = []
+
+    def handler(request):
+        attempts.append(request)
+        if len(attempts) == 1:
+            raise httpx.ConnectError("connection refused", request=request)
+        if len(attempts) == 2:
+            raise httpx.ConnectTimeout("connect timed out", request=request)
+        return httpx.Response(200, json={"id": "media-1"})
+
+    client = InstagramGraphClient(
+        "https://graph.test/v18.0", transport=httpx.MockTransport(handler), backoff_base=0.001
+    )
+    assert asyncio.run(client.post("/me/media_publish", "token", {"creation_id": "1"})) == {"id": "media-1"}
+    assert len(attempts) == 3
+
+
+def test_permanent_errors_are_not_retried():
+    graph = FakeGraph(graph_error(400, 190, "Invalid OAuth access token"))
+    client = graph.client()
+
+    with pytest.raises(InstagramGraphError) as exc:
+        asyncio.run(client.get("/me", "expired"))
+    assert exc.value.code == 190
+    assert exc.value.retryable is False
+    assert len(graph.requests) == 1
+
+
+def test_retries_are_bounded():
+    graph = FakeGraph(*[httpx.Response(500, text="boom") for _ in range(3)])
+    client = graph.client(max_retries=2)
+
+    with pytest.raises(InstagramGraphError) as exc:
+        asyncio.run(client.get("/me", "token"))
+    assert exc.value.retryable is True
+    assert len(graph.requests) == 3
+
+
+def test_usage_headers_pause_requests():
+    app_usage = json.dumps({"call_count": 95, "total_cputime": 10, "total_time": 20})
+    graph = FakeGraph(
+        httpx.Response(200, json={"id": "1"}, headers={"X-App-Usage": app_usage}),
+        httpx.Response(200, json={"id": "2"}),
+    )
+    client = graph.client()
+
+    asyncio.run(client.get("/me", "token"))
+    assert client.usage_percent == 95
+    # 用量超過門檻：暫停時間超過上限時直接回報可重試的錯誤，不送出請求
+    client._paused_until += 1000
+    with pytest.raises(InstagramGraphError) as exc:
+        asyncio.run(client.get("/me", "token"))
+    assert exc.value.retryable is True
+    assert exc.value.sent is False
+    assert len(graph.requests) == 1
+
+
+def test_business_use_case_usage_is_parsed():
+    headers = httpx.Headers({
+        "X-Business-Use-Case-Usage": json.dumps({
+            "17841400000000000": [
+                {"type": "instagram", "call_count": 40, "total_time": 70, "estimated_time_to_regain_access": 2}
+            ]
+        })
+    })
+    assert _usage_from_headers(headers) == {"percent": 70.0, "regain_seconds": 120.0}
@@ -0,0 +1,69 @@
+import os
+
+import pytest
+from PIL import Image
+
+from app.services.ig_render import IGRenderService
+from app.services.ig_render_worker import (
+    _load_background,
+    _load_logo,
+    clear_asset_cache,
+    get_background,
+    get_logo,
+)
+
+
+@pytest.fixture(autouse=True)
+def clean_cache():
+    clear_asset_cache()
+    yield
+    clear_asset_cache()
+
+
+def save(path, color, size=(64, 64)):
+    Image.new("RGB", size, color).save(path, "PNG")
+    return str(path)
+
+
+def test_background_is_decoded_once_and_copied(tmp_path):
+    path = save(tmp_path / "bg.png", "red")
+
+    first = get_background(path)
+    first.putpixel((0, 0), (0, 0, 255))
+    second = get_background(path)
+
+    assert _load_background.cache_info().hits == 1
+    assert _load_background.cache_info().misses == 1
+    # 繪製在副本上，不影響快取的背景
+    assert second.getpixel((0, 0)) == (255, 0, 0)
+
+
+def test_replaced_background_is_reloaded(tmp_path):
+    path = save(tmp_path / "bg.png", "red")
+    assert get_background(path).getpixel((0, 0)) == (255, 0, 0)
+
+    save(tmp_path / "bg.png", "green", size=(32, 32))
+    assert get_background(path).getpixel((0, 0)) == (0, 128, 0)
+
+    # 修改時間未變（例如同一秒內覆寫）時，以模板資源版本強制重新載入
+    stat = os.stat(path)
+    save(tmp_path / "bg.png", "blue", size=(32, 32))
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert get_background(path, version=0).getpixel((0, 0)) == (0, 128, 0)
+    assert get_background(path, version=1).getpixel((0, 0)) == (0, 0, 255)
+
+
+def test_logo_is_resized_once_per_size(tmp_path):
+    path = save(tmp_path / "logo.png", "white", size=(200, 100))
+
+    assert get_logo(path, 40, 20).size == (40, 20)
+    assert get_logo(path, 40, 20) is get_logo(path, 40, 20)
+    assert get_logo(path, 80, 40).size == (80, 40)
+    assert _load_logo.cache_info().misses == 2
+
+
+def test_render_service_bumps_asset_version():
+    service = IGRenderService()
+    service.invalidate_template_assets("uploads/ig_templates/a_bg.png")
+    service.invalidate_template_assets("uploads/ig_templates/a_bg.png")
+    assert service._asset_versions == {"uploads/ig_templates/a_bg.png": 2}
@@ -0,0 +1,91 @@
+import asyncio
+import sys
+from pathlib import Path
+
+from app.crud.comment_d1 import comment_d1
+from app.crud.post_d1 import post_d1
+from app.crud.school_d1 import school_d1
+from app.crud.user_d1 import user_d1
+from app.db.index_advisor import advise, render_migration, suggest_index
+from app.db.sqlite_adapter import SQLiteD1Adapter
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "migration_tools"))
+from init_d1_database import D1DatabaseInitializer  # noqa: E402
+
+
+def test_suggest_index_puts_equality_before_sort():
+    suggestion = suggest_index(
+        "SELECT * FROM posts WHERE school_id = ? AND status = ? ORDER BY created_at DESC, id DESC LIMIT ?"
+    )
+    # id 是 rowid，索引已隱含，不需要列出
+    assert suggestion.sql == (
+        "CREATE INDEX IF NOT EXISTS idx_posts_school_id_status_created_at "
+        "ON posts(school_id, status, created_at)"
+    )
+
+
+def test_suggest_index_keeps_literal_conditions_as_partial_index():
+    suggestion = suggest_index(
+        "SELECT * FROM posts WHERE status = 'approved' AND deleted_at IS NULL AND school_id = ? "
+        "ORDER BY created_at DESC LIMIT ?"
+    )
+    assert suggestion.columns == ["school_id", "created_at"]
+    assert suggestion.where == "status = 'approved' AND deleted_at IS NULL"
+
+
+def test_suggest_index_skips_expression_sorts():
+    assert suggest_index("SELECT * FROM posts_fts WHERE posts_fts MATCH ? ORDER BY bm25(posts_fts) ASC") is None
+
+
+def test_migrations_cover_feed_and_moderation_queries():
+    report = asyncio.run(advise([post_d1, comment_d1, user_d1, school_d1]))
+
+    assert report.suggestions == []
+    # 只剩依 bm25 排序的全文搜尋需要排序
+    unresolved = {source.split("(")[0] for plan in report.unresolved for source in plan.sources}
+    assert unresolved <= {"CRUDPostD1.search_posts", "CRUDPostD1.search_posts_page"}
+
+
+def test_advisor_suggests_indexes_without_migrations(tmp_path):
+    report = asyncio.run(advise([post_d1, comment_d1], migrations_path=str(tmp_path)))
+    names = [suggestion.name for suggestion in report.suggestions]
+
+    assert "idx_posts_school_id_status_created_at" in names
+    assert "idx_comments_post_id_status_created_at" in names
+    assert "idx_posts_school_id" in report.redundant
+    assert "DROP INDEX IF EXISTS idx_posts_school_id;" in render_migration(report)
+
+
+def test_sqlite_adapter_records_applied_migrations(tmp_path):
+    path = str(tmp_path / "forumkit.sqlite3")
+
+    async def applied():
+        adapter = SQLiteD1Adapter(path)
+        try:
+            return await adapter.custom_query("SELECT name FROM d1_migrations")
+        finally:
+            await adapter.aclose()
+
+    first = asyncio.run(applied())
+    # 重新開啟時不會重複套用
+    assert asyncio.run(applied()) == first
+    assert "0001_index_advisor.sql" in [row["name"] for row in first]
+
+
+def test_reinitializing_does_not_restore_dropped_indexes(tmp_path):
+    async def indexes():
+        adapter = SQLiteD1Adapter(str(tmp_path / "forumkit.sqlite3"))
+        try:
+            initializer = D1DatabaseInitializer(adapter)
+            assert await initializer.create_tables()
+            assert await initializer.apply_migrations()
+            rows = await adapter.custom_query("SELECT name FROM sqlite_master WHERE type = 'index'")
+            return {row["name"] for row in rows}
+        finally:
+            await adapter.aclose()
+
+    first = asyncio.run(indexes())
+    assert "idx_posts_school_id_status_created_at" in first
+    assert "idx_posts_school_id" not in first
+    # 對既有資料庫再次初始化時不重新執行 schema.sql
+    assert asyncio.run(indexes()) == first
@@ -0,0 +1,166 @@
+import asyncio
+import math
+import sqlite3
+
+import pytest
+
+from app.crud.d1_base import decode_cursor, encode_cursor
+from app.crud.comment_d1 import CRUDCommentD1
+from app.crud.post_d1 import CRUDPostD1
+from app.db.sqlite_adapter import DEFAULT_SCHEMA_PATH, SQLiteD1Adapter
+
+
+@pytest.fixture
+def posts(tmp_path):
+    adapter = SQLiteD1Adapter(str(tmp_path / "forumkit.sqlite3"))
+    crud = CRUDPostD1()
+    crud.adapter = adapter
+
+    async def seed():
+        await adapter.insert("schools", {"name": "A", "domain": "a.edu.tw"})
+        for i in range(7):
+            await adapter.insert("posts", {
+                "title": f"post {i}",
+                "content": "hello",
+                "school_id": 1,
+                "status": "approved",
+                # 同一時間的貼文需依 id 區分順序
+                "created_at": f"2030-01-0{1 + i // 2} 00:00:00",
+                "like_count": i % 3,
+            })
+
+    asyncio.run(seed())
+    yield crud
+    asyncio.run(adapter.aclose())
+
+
+def collect(fetch):
+    async def run():
+        pages, cursor = [], None
+        while True:
+            rows, cursor = await fetch(cursor)
+            pages.append([row["id"] for row in rows])
+            if cursor is None:
+                return pages
+
+    return asyncio.run(run())
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor(["2030-01-01 00:00:00", 5])
+    assert decode_cursor(cursor, 2) == ["2030-01-01 00:00:00", 5]
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, 3)
+    with pytest.raises(ValueError):
+        decode_cursor("not a cursor", 2)
+
+
+def test_school_feed_pages_by_created_at_and_id(posts):
+    pages = collect(lambda cursor: posts.get_posts_by_school_page(1, cursor=cursor, limit=3))
+    assert pages == [[7, 6, 5], [4, 3, 2], [1]]
+
+
+def test_search_pages_do_not_repeat(posts):
+    pages = collect(lambda cursor: posts.search_posts_page("post", cursor=cursor, limit=2))
+    ids = [id for page in pages for id in page]
+    assert sorted(ids) == [1, 2, 3, 4, 5, 6, 7]
+    assert len(pages) == 4
+
+
+def test_popular_pages_follow_hot_score(posts):
+    pages = collect(lambda cursor: posts.get_popular_posts_page(cursor=cursor, limit=4, days=36500))
+    ids = [id for page in pages for id in page]
+    # 每 12 小時的時間項等於按讚數加倍，較新的貼文排在前面
+    assert ids == [7, 6, 5, 3, 4, 2, 1]
+
+
+def test_hot_score_follows_engagement(posts):
+    async def run():
+        await posts.increment_like_count(1)
+        await posts.adapter.execute_query("UPDATE posts SET view_count = view_count + 1000 WHERE id = 1")
+        return await posts.get_popular_posts(days=36500, limit=1)
+
+    assert [row["id"] for row in asyncio.run(run())] == [1]
+
+
+def test_popular_posts_scan_hot_score_index(posts):
+    sql = (
+        "EXPLAIN QUERY PLAN SELECT * FROM posts WHERE status = 'approved' AND deleted_at IS NULL "
+        "AND +created_at >= ? AND school_id = ? ORDER BY hot_score DESC, id DESC LIMIT 10"
+    )
+    plan = asyncio.run(posts.adapter.custom_query(sql, ["2030-01-01", 1]))
+    details = " ".join(row["detail"] for row in plan)
+    assert "idx_posts_school_status_hot" in details
+    assert "TEMP B-TREE" not in details
+
+
+def test_school_feed_skips_soft_deleted_rows(posts):
+    comments = CRUDCommentD1()
+    comments.adapter = posts.adapter
+
+    async def run():
+        for i in range(3):
+            await posts.adapter.insert("comments", {
+                "content": f"comment {i}", "post_id": 1, "school_id": 1, "status": "approved"
+            })
+        await posts.soft_delete(6)
+        await comments.soft_delete(2)
+        post_ids = [row["id"] for row in (await posts.get_posts_by_school_page(1, limit=10, status="approved"))[0]]
+        comment_ids = [row["id"] for row in (await comments.get_comments_by_school_page(1, limit=10, status="approved"))[0]]
+        return post_ids, comment_ids
+
+    post_ids, comment_ids = asyncio.run(run())
+    assert post_ids == [7, 5, 4, 3, 2, 1]
+    assert comment_ids == [3, 1]
+
+
+def test_hot_score_migration_backfills_existing_posts(tmp_path):
+    path = str(tmp_path / "forumkit.sqlite3")
+    # 新增熱度分數前建立的資料庫：posts 沒有 hot_score 欄位
+    connection = sqlite3.connect(path)
+    connection.executescript(DEFAULT_SCHEMA_PATH.read_text(encoding="utf-8"))
+    connection.execute("INSERT INTO schools (name, domain) VALUES ('A', 'a.edu.tw')")
+    for title, likes, comments, views in (("quiet", 0, 0, 0), ("liked", 3, 0, 0), ("busy", 1, 2, 20)):
+        connection.execute(
+            "INSERT INTO posts (title, content, school_id, status, created_at, like_count, comment_count, view_count) "
+            "VALUES (?, 'x', 1, 'approved', '2024-01-01 00:00:00', ?, ?, ?)",
+            [title, likes, comments, views]
+        )
+    connection.commit()
+    connection.close()
+
+    crud = CRUDPostD1()
+    crud.adapter = SQLiteD1Adapter(path)
+
+    async def run():
+        scores = await crud.adapter.custom_query("SELECT title, hot_score FROM posts ORDER BY id")
+        await crud.increment_like_count(1)
+        bumped = await crud.adapter.custom_query("SELECT hot_score FROM posts WHERE id = 1")
+        popular = await crud.get_popular_posts(days=36500)
+        return scores, bumped[0]["hot_score"], [row["title"] for row in popular]
+
+    try:
+        scores, bumped, popular = asyncio.run(run())
+    finally:
+        asyncio.run(crud.adapter.aclose())
+    # 2024-01-01 起算的時間項為 0；log2 的近似在 2 的次方上精確
+    assert [(row["title"], row["hot_score"]) for row in scores] == [("quiet", 0.0), ("liked", 2.0), ("busy", 3.0)]
+    assert bumped == 1.0
+    assert popular == ["busy", "liked", "quiet"]
+
+
+def test_hot_score_approximates_log2_of_large_engagement(posts):
+    async def engagement_term(likes):
+        await posts.adapter.execute_query(
+            "UPDATE posts SET like_count = ?, comment_count = 0, view_count = 0, created_at = '2024-01-01 00:00:00' "
+            "WHERE id = 1",
+            [likes]
+        )
+        rows = await posts.adapter.custom_query("SELECT hot_score FROM posts WHERE id = 1")
+        return rows[0]["hot_score"]
+
+    # 互動數 e = 1 + 按讚數；時間項為 0
+    for e in (3, 1000, 3 * 2 ** 20, 2 ** 22, 5 * 10 ** 8, 2 ** 32 - 1):
+        assert abs(asyncio.run(engagement_term(e - 1)) - math.log2(e)) < 0.09
+    # 超過 2^32 時固定為 32
+    assert asyncio.run(engagement_term(2 ** 40)) == 32
@@ -0,0 +1,68 @@
+import asyncio
+from functools import lru_cache
+
+import pytest
+
+from app.core.metrics import MetricsRegistry, publish_duration_seconds, publish_failures_total, track_publish
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("latency_seconds", "Latency", ("route",), buckets=(0.1, 1.0))
+    histogram.observe(0.05, route="/a")
+    histogram.observe(0.5, route="/a")
+    histogram.observe(3.0, route="/a")
+
+    text = registry.render()
+    assert "# TYPE latency_seconds histogram" in text
+    assert 'latency_seconds_bucket{route="/a",le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{route="/a",le="1.0"} 2' in text
+    assert 'latency_seconds_bucket{route="/a",le="+Inf"} 3' in text
+    assert 'latency_seconds_count{route="/a"} 3' in text
+
+
+def test_counter_gauge_and_label_escaping():
+    registry = MetricsRegistry()
+    counter = registry.counter("requests_total", "Requests", ("route",))
+    gauge = registry.gauge("in_flight", "In flight")
+    counter.inc(route='/say "hi"')
+    counter.inc(2, route='/say "hi"')
+    gauge.inc()
+    gauge.inc()
+    gauge.dec()
+
+    text = registry.render()
+    assert 'requests_total{route="/say \\"hi\\""} 3' in text
+    assert "in_flight 1" in text
+    # 重複註冊返回同一個指標
+    assert registry.counter("requests_total", "Requests", ("route",)) is counter
+
+
+def test_cache_hit_ratio_from_cache_info():
+    @lru_cache(maxsize=8)
+    def square(value):
+        return value * value
+
+    registry = MetricsRegistry()
+    registry.register_cache("square", square.cache_info)
+    for value in (1, 2, 1, 1):
+        square(value)
+
+    text = registry.render()
+    assert 'forumkit_cache_hits_total{cache="square"} 2' in text
+    assert 'forumkit_cache_misses_total{cache="square"} 2' in text
+    assert 'forumkit_cache_hit_ratio{cache="square"} 0.5' in text
+
+
+def test_track_publish_counts_failures():
+    async def scenario():
+        async with track_publish("test_target"):
+            pass
+        with pytest.raises(RuntimeError):
+            async with track_publish("test_target"):
+                raise RuntimeError("webhook down")
+
+    asyncio.run(scenario())
+
+    assert publish_duration_seconds.count(target="test_target", action="post") == 2
+    assert publish_failures_total.value(target="test_target", action="post") == 1
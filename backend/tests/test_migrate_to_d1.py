@@ -0,0 +1,199 @@
+import asyncio
+import math
+import sqlite3
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import pytest
+from sqlalchemy import event
+
+from app.db.sqlite_adapter import SQLiteD1Adapter
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "migration_tools"))
+import migrate_to_d1  # noqa: E402
+from migrate_to_d1 import MigrationCheckpoint, PostgreSQLToD1Migrator  # noqa: E402
+
+SOURCE_SCHEMA = """
+CREATE TABLE posts (
+    id INTEGER PRIMARY KEY,
+    title TEXT NOT NULL,
+    content TEXT NOT NULL,
+    school_id INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    is_anonymous BOOLEAN NOT NULL,
+    created_at TEXT NOT NULL
+)
+"""
+
+
+def created_at(i):
+    return str(datetime(2030, 1, 1) + timedelta(seconds=i))
+
+
+def make_source(path, count=20, school_of=lambda i: 1):
+    connection = sqlite3.connect(path)
+    connection.execute(SOURCE_SCHEMA)
+    connection.executemany(
+        "INSERT INTO posts VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [
+            (i, f"貼文 {i}", f"content {i}", school_of(i), "approved", i % 2, created_at(i))
+            for i in range(1, count + 1)
+        ]
+    )
+    connection.commit()
+    connection.close()
+
+
+@pytest.fixture
+def databases(tmp_path):
+    """來源與目標各一個 SQLite 資料庫（目標以 D1 schema 建立）"""
+    source = tmp_path / "source.sqlite3"
+    target = SQLiteD1Adapter(str(tmp_path / "d1.sqlite3"))
+    asyncio.run(target.insert("schools", {"name": "A", "domain": "a.edu.tw"}))
+    yield source, target, tmp_path / "checkpoint.json"
+    asyncio.run(target.aclose())
+
+
+def make_migrator(source, target, checkpoint_path, **options):
+    options.setdefault("max_retries", 1)
+    return PostgreSQLToD1Migrator(
+        f"sqlite:///{source}", target, checkpoint_path=checkpoint_path, **options
+    )
+
+
+def target_ids(target):
+    rows = asyncio.run(target.custom_query("SELECT id FROM posts ORDER BY id"))
+    return [row["id"] for row in rows]
+
+
+def test_batches_respect_parameter_and_size_limits(tmp_path, monkeypatch):
+    migrator = make_migrator(tmp_path / "unused.sqlite3", None, tmp_path / "checkpoint.json")
+    columns = ["id", "title", "content"]
+    rows = [{"id": i, "title": "t", "content": "x"} for i in range(1, 201)]
+
+    batches = list(migrator._build_batches("posts", columns, rows))
+    statements = [entry for batch in batches for entry in batch]
+    # 每個語句最多 100 個綁定參數：3 欄時每個語句 33 列
+    assert [len(chunk) for _, chunk in statements] == [33] * 6 + [2]
+    assert all(len(statement["params"]) <= 100 for statement, _ in statements)
+    assert [row["id"] for _, chunk in statements for row in chunk] == list(range(1, 201))
+
+    # 內容較大時減半每個語句的列數，仍保留全部資料列
+    large = [{"id": i, "title": "t", "content": "x" * 20_000} for i in range(1, 11)]
+    statements = [entry for batch in migrator._build_batches("posts", columns, large) for entry in batch]
+    assert all(migrator._statement_size(statement) <= 100_000 for statement, _ in statements)
+    assert [len(chunk) for _, chunk in statements] == [2, 4, 4]
+    assert [row["id"] for _, chunk in statements for row in chunk] == list(range(1, 11))
+
+    # 批次的語句數受上限約束
+    monkeypatch.setattr(migrate_to_d1, "MAX_STATEMENTS_PER_BATCH", 2)
+    batches = list(migrator._build_batches("posts", columns, rows))
+    assert [len(batch) for batch in batches] == [2, 2, 2, 1]
+
+
+def test_interrupted_migration_resumes_from_checkpoint(databases):
+    source, target, checkpoint_path = databases
+    make_source(source)
+
+    # 模擬行程中斷（不是可重試的一般錯誤）
+    class Interrupted(BaseException):
+        pass
+
+    execute_batch = target.execute_batch
+    sent = []
+
+    async def flaky_batch(queries):
+        if len(sent) == 2:
+            raise Interrupted()
+        sent.append(queries)
+        return await execute_batch(queries)
+
+    target.execute_batch = flaky_batch
+    migrator = make_migrator(source, target, checkpoint_path, concurrency=1)
+    with pytest.raises(Interrupted):
+        asyncio.run(migrator.migrate_table("posts", fetch_size=5))
+    assert target_ids(target) == list(range(1, 11))
+    assert MigrationCheckpoint(checkpoint_path).get("posts") == 10
+
+    del target.execute_batch
+    resumed = make_migrator(source, target, checkpoint_path)
+    assert asyncio.run(resumed.migrate_table("posts", fetch_size=5)) == 10
+    assert target_ids(target) == list(range(1, 21))
+    assert MigrationCheckpoint(checkpoint_path).get("posts") == 20
+
+
+def test_checkpoint_stops_before_rows_that_failed(databases):
+    source, target, checkpoint_path = databases
+    # 第 7 筆引用不存在的學校，批次與逐筆插入都會失敗
+    make_source(source, school_of=lambda i: 2 if i == 7 else 1)
+
+    migrator = make_migrator(source, target, checkpoint_path)
+    assert asyncio.run(migrator.migrate_table("posts", fetch_size=5)) == 19
+    assert 7 not in target_ids(target)
+    # 後續批次成功也不越過失敗的記錄
+    assert MigrationCheckpoint(checkpoint_path).get("posts") == 5
+
+    asyncio.run(target.insert("schools", {"name": "B", "domain": "b.edu.tw"}))
+    resumed = make_migrator(source, target, checkpoint_path)
+    # 已寫入的記錄在衝突時略過
+    assert asyncio.run(resumed.migrate_table("posts", fetch_size=5)) == 15
+    assert target_ids(target) == list(range(1, 21))
+    assert MigrationCheckpoint(checkpoint_path).get("posts") == 20
+
+
+def emulate_postgresql_functions(engine):
+    """在 SQLite 來源上註冊校驗運算式用到的 PostgreSQL 函式"""
+
+    def on_connect(connection, _):
+        connection.create_function("ASCII", 1, lambda value: None if value is None else (ord(value[0]) if value else 0))
+        connection.create_function("FLOOR", 1, lambda value: None if value is None else math.floor(value))
+        connection.create_function(
+            "date_part", 2,
+            lambda field, value: None if value is None
+            else datetime.fromisoformat(value).replace(tzinfo=timezone.utc).timestamp()
+        )
+
+    event.listen(engine, "connect", on_connect)
+
+
+def test_verification_bisects_to_corrupted_rows_and_repairs_them(databases, monkeypatch):
+    source, target, checkpoint_path = databases
+    make_source(source, count=300)
+    migrator = make_migrator(source, target, checkpoint_path)
+    emulate_postgresql_functions(migrator.pg_engine)
+    # information_schema 只存在於 PostgreSQL，以對應的欄位類型代替
+    monkeypatch.setattr(migrator, "_pg_columns", lambda table_name: [
+        ("id", "integer"), ("title", "text"), ("content", "text"), ("school_id", "integer"),
+        ("status", "character varying"), ("is_anonymous", "boolean"),
+        ("created_at", "timestamp without time zone"),
+    ])
+    asyncio.run(migrator.migrate_table("posts", fetch_size=100))
+
+    report = asyncio.run(migrator.verify_table("posts", chunk_size=128, leaf_size=8))
+    assert report.ok
+    assert report.ranges_checked == 3
+
+    async def corrupt():
+        # 長度不變、只改最後一個字元
+        await target.update("posts", {"title": "貼文 15X"}, {"id": 150})
+        # 兩筆記錄互換時間
+        await target.update("posts", {"created_at": created_at(220)}, {"id": 210})
+        await target.update("posts", {"created_at": created_at(210)}, {"id": 220})
+        await target.delete("posts", {"id": 42})
+        await target.insert("posts", {"id": 301, "title": "extra", "content": "x", "school_id": 1})
+
+    asyncio.run(corrupt())
+    report = asyncio.run(migrator.verify_table("posts", chunk_size=128, leaf_size=8))
+    assert report.missing_ids == [42]
+    assert report.extra_ids == [301]
+    assert sorted(report.changed_ids) == [150, 210, 220]
+    # 只有不一致的範圍被二分，不需逐筆比較整張表
+    assert report.ranges_checked < 50
+
+    assert asyncio.run(migrator.repair_table(report))
+    rows = asyncio.run(target.custom_query("SELECT title, created_at FROM posts WHERE id IN (150, 210) ORDER BY id"))
+    assert [row["title"] for row in rows] == ["貼文 150", "貼文 210"]
+    assert rows[1]["created_at"] == created_at(210)
+    assert asyncio.run(migrator.verify_table("posts", chunk_size=128, leaf_size=8)).ok
+    assert target_ids(target) == list(range(1, 301))
@@ -0,0 +1,357 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from app.core.config import settings
+from app.crud.outbox_d1 import CRUDOutboxD1
+from app.crud.discord_settings_d1 import discord_settings_d1
+from app.crud.ig_account_d1 import ig_account_d1
+from app.crud.ig_template_d1 import ig_template_d1
+from app.crud.post_d1 import post_d1
+from app.db.sqlite_adapter import SQLiteD1Adapter
+from app.models.user import UserRole
+from app.schemas.post import PostCreate, PostUpdate
+from app.services import discord, ig_render
+from app.services.ig_graph import InstagramGraphClient
+from app.services.ig_publish import ig_publish_service
+from app.services.outbox import OutboxWorker
+from app.services.render_cache import RenderOutputCache
+from app.services.post import PostService
+from app.services.school_feature import school_feature_service
+
+
+@pytest.fixture
+def adapter(tmp_path, monkeypatch):
+    adapter = SQLiteD1Adapter(str(tmp_path / "forumkit.sqlite3"))
+    monkeypatch.setattr(post_d1, "adapter", adapter)
+    asyncio.run(adapter.insert("schools", {"name": "A", "domain": "a.edu.tw"}))
+    yield adapter
+    asyncio.run(adapter.aclose())
+
+
+def make_worker(adapter, handlers, **options):
+    crud = CRUDOutboxD1()
+    crud.adapter = adapter
+    options.setdefault("backoff_base", 0.001)
+    return OutboxWorker(handlers=handlers, crud=crud, poll_interval=0.01, **options)
+
+
+def outbox_rows(adapter):
+    return asyncio.run(adapter.custom_query("SELECT * FROM outbox ORDER BY id"))
+
+
+def post_in(title="hello"):
+    return PostCreate(title=title, content="content", school_id=1)
+
+
+def use_publish_settings(adapter, tmp_path, monkeypatch):
+    """在 D1 寫入學校 1 的 Discord 與 IG 設定及啟用中的模板，並以假的渲染行程池產生圖片"""
+    for crud in (discord_settings_d1, ig_account_d1, ig_template_d1):
+        monkeypatch.setattr(crud, "adapter", adapter)
+
+    async def seed():
+        await adapter.insert("discord_settings", {"school_id": 1, "webhook_url": "https://discord.test/webhook"})
+        await adapter.insert("ig_accounts", {
+            "username": "school_a",
+            "password": "",
+            "school_id": 1,
+            "access_token": "graph-token",
+            "token_expires_at": "2999-01-01T00:00:00",
+        })
+        await adapter.insert("ig_templates", {
+            "name": "default",
+            "template_path": "",
+            "background_image": str(tmp_path / "bg.png"),
+            "config": json.dumps({"text_areas": [], "timestamp": {"format": "%Y-%m-%d"}}),
+        })
+
+    asyncio.run(seed())
+
+    renders = []
+
+    async def render(fn, job):
+        renders.append(job)
+        with open(job["output_path"], "wb") as f:
+            f.write(b"png")
+
+    monkeypatch.setattr(ig_render.render_pool, "run", render)
+    monkeypatch.setattr(ig_render, "render_output_cache", RenderOutputCache(str(tmp_path / "out"), max_bytes=10_000))
+    return renders
+
+
+def use_graph(monkeypatch, handler):
+    requests = []
+
+    def graph(request):
+        requests.append(request)
+        return handler(request)
+
+    monkeypatch.setattr(ig_publish_service, "graph", InstagramGraphClient(
+        "https://graph.test/v18.0", transport=httpx.MockTransport(graph), backoff_base=0.001
+    ))
+    return requests
+
+
+def test_post_and_outbox_jobs_are_written_in_one_batch(adapter):
+    first = asyncio.run(post_d1.create_with_outbox(post_in("first"), ["ig", "discord"], author_id=None))
+    second = asyncio.run(post_d1.create_with_outbox(post_in("second"), ["discord"]))
+    updated = asyncio.run(post_d1.update_with_outbox(first["id"], PostUpdate(title="edited"), ["ig"]))
+
+    assert updated["title"] == "edited"
+    assert [(row["destination"], row["post_id"], row["status"]) for row in outbox_rows(adapter)] == [
+        ("ig", first["id"], "pending"),
+        ("discord", first["id"], "pending"),
+        ("discord", second["id"], "pending"),
+        ("ig", first["id"], "pending"),
+    ]
+
+
+def test_worker_retries_and_dead_letters(adapter):
+    asyncio.run(post_d1.create_with_outbox(post_in(), ["ig", "discord"]))
+    asyncio.run(post_d1.create_with_outbox(post_in(), ["ig"]))
+    calls = {"ig": 0, "discord": 0}
+
+    async def ig(job):
+        calls["ig"] += 1
+        if job["post_id"] == 2:
+            raise HTTPException(status_code=404, detail="學校未設定 IG 帳號")
+        if job["attempts"] < 3:
+            raise RuntimeError("graph api timeout")
+
+    async def discord(job):
+        calls["discord"] += 1
+        raise RuntimeError("webhook down")
+
+    worker = make_worker(adapter, {"ig": ig, "discord": discord}, max_attempts=3)
+
+    async def scenario():
+        await worker.start()
+        for _ in range(200):
+            rows = await adapter.custom_query("SELECT * FROM outbox WHERE status != 'dead'")
+            if not rows:
+                break
+            await asyncio.sleep(0.01)
+        await worker.stop()
+
+    asyncio.run(scenario())
+
+    rows = outbox_rows(adapter)
+    # 成功的工作已刪除，其餘轉入死信並保留錯誤
+    assert [(row["destination"], row["post_id"], row["attempts"]) for row in rows] == [
+        ("discord", 1, 3),
+        ("ig", 2, 1),
+    ]
+    assert all(row["status"] == "dead" for row in rows)
+    assert "webhook down" in rows[0]["last_error"]
+    assert calls == {"ig": 4, "discord": 3}
+
+    crud = worker.crud
+    assert asyncio.run(crud.requeue(rows[1]["id"]))["status"] == "pending"
+    assert asyncio.run(crud.requeue(rows[1]["id"])) is None
+
+
+def test_worker_respects_destination_concurrency(adapter):
+    for _ in range(6):
+        asyncio.run(post_d1.create_with_outbox(post_in(), ["discord"]))
+    running = []
+    peak = []
+
+    async def discord(job):
+        running.append(job["id"])
+        peak.append(len(running))
+        await asyncio.sleep(0.02)
+        running.remove(job["id"])
+
+    worker = make_worker(adapter, {"discord": discord}, concurrency={"discord": 2})
+
+    async def scenario():
+        await worker.start()
+        for _ in range(200):
+            if not await adapter.custom_query("SELECT id FROM outbox"):
+                break
+            await asyncio.sleep(0.01)
+        await worker.stop()
+
+    asyncio.run(scenario())
+    assert len(peak) == 6
+    assert max(peak) == 2
+
+
+def test_posts_are_fanned_out_when_approved(adapter, tmp_path, monkeypatch):
+    use_publish_settings(adapter, tmp_path, monkeypatch)
+    asyncio.run(adapter.insert("schools", {"name": "B", "domain": "b.edu.tw"}))
+
+    async def get_features(db, *, school_id):
+        return {"ig": True, "discord": True, "comments": True, "cross_school": False}
+
+    monkeypatch.setattr(school_feature_service, "get_features", get_features)
+    service = PostService()
+
+    class Author:
+        id = None
+        role = UserRole.USER
+
+    class Reviewer:
+        id = None
+        role = UserRole.REVIEWER
+
+    # 待審核的貼文不推播
+    post = asyncio.run(service.create_post(None, post_in=post_in(), author=Author()))
+    assert post["status"] == "pending"
+    asyncio.run(service.update_post(None, post_id=post["id"], post_in=PostUpdate(title="edited"), author=Author()))
+    assert outbox_rows(adapter) == []
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(service.approve_post(None, post_id=post["id"], reviewer=Author()))
+    assert error.value.status_code == 403
+
+    post = asyncio.run(service.approve_post(None, post_id=post["id"], reviewer=Reviewer()))
+    assert post["status"] == "approved"
+    assert [row["destination"] for row in outbox_rows(adapter)] == ["ig", "discord"]
+
+    # 重複審核不重複推播
+    asyncio.run(service.approve_post(None, post_id=post["id"], reviewer=Reviewer()))
+    assert len(outbox_rows(adapter)) == 2
+
+    # 尚未在 D1 設定 IG 帳號與 Discord webhook 的學校不排入工作
+    other = asyncio.run(service.create_post(
+        None, post_in=PostCreate(title="other", content="content", school_id=2), author=Author()
+    ))
+    asyncio.run(service.approve_post(None, post_id=other["id"], reviewer=Reviewer()))
+    assert len(outbox_rows(adapter)) == 2
+
+    asyncio.run(adapter.update("ig_templates", {"is_active": False}, {"id": 1}))
+    post = asyncio.run(service.update_post(None, post_id=post["id"], post_in=PostUpdate(title="again"), author=Author()))
+    assert [row["destination"] for row in outbox_rows(adapter)] == ["ig", "discord", "discord"]
+
+
+def test_backlog_counts_due_jobs_and_is_cached(adapter, monkeypatch):
+    for title in ("first", "second", "third"):
+        asyncio.run(post_d1.create_with_outbox(post_in(title), ["discord"], author_id=None))
+    worker = make_worker(adapter, {"discord": None})
+    asyncio.run(worker.crud.retry_later(3, "boom", 600))
+    monkeypatch.setattr(settings, "HEALTH_MAX_OUTBOX_BACKLOG", 1)
+
+    status = asyncio.run(worker.backlog_status())
+    # 延後重試的工作尚未到期，不計入積壓
+    assert status["due"] == 2
+    assert status["ok"] is False
+
+    asyncio.run(worker.crud.complete(1))
+    assert asyncio.run(worker.backlog_status())["due"] == 2
+    worker._backlog_checked_at = 0.0
+    status = asyncio.run(worker.backlog_status())
+    assert status["due"] == 1
+    assert status["ok"] is True
+
+
+def test_real_handlers_publish_posts_from_d1(adapter, tmp_path, monkeypatch):
+    renders = use_publish_settings(adapter, tmp_path, monkeypatch)
+
+    async def seed():
+        await adapter.insert("schools", {"name": "B", "domain": "b.edu.tw"})
+        await post_d1.create_with_outbox(post_in("first"), ["ig", "discord"])
+        # 沒有設定 Discord 的學校
+        await post_d1.create_with_outbox(PostCreate(title="second", content="content", school_id=2), ["discord"])
+        await adapter.update("posts", {"status": "approved"}, {"status": "pending"})
+        # 排入後被拒絕的貼文
+        await post_d1.create_with_outbox(post_in("third"), ["discord"])
+        await adapter.update("posts", {"status": "rejected"}, {"id": 3})
+
+    asyncio.run(seed())
+
+    webhooks = []
+
+    class Response:
+        status = 204
+
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc):
+            pass
+
+    class Session:
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc):
+            pass
+
+        def post(self, url, json):
+            webhooks.append((url, json))
+            return Response()
+
+    monkeypatch.setattr(discord.aiohttp, "ClientSession", Session)
+
+    def graph(request):
+        if request.url.path.endswith("/media"):
+            return httpx.Response(200, json={"id": "container-1"})
+        return httpx.Response(200, json={"id": "media-1"})
+
+    graph_requests = use_graph(monkeypatch, graph)
+    worker = make_worker(adapter, None)
+
+    async def scenario():
+        await worker.start()
+        for _ in range(200):
+            if not await adapter.custom_query("SELECT id FROM outbox WHERE status != 'dead'"):
+                break
+            await asyncio.sleep(0.01)
+        await worker.stop()
+
+    asyncio.run(scenario())
+
+    rows = outbox_rows(adapter)
+    assert [(row["destination"], row["post_id"], row["status"]) for row in rows] == [
+        ("discord", 2, "dead"),
+        ("discord", 3, "dead"),
+    ]
+    assert "學校未設定 Discord webhook" in rows[0]["last_error"]
+    assert "貼文尚未通過審核" in rows[1]["last_error"]
+
+    assert [url for url, _ in webhooks] == ["https://discord.test/webhook"]
+    assert webhooks[0][1]["embeds"][0]["title"] == "first"
+
+    assert [job["title"] for job in renders] == ["first"]
+    assert [request.url.path for request in graph_requests] == ["/v18.0/me/media", "/v18.0/me/media_publish"]
+    assert graph_requests[0].url.params["access_token"] == "graph-token"
+    assert graph_requests[0].url.params["caption"] == "first"
+    assert graph_requests[1].url.params["creation_id"] == "container-1"
+
+
+def test_ig_job_is_not_retried_once_publish_was_sent(adapter, tmp_path, monkeypatch):
+    use_publish_settings(adapter, tmp_path, monkeypatch)
+    asyncio.run(post_d1.create_with_outbox(post_in(), ["ig"]))
+    asyncio.run(adapter.update("posts", {"status": "approved"}, {"id": 1}))
+    containers = []
+
+    def graph(request):
+        if request.url.path.endswith("/media"):
+            containers.append(request)
+            # 建立容器失敗時貼文尚未發布，整個工作稍後重試
+            if len(containers) == 1:
+                return httpx.Response(503, text="unavailable")
+            return httpx.Response(200, json={"id": "container-1"})
+        return httpx.Response(503, text="unavailable")
+
+    graph_requests = use_graph(monkeypatch, graph)
+    worker = make_worker(adapter, None)
+
+    job = asyncio.run(worker.crud.claim("ig", 1, 60))[0]
+    asyncio.run(worker.process("ig", job))
+    row = outbox_rows(adapter)[0]
+    assert row["status"] == "pending"
+    assert row["last_error"].startswith("502")
+
+    # 發布請求送出後失敗：貼文可能已上線，不重送
+    asyncio.run(worker.process("ig", {**job, "attempts": 2}))
+    row = outbox_rows(adapter)[0]
+    assert row["status"] == "dead"
+    assert "發布結果未知" in row["last_error"]
+    assert [request.url.path for request in graph_requests] == [
+        "/v18.0/me/media", "/v18.0/me/media", "/v18.0/me/media_publish"
+    ]
@@ -0,0 +1,91 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+from app.crud.post_d1 import CRUDPostD1
+from app.db.sqlite_adapter import DEFAULT_SCHEMA_PATH, SQLiteD1Adapter
+
+
+@pytest.fixture
+def posts(tmp_path):
+    adapter = SQLiteD1Adapter(str(tmp_path / "forumkit.sqlite3"))
+    crud = CRUDPostD1()
+    crud.adapter = adapter
+
+    async def seed():
+        await adapter.insert("schools", {"name": "A", "domain": "a.edu.tw"})
+        await adapter.insert("schools", {"name": "B", "domain": "b.edu.tw"})
+        rows = [
+            ("期中考範圍", "請問微積分期中考的範圍到哪裡", 1, "approved"),
+            ("微積分讀書會", "每週三晚上一起讀微積分，微積分好難", 1, "approved"),
+            ("社團招生", "熱音社招生中", 1, "approved"),
+            ("微積分", "別校的微積分問題", 2, "approved"),
+            ("微積分待審", "還沒審核的微積分貼文", 1, "pending"),
+        ]
+        for title, content, school_id, status in rows:
+            await adapter.insert("posts", {
+                "title": title,
+                "content": content,
+                "school_id": school_id,
+                "status": status,
+            })
+
+    asyncio.run(seed())
+    yield crud
+    asyncio.run(crud.adapter.aclose())
+
+
+def test_search_uses_fts_with_ranking_and_snippet(posts):
+    results = asyncio.run(posts.search_posts("微積分", school_id=1))
+
+    assert [row["id"] for row in results] == [2, 1]
+    assert "<mark>微積分</mark>" in results[1]["snippet"]
+
+
+def test_search_index_follows_updates_and_deletes(posts):
+    async def run():
+        await posts.update(3, {"content": "熱音社與微積分社聯合招生"})
+        await posts.remove(2)
+        return await posts.search_posts("微積分", school_id=1)
+
+    assert sorted(row["id"] for row in asyncio.run(run())) == [1, 3]
+
+
+def test_short_query_falls_back_to_like(posts):
+    results = asyncio.run(posts.search_posts("社團"))
+
+    assert [row["id"] for row in results] == [3]
+    assert results[0]["snippet"] is None
+
+
+def test_fts_syntax_in_query_is_escaped(posts):
+    assert asyncio.run(posts.search_posts('微積分" OR "社')) == []
+
+
+def test_migration_indexes_posts_of_existing_databases(tmp_path):
+    path = str(tmp_path / "forumkit.sqlite3")
+    # 模擬新增搜尋索引前建立的資料庫：已有貼文，沒有 posts_fts 與同步觸發器
+    connection = sqlite3.connect(path)
+    connection.executescript(DEFAULT_SCHEMA_PATH.read_text(encoding="utf-8"))
+    connection.executescript(
+        "DROP TRIGGER posts_fts_ai; DROP TRIGGER posts_fts_ad; DROP TRIGGER posts_fts_au; DROP TABLE posts_fts;"
+        "INSERT INTO schools (name, domain) VALUES ('A', 'a.edu.tw');"
+        "INSERT INTO posts (title, content, school_id, status) VALUES ('微積分讀書會', '每週三晚上', 1, 'approved');"
+    )
+    connection.close()
+
+    crud = CRUDPostD1()
+    crud.adapter = SQLiteD1Adapter(path)
+
+    async def run():
+        found = await crud.search_posts("微積分")
+        await crud.adapter.insert("posts", {"title": "線性代數", "content": "矩陣", "school_id": 1, "status": "approved"})
+        return found, await crud.search_posts("線性代")
+
+    try:
+        found, added = asyncio.run(run())
+    finally:
+        asyncio.run(crud.adapter.aclose())
+    assert [row["title"] for row in found] == ["微積分讀書會"]
+    assert [row["title"] for row in added] == ["線性代數"]
@@ -0,0 +1,144 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import Boolean, Column, Integer, String, create_engine, event
+from sqlalchemy.orm import declarative_base, sessionmaker
+
+from app.core.security import create_access_token
+from app.crud import user as user_crud
+from app.crud.user_d1 import user_d1
+from app.db.sqlite_adapter import SQLiteD1Adapter
+from app.dependencies import auth
+
+Base = declarative_base()
+
+
+class Account(Base):
+    """與 User 相同欄位子集的對應類別（只建立測試需要的表）"""
+    __tablename__ = "users"
+
+    id = Column(Integer, primary_key=True)
+    email = Column(String, nullable=False)
+    full_name = Column(String)
+    role = Column(String, default="user", nullable=False)
+    is_active = Column(Boolean, default=True)
+    is_superuser = Column(Boolean, default=False)
+    school_id = Column(Integer)
+
+
+@pytest.fixture
+def users(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'users.sqlite3'}")
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    with Session() as db:
+        db.add(Account(id=1, email="a@test.edu.tw", school_id=3))
+        db.commit()
+
+    selects = []
+    lookups = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def record(connection, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            selects.append(statement)
+
+    def get(db, *, id):
+        lookups.append(id)
+        return db.get(Account, id)
+
+    monkeypatch.setattr(user_crud, "get", get)
+    auth.principal_cache.clear()
+    yield Session, selects, lookups
+    auth.principal_cache.clear()
+    engine.dispose()
+
+
+def current_user(db, token):
+    return asyncio.run(auth.get_current_user(db=db, token=token))
+
+
+def test_principal_is_cached_between_requests(users):
+    Session, selects, lookups = users
+    token = create_access_token(1)
+
+    with Session() as first, Session() as second:
+        loaded = current_user(first, token)
+        cached = current_user(second, token)
+        # 每個請求取得屬於自己 Session 的物件
+        assert cached is not loaded
+        assert cached in second
+        assert (cached.id, cached.email, cached.role, cached.school_id) == (1, "a@test.edu.tw", "user", 3)
+    assert lookups == [1]
+
+    with Session() as db:
+        with pytest.raises(HTTPException) as error:
+            current_user(db, create_access_token(2))
+        assert error.value.status_code == 401
+
+        # 不存在的用戶不快取，建立後即可登入
+        db.add(Account(id=2, email="b@test.edu.tw"))
+        db.commit()
+        assert current_user(db, create_access_token(2)).id == 2
+    assert lookups == [1, 2, 2]
+
+
+def test_cached_principal_survives_commits(users):
+    Session, selects, lookups = users
+    token = create_access_token(1)
+
+    with Session() as db:
+        current_user(db, token)
+        # 載入用戶的 Session 提交後其物件全部過期
+        db.add(Account(id=2, email="b@test.edu.tw"))
+        db.commit()
+    selects.clear()
+
+    with Session() as db:
+        user = current_user(db, token)
+        assert (user.role, user.is_active, user.is_superuser, user.school_id) == ("user", True, False, 3)
+        # 請求中修改自己的物件不影響快取
+        user.full_name = "未提交的修改"
+        db.rollback()
+
+    with Session() as db:
+        user = current_user(db, token)
+        assert (user.id, user.email, user.full_name, user.role, user.is_active) == (1, "a@test.edu.tw", None, "user", True)
+
+    user = current_user(None, token)
+    assert user.email == "a@test.edu.tw"
+    assert lookups == [1]
+    assert selects == []
+
+
+def test_deactivation_invalidates_cached_principal(users, tmp_path, monkeypatch):
+    Session, selects, lookups = users
+    adapter = SQLiteD1Adapter(str(tmp_path / "forumkit.sqlite3"))
+    monkeypatch.setattr(user_d1, "adapter", adapter)
+    asyncio.run(adapter.insert("users", {
+        "email": "a@test.edu.tw",
+        "email_hash": "hash",
+        "hashed_password": "x",
+    }))
+    token = create_access_token(1)
+
+    with Session() as db:
+        current_user(db, token)
+        db.get(Account, 1).is_active = False
+        db.commit()
+    asyncio.run(user_d1.deactivate_user(1))
+
+    with Session() as db:
+        with pytest.raises(HTTPException) as error:
+            current_user(db, token)
+    assert error.value.status_code == 403
+    assert lookups == [1, 1]
+    asyncio.run(adapter.aclose())
+
+
+def test_invalid_subject_is_rejected(users):
+    with pytest.raises(HTTPException) as error:
+        current_user(None, create_access_token("not-a-number"))
+    assert error.value.status_code == 401
+    assert users[2] == []
@@ -0,0 +1,157 @@
+import asyncio
+import os
+
+import pytest
+
+from app.services.render_cache import RenderOutputCache, file_version, render_key
+
+
+class FakeRenderer:
+    """把固定大小的內容寫入暫存路徑，記錄渲染次數"""
+
+    def __init__(self, size=100, delay=0):
+        self.size = size
+        self.delay = delay
+        self.calls = 0
+
+    async def __call__(self, output_path):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        with open(output_path, "wb") as f:
+            f.write(b"x" * self.size)
+        return output_path
+
+
+def test_render_key_is_content_addressed(tmp_path):
+    inputs = {"template_id": 1, "title": "標題", "content": "內容", "config": {"a": 1, "b": [1, 2]}}
+    assert render_key(inputs) == render_key(dict(reversed(list(inputs.items()))))
+    assert render_key(inputs) != render_key({**inputs, "content": "改過的內容"})
+
+    path = tmp_path / "bg.png"
+    assert file_version(str(path)) is None
+    path.write_bytes(b"png")
+    assert file_version(str(path))[1] == 3
+
+
+def test_identical_renders_reuse_the_output(tmp_path):
+    cache = RenderOutputCache(str(tmp_path), max_bytes=10_000)
+    render = FakeRenderer(delay=0.01)
+
+    async def scenario():
+        paths = await asyncio.gather(*(cache.get_or_render("k1", render) for _ in range(3)))
+        again = await cache.get_or_render("k1", render)
+        other = await cache.get_or_render("k2", render)
+        return paths, again, other
+
+    paths, again, other = asyncio.run(scenario())
+    assert set(paths) == {again} == {str(tmp_path / "k1.png")}
+    assert other == str(tmp_path / "k2.png")
+    assert render.calls == 2
+    assert cache.cache_info().misses == 2
+    assert cache.cache_info().hits == 3
+    assert sorted(os.listdir(tmp_path)) == ["k1.png", "k2.png"]
+
+
+def test_output_directory_is_size_bounded(tmp_path):
+    # 舊版以時間命名的輸出也納入大小上限
+    (tmp_path / "post_1_20240101_000000.png").write_bytes(b"x" * 100)
+    os.utime(tmp_path / "post_1_20240101_000000.png", (0, 0))
+    cache = RenderOutputCache(str(tmp_path), max_bytes=250)
+    render = FakeRenderer(size=100)
+
+    async def scenario():
+        await cache.get_or_render("a", render)
+        await cache.get_or_render("b", render)
+        await cache.get_or_render("a", render)
+        await cache.get_or_render("c", render)
+
+    asyncio.run(scenario())
+    # 最久未使用的舊檔與 b 被淘汰，剛使用過的 a 保留
+    assert sorted(os.listdir(tmp_path)) == ["a.png", "c.png"]
+    assert cache.total_bytes == 200
+
+
+def test_failed_render_leaves_no_files(tmp_path):
+    cache = RenderOutputCache(str(tmp_path), max_bytes=1000)
+
+    async def broken(output_path):
+        with open(output_path, "wb") as f:
+            f.write(b"partial")
+        raise RuntimeError("font missing")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(cache.get_or_render("k", broken))
+    assert os.listdir(tmp_path) == []
+
+    render = FakeRenderer()
+    assert asyncio.run(cache.get_or_render("k", render)) == str(tmp_path / "k.png")
+    assert render.calls == 1
+
+
+def test_late_output_of_abandoned_render_is_removed(tmp_path):
+    cache = RenderOutputCache(str(tmp_path), max_bytes=1000)
+    abandoned = []
+
+    async def timed_out(output_path):
+        abandoned.append(output_path)
+        raise RuntimeError("render timeout")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(cache.get_or_render("k", timed_out))
+    # 子行程在放棄等待後才寫出暫存檔
+    with open(abandoned[0], "wb") as f:
+        f.write(b"late")
+
+    asyncio.run(cache.get_or_render("other", FakeRenderer()))
+    assert os.listdir(tmp_path) == ["other.png"]
+
+    # 先前行程遺留的暫存檔在首次使用時移除，仍可能在寫入中的暫存檔保留
+    stale = tmp_path / ".k.stale.tmp"
+    stale.write_bytes(b"x")
+    os.utime(stale, (0, 0))
+    (tmp_path / ".k.fresh.tmp").write_bytes(b"x")
+    cache = RenderOutputCache(str(tmp_path), max_bytes=1000)
+    assert asyncio.run(cache.get_or_render("other", FakeRenderer())) == str(tmp_path / "other.png")
+    assert sorted(os.listdir(tmp_path)) == [".k.fresh.tmp", "other.png"]
+
+
+def test_render_post_key_does_not_depend_on_the_clock(tmp_path, monkeypatch):
+    from types import SimpleNamespace
+
+    from app.services import ig_render
+
+    post = {"id": 1, "title": "標題", "content": "內容", "created_at": "2030-01-02T03:04:05"}
+    template = {
+        "id": 7,
+        "background_image": str(tmp_path / "bg.png"),
+        "config": {"text_areas": [], "timestamp": {"format": "%Y/%m/%d %H:%M"}},
+        "updated_at": None
+    }
+
+    async def get_active():
+        return template
+
+    monkeypatch.setattr(ig_render.ig_template_d1, "get_active", get_active)
+    cache = RenderOutputCache(str(tmp_path / "out"), max_bytes=10_000)
+    monkeypatch.setattr(ig_render, "render_output_cache", cache)
+    jobs = []
+
+    async def run(fn, job):
+        jobs.append(job)
+        with open(job["output_path"], "wb") as f:
+            f.write(b"png")
+
+    monkeypatch.setattr(ig_render.render_pool, "run", run)
+    service = ig_render.IGRenderService()
+
+    first = asyncio.run(service.render(post))
+    # 時鐘前進（跨過模板時間格式的精度）後重新渲染同一篇貼文
+    monkeypatch.setattr(ig_render, "datetime", SimpleNamespace(
+        now=lambda: pytest.fail("render_post should not read the clock"),
+        fromisoformat=ig_render.datetime.fromisoformat
+    ))
+    second = asyncio.run(service.render(post))
+
+    assert first == second
+    assert len(jobs) == 1
+    assert jobs[0]["timestamp"] == "2030/01/02 03:04"
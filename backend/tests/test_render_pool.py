@@ -0,0 +1,74 @@
+import asyncio
+import os
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from app.services.render_pool import RenderPool, render_duration_seconds
+
+
+def slow_render(job):
+    started = time.perf_counter()
+    time.sleep(job["seconds"])
+    return (job["name"], os.getpid()), time.perf_counter() - started
+
+
+@pytest.fixture
+def pool():
+    pool = RenderPool(max_workers=2, max_queue=1, timeout=10)
+    yield pool
+    pool.shutdown()
+
+
+def test_renders_run_in_worker_processes(pool):
+    before = render_duration_seconds.count(stage="render")
+
+    async def scenario():
+        jobs = [{"name": name, "seconds": 0.2} for name in ("a", "b")]
+        return await asyncio.gather(*(pool.run(slow_render, job) for job in jobs))
+
+    results = asyncio.run(scenario())
+    assert [name for name, _ in results] == ["a", "b"]
+    assert all(pid != os.getpid() for _, pid in results)
+    assert pool.pending == 0
+    assert render_duration_seconds.count(stage="render") == before + 2
+
+
+def test_full_queue_is_rejected(pool):
+    async def scenario():
+        tasks = [asyncio.ensure_future(pool.run(slow_render, {"name": str(i), "seconds": 0.3})) for i in range(3)]
+        await asyncio.sleep(0)
+        with pytest.raises(HTTPException) as exc:
+            await pool.run(slow_render, {"name": "overflow", "seconds": 0})
+        results = await asyncio.gather(*tasks)
+        return exc.value, results
+
+    error, results = asyncio.run(scenario())
+    assert error.status_code == 503
+    assert error.detail["code"] == "RENDER_QUEUE_FULL"
+    assert [name for name, _ in results] == ["0", "1", "2"]
+
+
+def test_slow_render_times_out():
+    pool = RenderPool(max_workers=1, max_queue=0, timeout=0.2)
+    try:
+        with pytest.raises(HTTPException) as exc:
+            asyncio.run(pool.run(slow_render, {"name": "slow", "seconds": 1}))
+        assert exc.value.status_code == 504
+
+        # 逾時的渲染仍佔用子行程，完成前不接受新的渲染
+        assert pool.pending == 1
+        with pytest.raises(HTTPException) as exc:
+            asyncio.run(pool.run(slow_render, {"name": "next", "seconds": 0}))
+        assert exc.value.status_code == 503
+
+        for _ in range(100):
+            if pool.pending == 0:
+                break
+            time.sleep(0.02)
+        assert pool.pending == 0
+        assert asyncio.run(pool.run(slow_render, {"name": "next", "seconds": 0}))[0] == "next"
+    finally:
+        pool.shutdown()
+
@@ -0,0 +1,70 @@
+import asyncio
+
+import pytest
+
+from app.core.school_mapper import SchoolDomainMap, get_school_id_by_email_d1
+from app.crud.school_d1 import school_d1
+from app.db.d1_query_log import d1_query_log_scope
+from app.db.sqlite_adapter import SQLiteD1Adapter
+
+
+@pytest.fixture
+def adapter(tmp_path, monkeypatch):
+    adapter = SQLiteD1Adapter(str(tmp_path / "forumkit.sqlite3"))
+    monkeypatch.setattr(school_d1, "adapter", adapter)
+    yield adapter
+    asyncio.run(adapter.aclose())
+
+
+def test_concurrent_logins_create_one_school(adapter):
+    domain_map = SchoolDomainMap()
+
+    async def scenario():
+        ids = await asyncio.gather(*(domain_map.get_school_id("NEW.edu.tw") for _ in range(20)))
+        with d1_query_log_scope() as log:
+            again = await domain_map.get_school_id("new.edu.tw")
+        return ids, again, log
+
+    ids, again, log = asyncio.run(scenario())
+    assert len(set(ids)) == 1
+    assert again == ids[0]
+    assert log.records == []
+
+    schools = asyncio.run(adapter.custom_query("SELECT * FROM schools"))
+    assert [(school["name"], school["domain"]) for school in schools] == [("NEW 大學", "new.edu.tw")]
+
+
+def test_load_warms_map_and_conflicts_are_negatively_cached(adapter):
+    async def scenario():
+        await adapter.insert("schools", {"name": "CS 大學", "domain": "cs.ntu.edu.tw"})
+        domain_map = SchoolDomainMap()
+        assert await domain_map.load() == 1
+
+        with d1_query_log_scope() as warm:
+            school_id = await domain_map.get_school_id("cs.ntu.edu.tw")
+
+        # 自動產生的名稱與既有學校相同，無法建立
+        first = await domain_map.get_school_id("cs.nthu.edu.tw")
+        with d1_query_log_scope() as negative:
+            second = await domain_map.get_school_id("cs.nthu.edu.tw")
+        return school_id, warm, first, second, negative
+
+    school_id, warm, first, second, negative = asyncio.run(scenario())
+    assert school_id == 1
+    assert warm.records == []
+    assert first is None and second is None
+    assert negative.records == []
+
+
+def test_school_update_clears_domain_map(adapter, monkeypatch):
+    domain_map = SchoolDomainMap()
+    monkeypatch.setattr("app.core.school_mapper.school_domain_map", domain_map)
+
+    async def scenario():
+        school_id = await get_school_id_by_email_d1("someone@old.edu.tw")
+        await school_d1.update(id=school_id, obj_in={"domain": "renamed.edu.tw"})
+        return school_id, await get_school_id_by_email_d1("someone@renamed.edu.tw")
+
+    school_id, renamed_id = asyncio.run(scenario())
+    assert renamed_id == school_id
+    assert asyncio.run(get_school_id_by_email_d1("someone@gmail.com")) is None
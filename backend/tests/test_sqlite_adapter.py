@@ -0,0 +1,94 @@
+import asyncio
+
+import pytest
+
+from app.crud.d1_base import CRUDBase
+from app.db.d1_adapter import D1Session
+from app.db.d1_loader import d1_loader_scope
+from app.db.sqlite_adapter import SQLiteD1Adapter
+
+
+@pytest.fixture
+def adapter(tmp_path):
+    adapter = SQLiteD1Adapter(str(tmp_path / "forumkit.sqlite3"))
+    yield adapter
+    asyncio.run(adapter.aclose())
+
+
+def make_crud(adapter, table_name):
+    crud = CRUDBase(table_name)
+    crud.adapter = adapter
+    return crud
+
+
+def test_schema_is_applied_and_envelope_matches_d1(adapter):
+    async def run():
+        school_id = await adapter.insert("schools", {"name": "Test", "domain": "test.edu.tw"})
+        result = await adapter.execute_query("SELECT * FROM schools WHERE id = ?", [school_id])
+        return school_id, result
+
+    school_id, result = asyncio.run(run())
+
+    assert result["success"] is True
+    assert result["result"][0]["results"][0]["domain"] == "test.edu.tw"
+    assert result["result"][0]["meta"]["changes"] == 0
+    assert school_id == 1
+
+
+def test_crud_base_runs_against_sqlite(adapter):
+    schools = make_crud(adapter, "schools")
+
+    async def run():
+        created = await adapter.insert_returning("schools", {"name": "A", "domain": "a.edu.tw"})
+        await adapter.insert("schools", {"name": "B", "domain": "b.edu.tw"})
+        updated = await schools.update(created["id"], {"name": "A2"})
+        with d1_loader_scope(adapter):
+            loaded = await asyncio.gather(schools.get(1), schools.get(2), schools.get(3))
+        count = await schools.count()
+        removed = await schools.remove(2)
+        return updated, loaded, count, removed, await schools.count()
+
+    updated, loaded, count, removed, remaining = asyncio.run(run())
+
+    assert updated["name"] == "A2"
+    assert [row and row["domain"] for row in loaded] == ["a.edu.tw", "b.edu.tw", None]
+    assert count == 2
+    assert removed["domain"] == "b.edu.tw"
+    assert remaining == 1
+
+
+def test_failed_batch_is_rolled_back(adapter):
+    async def run():
+        with pytest.raises(Exception, match="D1 Batch query failed"):
+            await adapter.execute_batch([
+                {"sql": "INSERT INTO schools (name, domain) VALUES (?, ?)", "params": ["A", "a.edu.tw"]},
+                {"sql": "INSERT INTO schools (name, domain) VALUES (?, ?)", "params": ["A", "a.edu.tw"]},
+            ])
+        return await adapter.count("schools")
+
+    assert asyncio.run(run()) == 0
+
+
+def test_session_commit_maps_ids(adapter):
+    class Column:
+        def __init__(self, name):
+            self.name = name
+
+    class School:
+        __tablename__ = "schools"
+
+        class __table__:
+            columns = [Column("id"), Column("name"), Column("domain")]
+
+        def __init__(self, name, domain):
+            self.id = None
+            self.name = name
+            self.domain = domain
+
+    first, second = School("A", "a.edu.tw"), School("B", "b.edu.tw")
+    session = D1Session(adapter)
+    session.add(first)
+    session.add(second)
+    asyncio.run(session.commit())
+
+    assert (first.id, second.id) == (1, 2)
@@ -0,0 +1,97 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.core.ttl_cache import MISSING, TTLCache
+from app.crud import school_feature_toggle as toggle_crud
+from app.services.school_feature import SchoolFeatureService
+
+
+def test_entries_expire_and_evict_least_recently_used():
+    cache = TTLCache(ttl=60, maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+
+    assert cache.get("b") is MISSING
+    assert cache.get("a") == 1
+    cache.set("expired", None, ttl=0)
+    assert cache.get("expired") is MISSING
+    assert cache.cache_info().hits == 2
+    assert cache.cache_info().currsize == 1
+
+
+def test_get_or_load_is_single_flight():
+    cache = TTLCache(ttl=60)
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "value"
+
+    async def scenario():
+        return await asyncio.gather(*(cache.get_or_load("key", loader) for _ in range(5)))
+
+    assert asyncio.run(scenario()) == ["value"] * 5
+    assert len(calls) == 1
+    assert cache.get("key") == "value"
+
+
+def test_invalidate_during_load_discards_stale_value():
+    cache = TTLCache(ttl=60)
+
+    async def scenario():
+        async def loader():
+            await asyncio.sleep(0.01)
+            return "stale"
+
+        task = asyncio.create_task(cache.get_or_load("key", loader))
+        await asyncio.sleep(0)
+        cache.invalidate("key")
+        return await task
+
+    assert asyncio.run(scenario()) == "stale"
+    assert cache.get("key") is MISSING
+
+
+def test_feature_toggles_are_cached_until_invalidated(monkeypatch):
+    toggle = SimpleNamespace(
+        school_id=1,
+        enable_ig=True,
+        enable_discord=False,
+        enable_comments=True,
+        enable_cross_school=False
+    )
+    lookups = []
+
+    def get_by_school(db, *, school_id):
+        lookups.append(school_id)
+        return toggle if school_id == 1 else None
+
+    monkeypatch.setattr(toggle_crud, "get_by_school", get_by_school)
+    service = SchoolFeatureService()
+
+    async def scenario():
+        features = await service.get_features(None, school_id=1)
+        assert await service.is_feature_enabled(None, school_id=1, feature="ig")
+        assert not await service.is_feature_enabled(None, school_id=1, feature="discord")
+        assert not await service.is_feature_enabled(None, school_id=2, feature="ig")
+        assert not await service.is_feature_enabled(None, school_id=2, feature="discord")
+        return features
+
+    features = asyncio.run(scenario())
+    assert features == {"ig": True, "discord": False, "comments": True, "cross_school": False}
+    assert lookups == [1, 2]
+
+    # 快取的結果唯讀，呼叫端不能改動其他請求看到的開關
+    with pytest.raises(TypeError):
+        features["discord"] = True
+    assert not asyncio.run(service.is_feature_enabled(None, school_id=1, feature="discord"))
+
+    toggle.enable_discord = True
+    service.invalidate_features(1)
+    assert asyncio.run(service.is_feature_enabled(None, school_id=1, feature="discord"))
+    assert lookups == [1, 2, 1]
@@ -0,0 +1,83 @@
+import asyncio
+import json
+
+import httpx
+
+from app.crud.view_count_buffer import ViewCountBuffer
+from app.db.d1_adapter import D1Adapter
+
+
+def make_buffer(handler, **kwargs):
+    adapter = D1Adapter(
+        account_id="account",
+        database_id="database",
+        api_token="token",
+        transport=httpx.MockTransport(handler),
+    )
+    return ViewCountBuffer(adapter=adapter, **kwargs)
+
+
+def ok(request):
+    queries = json.loads(request.content)
+    return httpx.Response(200, json={
+        "success": True,
+        "result": [{"results": [], "meta": {"changes": 1}} for _ in queries],
+    })
+
+
+def test_views_are_aggregated_into_one_update():
+    batches = []
+
+    def handler(request):
+        batches.append(json.loads(request.content))
+        return ok(request)
+
+    buffer = make_buffer(handler, flush_interval=60, flush_threshold=100)
+
+    async def run():
+        for post_id in [1, 2, 1, 1]:
+            buffer.add(post_id)
+        return await buffer.flush()
+
+    assert asyncio.run(run()) == 2
+    assert batches == [[{
+        "sql": "UPDATE posts SET view_count = view_count + CASE id WHEN ? THEN ? WHEN ? THEN ? ELSE 0 END WHERE id IN (?, ?)",
+        "params": [1, 3, 2, 1, 1, 2],
+    }]]
+    assert buffer.pending == 0
+
+
+def test_threshold_triggers_flush_and_stop_drains():
+    batches = []
+
+    def handler(request):
+        batches.append(json.loads(request.content))
+        return ok(request)
+
+    buffer = make_buffer(handler, flush_interval=60, flush_threshold=2)
+
+    async def run():
+        await buffer.start()
+        buffer.add(1)
+        buffer.add(2)
+        await asyncio.sleep(0)
+        buffer.add(3)
+        await buffer.stop()
+
+    asyncio.run(run())
+
+    assert len(batches) == 2
+    assert batches[0][0]["params"][-2:] == [1, 2]
+    assert batches[1][0]["params"] == [3, 1, 3]
+
+
+def test_failed_flush_keeps_counts():
+    buffer = make_buffer(lambda request: httpx.Response(500, text="boom"))
+
+    async def run():
+        buffer.add(5)
+        buffer.add(5)
+        return await buffer.flush()
+
+    assert asyncio.run(run()) == 0
+    assert buffer._pending == {5: 2}
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+D1 索引建議工具
+重播 *_d1 CRUD 模組的查詢並分析執行計畫，產生複合／部分索引的遷移檔
+使用方式：
+    python migration_tools/index_advisor.py           # 只顯示分析結果
+    python migration_tools/index_advisor.py --write   # 將建議寫入 workers/api-d1/migrations
+"""
+
+import asyncio
+import os
+import sys
+
+# 添加專案根目錄到 Python 路徑
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+backend_path = os.path.join(project_root, 'backend')
+sys.path.insert(0, project_root)
+sys.path.insert(0, backend_path)
+
+from app.crud.comment_d1 import comment_d1
+from app.crud.post_d1 import post_d1
+from app.crud.school_d1 import school_d1
+from app.crud.user_d1 import user_d1
+from app.db.d1_migrations import MIGRATIONS_PATH
+from app.db.index_advisor import advise, render_migration
+
+def next_migration_path(name: str):
+    """依現有遷移檔編號產生下一個檔名"""
+    numbers = [
+        int(file.name.split("_", 1)[0])
+        for file in MIGRATIONS_PATH.glob("*.sql")
+        if file.name.split("_", 1)[0].isdigit()
+    ]
+    return MIGRATIONS_PATH / f"{max(numbers, default=0) + 1:04d}_{name}.sql"
+
+
+async def main():
+    """主函數"""
+    print("D1 索引建議工具")
+    print("=" * 40)
+
+    report = await advise([post_d1, comment_d1, user_d1, school_d1])
+
+    print(f"\n發現 {len(report.flagged)} 個需要全表掃描或額外排序的查詢")
+    for plan in report.flagged:
+        status = "仍需處理" if plan.remaining else "已解決"
+        print(f"  [{status}] {', '.join(plan.sources)}")
+        for detail in plan.problems:
+            print(f"      {detail}")
+
+    if not report.suggestions:
+        print("\n✓ 沒有新的索引建議")
+        return
+
+    migration = render_migration(report)
+    print(f"\n建議新增 {len(report.suggestions)} 個索引，移除 {len(report.redundant)} 個多餘索引：\n")
+    print(migration)
+
+    if "--write" in sys.argv[1:]:
+        MIGRATIONS_PATH.mkdir(parents=True, exist_ok=True)
+        path = next_migration_path("index_advisor")
+        path.write_text(migration, encoding="utf-8")
+        print(f"✓ 已寫入 {path}，執行 init_d1_database.py 或 wrangler d1 migrations apply 套用")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
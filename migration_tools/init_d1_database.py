@@ -16,6 +16,7 @@ sys.path.insert(0, project_root)
 sys.path.insert(0, backend_path)
 
 from app.db.d1_adapter import D1Adapter
+from app.db.d1_migrations import apply_migrations, split_sql_statements
 from app.core.security import get_password_hash
 import hashlib
 
@@ -37,11 +38,20 @@ class D1DatabaseInitializer:
             return False
         
         try:
+            # schema.sql 只用於空資料庫；之後的結構變更（含移除被複合索引取代的索引）
+            # 都由遷移負責，重新執行 schema.sql 會把已移除的索引建回來
+            existing = await self.d1_adapter.custom_query(
+                "SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'users'"
+            )
+            if existing:
+                print("✓ 資料表已存在，略過 schema.sql")
+                return True
+            
             with open(schema_file, 'r', encoding='utf-8') as f:
                 schema_sql = f.read()
             
-            # 分割 SQL 語句（以分號分隔）
-            sql_statements = [stmt.strip() for stmt in schema_sql.split(';') if stmt.strip()]
+            # 分割 SQL 語句（觸發器內含分號，不能單純以分號切割）
+            sql_statements = split_sql_statements(schema_sql)
             
             for i, sql in enumerate(sql_statements):
                 if sql:
@@ -49,7 +59,7 @@ class D1DatabaseInitializer:
                         print(f"執行 SQL 語句 {i+1}/{len(sql_statements)}")
                         await self.d1_adapter.execute_query(sql)
                     except Exception as e:
-                        # 忽略 "table already exists" 錯誤
+                        # 忽略 "table already exists" 錯誤（前一次初始化中途失敗時）
                         if "already exists" not in str(e).lower():
                             print(f"SQL 執行錯誤: {e}")
                             print(f"問題語句: {sql[:100]}...")
@@ -61,6 +71,20 @@ class D1DatabaseInitializer:
             print(f"創建資料表失敗: {e}")
             return False
     
+    async def apply_migrations(self) -> bool:
+        """套用 workers/api-d1/migrations 中尚未執行的遷移（例如索引建議工具產生的索引）"""
+        print("正在套用資料庫遷移...")
+        
+        try:
+            names = await apply_migrations(self.d1_adapter)
+            for name in names:
+                print(f"  套用 {name}")
+            print(f"✓ 遷移完成（新套用 {len(names)} 個）")
+            return True
+        except Exception as e:
+            print(f"套用遷移失敗: {e}")
+            return False
+    
     async def create_initial_data(self) -> bool:
         """創建初始資料"""
         print("正在創建初始資料...")
@@ -262,6 +286,11 @@ async def main():
             print("資料表創建失敗，初始化中止")
             return
         
+        # 套用遷移（既有資料庫的搜尋索引與熱度分數由 0003、0004 遷移建立並回填）
+        if not await initializer.apply_migrations():
+            print("遷移套用失敗，初始化中止")
+            return
+        
         # 創建初始資料
         if not await initializer.create_initial_data():
             print("初始資料創建失敗")
@@ -277,6 +306,8 @@ async def main():
             
     except Exception as e:
         print(f"初始化過程中發生錯誤: {e}")
+    finally:
+        await d1_adapter.aclose()
 
 
 if __name__ == "__main__":
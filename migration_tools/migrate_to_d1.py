@@ -5,11 +5,15 @@ ForumKit 資料庫遷移工具
 """
 
 import asyncio
+import calendar
 import os
 import sys
 import json
-from typing import Dict, List, Any
-from datetime import datetime
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Any, Optional, Tuple
+from datetime import date, datetime
 
 # 添加專案根目錄到 Python 路徑
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -22,67 +26,268 @@ from sqlalchemy.orm import sessionmaker
 from app.db.d1_adapter import D1Adapter
 from app.core.config import settings
 
+# D1 限制：單一語句最多綁定 100 個參數、SQL 與參數合計不超過 100KB
+D1_MAX_BOUND_PARAMETERS = 100
+D1_MAX_STATEMENT_BYTES = 100_000
+# 單次批次請求的上限（保守估計，避免超過 API 請求大小限制）
+MAX_BATCH_BYTES = 1_000_000
+MAX_STATEMENTS_PER_BATCH = 50
+
+PRIMARY_KEY = "id"
+CHECKPOINT_FILE = Path(__file__).parent / "migration_checkpoint.json"
+REPAIR_DIR = Path(__file__).parent
+
+# PostgreSQL 欄位類型分類，決定校驗時使用的聚合運算式與比較方式
+COLUMN_KINDS = {
+    "smallint": "integer",
+    "integer": "integer",
+    "bigint": "integer",
+    "boolean": "boolean",
+    "text": "text",
+    "character varying": "text",
+    "character": "text",
+    "timestamp without time zone": "timestamp",
+    "timestamp with time zone": "timestamp",
+    "date": "timestamp",
+    "double precision": "float",
+    "real": "float",
+    "numeric": "float",
+    "json": "json",
+    "jsonb": "json",
+}
+
+# 以主鍵為權重，使兩筆記錄互換數值時校驗值也會改變；取餘數避免 SQLite 整數溢位
+ROW_WEIGHT = f"CAST({PRIMARY_KEY} % 1000 + 1 AS BIGINT)"
+
+@dataclass
+class VerificationReport:
+    """單一資料表的校驗結果"""
+    table_name: str
+    ranges_checked: int = 0
+    missing_ids: List[Any] = field(default_factory=list)
+    extra_ids: List[Any] = field(default_factory=list)
+    changed_ids: List[Any] = field(default_factory=list)
+    # 需要以 PostgreSQL 資料覆寫到 D1 的記錄（已轉換為 D1 格式）
+    upsert_rows: List[Dict[str, Any]] = field(default_factory=list)
+    
+    @property
+    def ok(self) -> bool:
+        return not (self.missing_ids or self.extra_ids or self.changed_ids)
+
+class MigrationCheckpoint:
+    """記錄各資料表已遷移的最大主鍵，中斷後可從該處繼續"""
+    
+    def __init__(self, path: Path = CHECKPOINT_FILE):
+        self.path = Path(path)
+        self.positions: Dict[str, Any] = {}
+        if self.path.exists():
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.positions = json.load(f)
+    
+    def get(self, table_name: str) -> Optional[Any]:
+        return self.positions.get(table_name)
+    
+    def save(self, table_name: str, last_id: Any):
+        """更新並寫入檢查點（先寫暫存檔再取代，避免中斷時留下損壞的檔案）"""
+        self.positions[table_name] = last_id
+        temp_path = self.path.with_suffix(".tmp")
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.positions, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, self.path)
+
 class PostgreSQLToD1Migrator:
     """PostgreSQL 到 D1 的資料遷移工具"""
     
-    def __init__(self, pg_connection_string: str, d1_adapter: D1Adapter):
+    def __init__(
+        self,
+        pg_connection_string: str,
+        d1_adapter: D1Adapter,
+        concurrency: int = 4,
+        checkpoint_path: Path = CHECKPOINT_FILE,
+        max_retries: int = 3,
+        auto_repair: bool = False
+    ):
         self.pg_engine = create_engine(pg_connection_string)
         self.pg_session = sessionmaker(bind=self.pg_engine)()
         self.d1_adapter = d1_adapter
+        self.concurrency = concurrency
+        self.checkpoint = MigrationCheckpoint(checkpoint_path)
+        self.max_retries = max_retries
+        self.auto_repair = auto_repair
         
-    async def migrate_table(self, table_name: str, batch_size: int = 100) -> int:
-        """遷移單個資料表"""
-        print(f"開始遷移表格: {table_name}")
+    async def migrate_table(self, table_name: str, fetch_size: int = 1000) -> int:
+        """
+        遷移單個資料表
+        以伺服器端游標依主鍵順序串流讀取，多列 INSERT 組成批次後並行送出，
+        並在連續完成的批次之後更新檢查點
+        """
+        last_id = self.checkpoint.get(table_name)
+        if last_id is not None:
+            print(f"開始遷移表格: {table_name}（從 {PRIMARY_KEY} > {last_id} 繼續）")
+        else:
+            print(f"開始遷移表格: {table_name}")
         
-        # 從 PostgreSQL 獲取資料
-        query = text(f"SELECT * FROM {table_name}")
-        result = self.pg_session.execute(query)
-        rows = result.fetchall()
-        columns = result.keys()
+        condition = f" WHERE {PRIMARY_KEY} > :last_id" if last_id is not None else ""
+        params = {"last_id": last_id} if last_id is not None else {}
         
-        print(f"找到 {len(rows)} 筆記錄")
+        total = self.pg_session.execute(
+            text(f"SELECT COUNT(*) FROM {table_name}{condition}"), params
+        ).scalar()
+        print(f"找到 {total} 筆待遷移記錄")
         
         migrated_count = 0
+        failed_ids = []
+        in_flight = deque()
         
-        # 分批處理資料
-        for i in range(0, len(rows), batch_size):
-            batch = rows[i:i + batch_size]
-            
-            # 準備批次插入的查詢
-            batch_queries = []
+        def advance_checkpoint():
+            """
+            依序移除已完成的批次，推進檢查點到連續完成的最大主鍵
+            有記錄寫入失敗後不再推進，重新執行時會從失敗的批次重送（已寫入的記錄衝突時略過）
+            """
+            nonlocal migrated_count
+            while in_flight and in_flight[0][1].done():
+                batch_last_id, task = in_flight.popleft()
+                count, batch_failed_ids = task.result()
+                migrated_count += count
+                failed_ids.extend(batch_failed_ids)
+                if not failed_ids:
+                    self.checkpoint.save(table_name, batch_last_id)
+        
+        connection = self.pg_engine.connect().execution_options(stream_results=True)
+        try:
+            result = connection.execute(
+                text(f"SELECT * FROM {table_name}{condition} ORDER BY {PRIMARY_KEY}"), params
+            )
+            columns = list(result.keys())
             
-            for row in batch:
-                # 轉換 PostgreSQL 資料為 D1 格式
-                data = self._convert_row_data(dict(zip(columns, row)))
+            while True:
+                # 讀取在執行緒中進行，讓已送出的批次可同時等待回應
+                rows = await asyncio.to_thread(result.fetchmany, fetch_size)
+                if not rows:
+                    break
                 
-                # 準備插入語句
-                columns_str = ', '.join(data.keys())
-                placeholders = ', '.join(['?' for _ in data.values()])
-                sql = f"INSERT INTO {table_name} ({columns_str}) VALUES ({placeholders})"
+                data_rows = [self._convert_row_data(dict(zip(columns, row))) for row in rows]
+                for batch in self._build_batches(table_name, columns, data_rows):
+                    while len(in_flight) >= self.concurrency:
+                        await asyncio.wait(
+                            [task for _, task in in_flight],
+                            return_when=asyncio.FIRST_COMPLETED
+                        )
+                        advance_checkpoint()
+                    
+                    task = asyncio.ensure_future(self._send_batch(table_name, columns, batch))
+                    in_flight.append((batch[-1][1][-1][PRIMARY_KEY], task))
                 
-                batch_queries.append({
-                    "sql": sql,
-                    "params": list(data.values())
-                })
+                advance_checkpoint()
+                print(f"已遷移 {migrated_count}/{total} 筆記錄")
             
-            # 執行批次插入
-            try:
-                await self.d1_adapter.execute_batch(batch_queries)
-                migrated_count += len(batch)
-                print(f"已遷移 {migrated_count}/{len(rows)} 筆記錄")
-            except Exception as e:
-                print(f"批次插入失敗: {e}")
-                # 嘗試逐筆插入
-                for query in batch_queries:
-                    try:
-                        await self.d1_adapter.execute_query(query["sql"], query["params"])
-                        migrated_count += 1
-                    except Exception as row_error:
-                        print(f"記錄插入失敗: {row_error}")
+            if in_flight:
+                await asyncio.wait([task for _, task in in_flight])
+                advance_checkpoint()
+        finally:
+            # 中斷時等待已送出的批次結束，檢查點只記錄確定完成的部分
+            if in_flight:
+                await asyncio.gather(*(task for _, task in in_flight), return_exceptions=True)
+            connection.close()
         
+        if failed_ids:
+            print(
+                f"表格 {table_name} 有 {len(failed_ids)} 筆記錄寫入失敗（{PRIMARY_KEY}: {failed_ids[:20]}），"
+                f"檢查點停在 {self.checkpoint.get(table_name)}，修正後重新執行即可補上"
+            )
         print(f"表格 {table_name} 遷移完成，共遷移 {migrated_count} 筆記錄")
         return migrated_count
     
+    def _insert_statement(
+        self,
+        table_name: str,
+        columns: List[str],
+        rows: List[Dict[str, Any]],
+        upsert: bool = False
+    ) -> Dict[str, Any]:
+        """
+        組合多列 INSERT；主鍵衝突時略過，讓中斷後重新送出的批次不會失敗
+        upsert 為 True 時改為以來源資料覆寫（修復不一致的記錄）
+        """
+        placeholders = '(' + ', '.join(['?' for _ in columns]) + ')'
+        values = ', '.join([placeholders for _ in rows])
+        if upsert:
+            assignments = ', '.join(f"{column} = excluded.{column}" for column in columns if column != PRIMARY_KEY)
+            conflict = f"DO UPDATE SET {assignments}"
+        else:
+            conflict = "DO NOTHING"
+        sql = (
+            f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES {values} "
+            f"ON CONFLICT({PRIMARY_KEY}) {conflict}"
+        )
+        return {
+            "sql": sql,
+            "params": [row[column] for row in rows for column in columns]
+        }
+    
+    def _statement_size(self, statement: Dict[str, Any]) -> int:
+        """估算語句送出時的位元組數"""
+        return len(json.dumps(statement, ensure_ascii=False, default=str).encode())
+    
+    def _build_batches(self, table_name: str, columns: List[str], rows: List[Dict[str, Any]], upsert: bool = False):
+        """
+        將資料列切成符合 D1 限制的批次，每個批次為 [(語句, 資料列)]
+        每個語句的列數受綁定參數上限與語句大小限制
+        """
+        rows_per_statement = max(1, D1_MAX_BOUND_PARAMETERS // len(columns))
+        
+        batch, batch_bytes = [], 0
+        i = 0
+        while i < len(rows):
+            chunk = rows[i:i + rows_per_statement]
+            statement = self._insert_statement(table_name, columns, chunk, upsert)
+            size = self._statement_size(statement)
+            # 內容較大的資料列（例如長篇貼文）減少每個語句的列數
+            while size > D1_MAX_STATEMENT_BYTES and len(chunk) > 1:
+                chunk = chunk[:len(chunk) // 2]
+                statement = self._insert_statement(table_name, columns, chunk, upsert)
+                size = self._statement_size(statement)
+            
+            if batch and (batch_bytes + size > MAX_BATCH_BYTES or len(batch) >= MAX_STATEMENTS_PER_BATCH):
+                yield batch
+                batch, batch_bytes = [], 0
+            batch.append((statement, chunk))
+            batch_bytes += size
+            i += len(chunk)
+        
+        if batch:
+            yield batch
+    
+    async def _send_batch(self, table_name: str, columns: List[str], batch: List) -> Tuple[int, List[Any]]:
+        """送出批次（失敗時退避重試，仍失敗則逐筆插入），返回 (成功的筆數, 寫入失敗的主鍵)"""
+        queries = [statement for statement, _ in batch]
+        row_count = sum(len(rows) for _, rows in batch)
+        
+        for attempt in range(self.max_retries):
+            try:
+                result = await self.d1_adapter.execute_batch(queries)
+                if not result.get('success'):
+                    raise Exception(f"Batch insert failed: {result}")
+                return row_count, []
+            except Exception as e:
+                print(f"批次插入失敗（第 {attempt + 1} 次）: {e}")
+                if attempt + 1 < self.max_retries:
+                    await asyncio.sleep(2 ** attempt)
+        
+        # 嘗試逐筆插入，找出無法寫入的記錄
+        migrated_count = 0
+        failed_ids = []
+        for _, rows in batch:
+            for row in rows:
+                query = self._insert_statement(table_name, columns, [row])
+                try:
+                    await self.d1_adapter.execute_query(query["sql"], query["params"])
+                    migrated_count += 1
+                except Exception as row_error:
+                    print(f"記錄插入失敗 ({PRIMARY_KEY}={row[PRIMARY_KEY]}): {row_error}")
+                    failed_ids.append(row[PRIMARY_KEY])
+        return migrated_count, failed_ids
+    
     def _convert_row_data(self, data: Dict[str, Any]) -> Dict[str, Any]:
         """轉換 PostgreSQL 資料格式為 D1 相容格式"""
         converted = {}
@@ -104,19 +309,274 @@ class PostgreSQLToD1Migrator:
         
         return converted
     
+    def _pg_columns(self, table_name: str) -> List[tuple]:
+        """PostgreSQL 資料表的 [(欄位, 類型)]"""
+        with self.pg_engine.connect() as connection:
+            rows = connection.execute(text(
+                "SELECT column_name, data_type FROM information_schema.columns "
+                "WHERE table_name = :table_name AND table_schema = current_schema() "
+                "ORDER BY ordinal_position"
+            ), {"table_name": table_name}).fetchall()
+        return [(name, data_type) for name, data_type in rows]
+    
+    async def _comparable_columns(self, table_name: str) -> List[tuple]:
+        """兩邊都存在的欄位 [(欄位, 類型分類)]（D1 專用欄位如 hot_score 不比較）"""
+        pg_columns = await asyncio.to_thread(self._pg_columns, table_name)
+        d1_columns = {row["name"] for row in await self.d1_adapter.custom_query(f"PRAGMA table_info({table_name})")}
+        return [
+            (name, COLUMN_KINDS.get(data_type, "other"))
+            for name, data_type in pg_columns
+            if name in d1_columns
+        ]
+    
+    def _fingerprint_expressions(self, columns: List[tuple]) -> tuple:
+        """
+        產生範圍校驗的聚合運算式，返回 (PostgreSQL 運算式, SQLite 運算式)
+        兩邊以相同語意計算：非空值數量、整數與布林的加權和、時間的 epoch 加權和，
+        以及文字的長度與首、中、尾字元碼位加權和；兩邊只有取碼位與 epoch 的函式不同
+        """
+        pg, d1 = [], []
+        
+        def add(pg_expression: str, d1_expression: Optional[str] = None):
+            pg.append(pg_expression)
+            d1.append(d1_expression or pg_expression)
+        
+        for column, kind in columns:
+            add(f"COUNT({column})")
+            if kind == "integer":
+                add(f"SUM({ROW_WEIGHT} * {column})")
+            elif kind == "boolean":
+                add(f"SUM({ROW_WEIGHT} * CASE WHEN {column} THEN 1 ELSE 0 END)")
+            elif kind == "timestamp":
+                add(
+                    f"SUM({ROW_WEIGHT} * CAST(FLOOR(date_part('epoch', {column})) AS BIGINT))",
+                    f"SUM({ROW_WEIGHT} * CAST(strftime('%s', {column}) AS INTEGER))"
+                )
+            elif kind == "text":
+                add(f"SUM({ROW_WEIGHT} * LENGTH({column}))")
+                add(f"SUM({ROW_WEIGHT} * ASCII({column}))", f"SUM({ROW_WEIGHT} * UNICODE({column}))")
+                add(
+                    f"SUM({ROW_WEIGHT} * ASCII(SUBSTR({column}, LENGTH({column}) / 2 + 1, 1)))",
+                    f"SUM({ROW_WEIGHT} * UNICODE(SUBSTR({column}, LENGTH({column}) / 2 + 1, 1)))"
+                )
+                add(
+                    f"SUM({ROW_WEIGHT} * ASCII(SUBSTR({column}, LENGTH({column}), 1)))",
+                    f"SUM({ROW_WEIGHT} * UNICODE(SUBSTR({column}, LENGTH({column}), 1)))"
+                )
+        
+        return (
+            [f"{expression} AS f{i}" for i, expression in enumerate(pg)],
+            [f"{expression} AS f{i}" for i, expression in enumerate(d1)]
+        )
+    
+    def _pg_fingerprint(self, table_name: str, expressions: List[str], low: int, high: int) -> List[int]:
+        """計算 PostgreSQL 主鍵範圍的校驗值"""
+        with self.pg_engine.connect() as connection:
+            row = connection.execute(
+                text(f"SELECT {', '.join(expressions)} FROM {table_name} WHERE {PRIMARY_KEY} BETWEEN :low AND :high"),
+                {"low": low, "high": high}
+            ).one()
+        # 空字串的首字元碼位：PostgreSQL 為 0、SQLite 為 NULL，一律視為 0
+        return [int(value or 0) for value in row]
+    
+    async def _d1_fingerprint(self, table_name: str, expressions: List[str], low: int, high: int) -> List[int]:
+        """計算 D1 主鍵範圍的校驗值"""
+        rows = await self.d1_adapter.custom_query(
+            f"SELECT {', '.join(expressions)} FROM {table_name} WHERE {PRIMARY_KEY} BETWEEN ? AND ?",
+            [low, high]
+        )
+        return [int(rows[0][f"f{i}"] or 0) for i in range(len(expressions))]
+    
+    def _pg_rows(self, table_name: str, low: int, high: int) -> List[Dict[str, Any]]:
+        """讀取 PostgreSQL 主鍵範圍內的記錄"""
+        with self.pg_engine.connect() as connection:
+            result = connection.execute(
+                text(f"SELECT * FROM {table_name} WHERE {PRIMARY_KEY} BETWEEN :low AND :high"),
+                {"low": low, "high": high}
+            )
+            columns = list(result.keys())
+            return [dict(zip(columns, row)) for row in result.fetchall()]
+    
+    def _normalize(self, value: Any, kind: str) -> Any:
+        """將兩邊的值轉為可比較的形式"""
+        if value is None:
+            return None
+        if kind == "boolean":
+            return int(bool(value))
+        if kind == "timestamp":
+            if isinstance(value, str):
+                try:
+                    value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+                except ValueError:
+                    return value
+            if isinstance(value, datetime):
+                return calendar.timegm(value.utctimetuple())
+            if isinstance(value, date):
+                return calendar.timegm(value.timetuple())
+            return value
+        if kind == "float":
+            return round(float(value), 6)
+        if kind == "json":
+            if isinstance(value, str):
+                try:
+                    value = json.loads(value)
+                except ValueError:
+                    return value
+            return json.dumps(value, sort_keys=True)
+        if isinstance(value, (int, str)):
+            return value
+        return str(value)
+    
+    async def _diff_rows(self, table_name: str, columns: List[tuple], low: int, high: int, report: VerificationReport):
+        """逐筆比較範圍內的記錄，找出缺少、多出與不一致的記錄"""
+        pg_rows = await asyncio.to_thread(self._pg_rows, table_name, low, high)
+        d1_rows = await self.d1_adapter.custom_query(
+            f"SELECT * FROM {table_name} WHERE {PRIMARY_KEY} BETWEEN ? AND ?",
+            [low, high]
+        )
+        d1_by_id = {row[PRIMARY_KEY]: row for row in d1_rows}
+        
+        for pg_row in pg_rows:
+            id = pg_row[PRIMARY_KEY]
+            d1_row = d1_by_id.pop(id, None)
+            if d1_row is None:
+                report.missing_ids.append(id)
+            elif any(
+                self._normalize(pg_row[column], kind) != self._normalize(d1_row[column], kind)
+                for column, kind in columns
+            ):
+                report.changed_ids.append(id)
+            else:
+                continue
+            report.upsert_rows.append(self._convert_row_data(pg_row))
+        
+        report.extra_ids.extend(d1_by_id.keys())
+    
+    async def _verify_range(
+        self,
+        table_name: str,
+        columns: List[tuple],
+        expressions: tuple,
+        low: int,
+        high: int,
+        leaf_size: int,
+        report: VerificationReport,
+        semaphore: asyncio.Semaphore
+    ):
+        """比較範圍校驗值，不一致時二分範圍直到可逐筆比較"""
+        pg_expressions, d1_expressions = expressions
+        async with semaphore:
+            pg_fingerprint, d1_fingerprint = await asyncio.gather(
+                asyncio.to_thread(self._pg_fingerprint, table_name, pg_expressions, low, high),
+                self._d1_fingerprint(table_name, d1_expressions, low, high)
+            )
+            report.ranges_checked += 1
+            if pg_fingerprint == d1_fingerprint:
+                return
+            if high - low + 1 <= leaf_size:
+                await self._diff_rows(table_name, columns, low, high, report)
+                return
+        
+        middle = (low + high) // 2
+        await asyncio.gather(
+            self._verify_range(table_name, columns, expressions, low, middle, leaf_size, report, semaphore),
+            self._verify_range(table_name, columns, expressions, middle + 1, high, leaf_size, report, semaphore)
+        )
+    
+    async def verify_table(
+        self,
+        table_name: str,
+        chunk_size: int = 10000,
+        leaf_size: int = 100
+    ) -> VerificationReport:
+        """
+        以主鍵範圍校驗值比對兩邊的資料表
+        兩邊各自在資料庫內計算每個範圍的聚合校驗值，只有不一致的範圍會被二分並逐筆比較
+        """
+        report = VerificationReport(table_name)
+        columns = await self._comparable_columns(table_name)
+        expressions = self._fingerprint_expressions(columns)
+        
+        with self.pg_engine.connect() as connection:
+            pg_low, pg_high = connection.execute(
+                text(f"SELECT MIN({PRIMARY_KEY}), MAX({PRIMARY_KEY}) FROM {table_name}")
+            ).one()
+        d1_bounds = await self.d1_adapter.custom_query(
+            f"SELECT MIN({PRIMARY_KEY}) AS low, MAX({PRIMARY_KEY}) AS high FROM {table_name}"
+        )
+        lows = [value for value in (pg_low, d1_bounds[0]["low"]) if value is not None]
+        highs = [value for value in (pg_high, d1_bounds[0]["high"]) if value is not None]
+        if not lows:
+            return report
+        
+        low, high = min(lows), max(highs)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        await asyncio.gather(*(
+            self._verify_range(
+                table_name, columns, expressions,
+                start, min(start + chunk_size - 1, high),
+                leaf_size, report, semaphore
+            )
+            for start in range(low, high + 1, chunk_size)
+        ))
+        return report
+    
+    def build_repair_batches(self, report: VerificationReport) -> List[List[Dict[str, Any]]]:
+        """產生修復用的批次：以 PostgreSQL 資料覆寫缺少或不一致的記錄，並刪除 D1 多出的記錄"""
+        batches = []
+        if report.upsert_rows:
+            columns = list(report.upsert_rows[0].keys())
+            for batch in self._build_batches(report.table_name, columns, report.upsert_rows, upsert=True):
+                batches.append([statement for statement, _ in batch])
+        
+        extra_ids = sorted(report.extra_ids)
+        deletes = []
+        for i in range(0, len(extra_ids), D1_MAX_BOUND_PARAMETERS):
+            chunk = extra_ids[i:i + D1_MAX_BOUND_PARAMETERS]
+            placeholders = ', '.join(['?' for _ in chunk])
+            deletes.append({
+                "sql": f"DELETE FROM {report.table_name} WHERE {PRIMARY_KEY} IN ({placeholders})",
+                "params": chunk
+            })
+        for i in range(0, len(deletes), MAX_STATEMENTS_PER_BATCH):
+            batches.append(deletes[i:i + MAX_STATEMENTS_PER_BATCH])
+        return batches
+    
+    async def repair_table(self, report: VerificationReport) -> bool:
+        """執行修復批次"""
+        for batch in self.build_repair_batches(report):
+            try:
+                result = await self.d1_adapter.execute_batch(batch)
+                if not result.get('success'):
+                    raise Exception(f"Repair batch failed: {result}")
+            except Exception as e:
+                print(f"修復批次失敗: {e}")
+                return False
+        return True
+    
     async def verify_migration(self, table_name: str) -> bool:
-        """驗證遷移結果"""
-        # 計算 PostgreSQL 記錄數
-        pg_query = text(f"SELECT COUNT(*) FROM {table_name}")
-        pg_count = self.pg_session.execute(pg_query).scalar()
+        """驗證遷移結果（範圍校驗），不一致時輸出修復批次，並可選擇自動修復"""
+        report = await self.verify_table(table_name)
+        
+        print(
+            f"表格 {table_name} 驗證: 檢查 {report.ranges_checked} 個範圍，"
+            f"缺少 {len(report.missing_ids)}、多出 {len(report.extra_ids)}、不一致 {len(report.changed_ids)} 筆"
+        )
+        if report.ok:
+            return True
         
-        # 計算 D1 記錄數
-        d1_result = await self.d1_adapter.custom_query(f"SELECT COUNT(*) as count FROM {table_name}")
-        d1_count = d1_result[0]['count'] if d1_result else 0
+        repair_path = REPAIR_DIR / f"repair_{table_name}.json"
+        with open(repair_path, 'w', encoding='utf-8') as f:
+            json.dump(self.build_repair_batches(report), f, ensure_ascii=False, indent=2, default=str)
+        print(f"修復批次已寫入 {repair_path}")
         
-        print(f"表格 {table_name} 驗證: PostgreSQL({pg_count}) vs D1({d1_count})")
+        if not self.auto_repair:
+            return False
         
-        return pg_count == d1_count
+        print(f"正在修復表格 {table_name}...")
+        if not await self.repair_table(report):
+            return False
+        return (await self.verify_table(table_name)).ok
     
     async def full_migration(self) -> Dict[str, bool]:
         """執行完整遷移"""
@@ -219,6 +679,8 @@ async def main():
     
     print(f"PostgreSQL 連接: {pg_connection}")
     
+    auto_repair = input("驗證發現不一致時自動修復？(y/N): ").strip().lower() == "y"
+    
     # 創建 D1 適配器
     d1_adapter = D1Adapter(
         account_id=os.getenv("CLOUDFLARE_ACCOUNT_ID"),
@@ -226,8 +688,10 @@ async def main():
         api_token=os.getenv("CLOUDFLARE_API_TOKEN")
     )
     
-    # 創建遷移器
-    migrator = PostgreSQLToD1Migrator(pg_connection, d1_adapter)
+    # 創建遷移器（中斷後重新執行會從檢查點繼續，刪除檢查點檔案可重新開始）
+    migrator = PostgreSQLToD1Migrator(pg_connection, d1_adapter, auto_repair=auto_repair)
+    if migrator.checkpoint.positions:
+        print(f"從檢查點 {migrator.checkpoint.path} 繼續遷移")
     
     try:
         # 執行遷移
@@ -248,6 +712,7 @@ async def main():
         print(f"遷移過程中發生錯誤: {e}")
     finally:
         migrator.close()
+        await d1_adapter.aclose()
 
 
 if __name__ == "__main__":
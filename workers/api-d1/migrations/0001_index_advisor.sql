@@ -0,0 +1,57 @@
+-- Generated by migration_tools/index_advisor.py
+
+-- CRUDPostD1.get_pending_posts(school_id)
+-- CRUDPostD1.get_post_statistics(school_id)
+-- CRUDPostD1.get_posts_by_school(school_id, status)
+-- CRUDPostD1.get_posts_by_school_page(school_id, status)
+CREATE INDEX IF NOT EXISTS idx_posts_school_id_status_created_at ON posts(school_id, status, created_at);
+
+-- CRUDCommentD1.get_comments_by_post(post_id)
+CREATE INDEX IF NOT EXISTS idx_comments_post_id_status_created_at ON comments(post_id, status, created_at);
+
+-- CRUDCommentD1.get_comments_by_school(school_id, status)
+-- CRUDCommentD1.get_comments_by_school_page(school_id, status)
+-- CRUDCommentD1.get_pending_comments(school_id)
+-- CRUDSchoolD1.get_school_statistics(school_id)
+CREATE INDEX IF NOT EXISTS idx_comments_status_school_id_created_at ON comments(status, school_id, created_at);
+
+-- CRUDPostD1.get_posts_by_school(school_id)
+-- CRUDPostD1.get_posts_by_school_page(school_id)
+CREATE INDEX IF NOT EXISTS idx_posts_school_id_created_at ON posts(school_id, created_at);
+
+-- CRUDPostD1.get_posts_by_author(author_id)
+CREATE INDEX IF NOT EXISTS idx_posts_author_id_created_at ON posts(author_id, created_at);
+
+-- CRUDPostD1.get_pending_posts()
+CREATE INDEX IF NOT EXISTS idx_posts_status_created_at ON posts(status, created_at);
+
+-- CRUDCommentD1.get_comments_by_user(author_id)
+CREATE INDEX IF NOT EXISTS idx_comments_author_id_created_at ON comments(author_id, created_at);
+
+-- CRUDCommentD1.get_pending_comments()
+CREATE INDEX IF NOT EXISTS idx_comments_status_created_at ON comments(status, created_at);
+
+-- CRUDCommentD1.get_comment_replies(parent_id)
+CREATE INDEX IF NOT EXISTS idx_comments_parent_id_created_at ON comments(parent_id, created_at);
+
+-- CRUDCommentD1.get_comments_by_school(school_id)
+-- CRUDCommentD1.get_comments_by_school_page(school_id)
+CREATE INDEX IF NOT EXISTS idx_comments_school_id_created_at ON comments(school_id, created_at);
+
+-- CRUDUserD1.get_users_by_school(school_id)
+-- CRUDUserD1.get_users_by_school_page(school_id)
+CREATE INDEX IF NOT EXISTS idx_users_school_id_created_at ON users(school_id, created_at);
+
+-- CRUDUserD1.get_users_by_role(role)
+CREATE INDEX IF NOT EXISTS idx_users_role_created_at ON users(role, created_at);
+
+-- CRUDUserD1.search_users(query)
+CREATE INDEX IF NOT EXISTS idx_users_created_at ON users(created_at);
+
+-- Covered by the composite indexes above
+DROP INDEX IF EXISTS idx_posts_school_id;
+DROP INDEX IF EXISTS idx_comments_post_id;
+DROP INDEX IF EXISTS idx_posts_author_id;
+DROP INDEX IF EXISTS idx_posts_status;
+DROP INDEX IF EXISTS idx_comments_author_id;
+DROP INDEX IF EXISTS idx_users_school_id;
@@ -0,0 +1,17 @@
+-- Outbox for post fan-out to Instagram / Discord, written in the same batch as the post
+-- and drained by the API's background workers (status: pending -> processing -> deleted, or dead)
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    destination TEXT NOT NULL,
+    post_id INTEGER NOT NULL,
+    payload TEXT,
+    status TEXT DEFAULT 'pending' NOT NULL,
+    attempts INTEGER DEFAULT 0 NOT NULL,
+    next_attempt_at DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL,
+    last_error TEXT,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL,
+    updated_at DATETIME,
+    FOREIGN KEY (post_id) REFERENCES posts (id) ON DELETE CASCADE
+);
+
+CREATE INDEX IF NOT EXISTS idx_outbox_destination_status_next ON outbox(destination, status, next_attempt_at);
@@ -0,0 +1,25 @@
+-- Full-text search index for posts (trigram tokenizer also matches CJK substrings)
+CREATE VIRTUAL TABLE IF NOT EXISTS posts_fts USING fts5(
+    title,
+    content,
+    content='posts',
+    content_rowid='id',
+    tokenize='trigram'
+);
+
+-- Keep the search index in sync with posts
+CREATE TRIGGER IF NOT EXISTS posts_fts_ai AFTER INSERT ON posts BEGIN
+    INSERT INTO posts_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+END;
+
+CREATE TRIGGER IF NOT EXISTS posts_fts_ad AFTER DELETE ON posts BEGIN
+    INSERT INTO posts_fts(posts_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content);
+END;
+
+CREATE TRIGGER IF NOT EXISTS posts_fts_au AFTER UPDATE OF title, content ON posts BEGIN
+    INSERT INTO posts_fts(posts_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content);
+    INSERT INTO posts_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+END;
+
+-- Index posts that existed before the search table was created
+INSERT INTO posts_fts(posts_fts) VALUES ('rebuild');
@@ -0,0 +1,59 @@
+-- Materialized hot score for popular feeds: log2 of engagement plus a time term that grows by 1
+-- every 12 hours, so newer posts outrank older ones without periodic recomputation.
+-- log2 is approximated piecewise-linearly between powers of two so the trigger does not depend on
+-- SQLite's optional math functions: exact at each power and within 0.09 in between for engagement
+-- up to 2^32, above which the term is clamped to 32.
+ALTER TABLE posts ADD COLUMN hot_score REAL DEFAULT 0 NOT NULL;
+
+CREATE TRIGGER IF NOT EXISTS posts_hot_score_au AFTER UPDATE OF like_count, comment_count, view_count, created_at ON posts BEGIN
+    UPDATE posts SET hot_score = (
+        SELECT CASE
+            WHEN e < 2 THEN e - 1
+            WHEN e < 4 THEN e / 2.0
+            WHEN e < 8 THEN 1 + e / 4.0
+            WHEN e < 16 THEN 2 + e / 8.0
+            WHEN e < 32 THEN 3 + e / 16.0
+            WHEN e < 64 THEN 4 + e / 32.0
+            WHEN e < 128 THEN 5 + e / 64.0
+            WHEN e < 256 THEN 6 + e / 128.0
+            WHEN e < 512 THEN 7 + e / 256.0
+            WHEN e < 1024 THEN 8 + e / 512.0
+            WHEN e < 2048 THEN 9 + e / 1024.0
+            WHEN e < 4096 THEN 10 + e / 2048.0
+            WHEN e < 8192 THEN 11 + e / 4096.0
+            WHEN e < 16384 THEN 12 + e / 8192.0
+            WHEN e < 32768 THEN 13 + e / 16384.0
+            WHEN e < 65536 THEN 14 + e / 32768.0
+            WHEN e < 131072 THEN 15 + e / 65536.0
+            WHEN e < 262144 THEN 16 + e / 131072.0
+            WHEN e < 524288 THEN 17 + e / 262144.0
+            WHEN e < 1048576 THEN 18 + e / 524288.0
+            WHEN e < 2097152 THEN 19 + e / 1048576.0
+            WHEN e < 4194304 THEN 20 + e / 2097152.0
+            WHEN e < 8388608 THEN 21 + e / 4194304.0
+            WHEN e < 16777216 THEN 22 + e / 8388608.0
+            WHEN e < 33554432 THEN 23 + e / 16777216.0
+            WHEN e < 67108864 THEN 24 + e / 33554432.0
+            WHEN e < 134217728 THEN 25 + e / 67108864.0
+            WHEN e < 268435456 THEN 26 + e / 134217728.0
+            WHEN e < 536870912 THEN 27 + e / 268435456.0
+            WHEN e < 1073741824 THEN 28 + e / 536870912.0
+            WHEN e < 2147483648 THEN 29 + e / 1073741824.0
+            WHEN e < 4294967296 THEN 30 + e / 2147483648.0
+            ELSE 32
+        END
+        FROM (SELECT 1 + new.like_count + new.comment_count * 2 + new.view_count / 10.0 AS e)
+    ) + (CAST(strftime('%s', new.created_at) AS INTEGER) - 1704067200) / 43200.0
+    WHERE id = new.id;
+END;
+
+-- New posts go through the update trigger so the formula lives in one place
+CREATE TRIGGER IF NOT EXISTS posts_hot_score_ai AFTER INSERT ON posts BEGIN
+    UPDATE posts SET view_count = view_count WHERE id = new.id;
+END;
+
+-- Backfill existing posts
+UPDATE posts SET view_count = view_count;
+
+CREATE INDEX IF NOT EXISTS idx_posts_status_hot ON posts(status, hot_score DESC, id DESC) WHERE deleted_at IS NULL;
+CREATE INDEX IF NOT EXISTS idx_posts_school_status_hot ON posts(school_id, status, hot_score DESC, id DESC) WHERE deleted_at IS NULL;
@@ -0,0 +1,11 @@
+-- Settings read by the outbox publishers: the Graph API token of each school's Instagram account
+-- and the render settings of each template (background image path and JSON layout: text areas,
+-- timestamp and logo positions)
+ALTER TABLE ig_accounts ADD COLUMN school_id INTEGER REFERENCES schools (id);
+ALTER TABLE ig_accounts ADD COLUMN access_token TEXT;
+ALTER TABLE ig_accounts ADD COLUMN token_expires_at DATETIME;
+ALTER TABLE ig_templates ADD COLUMN background_image TEXT;
+ALTER TABLE ig_templates ADD COLUMN config TEXT;
+
+CREATE INDEX IF NOT EXISTS idx_ig_accounts_school_id ON ig_accounts(school_id);
+CREATE INDEX IF NOT EXISTS idx_discord_settings_school_id ON discord_settings(school_id);
@@ -182,6 +182,48 @@ CREATE TABLE ig_templates (
     updated_at DATETIME
 );
 
+-- Outbox for post fan-out to Instagram / Discord, written in the same batch as the post
+-- and drained by the API's background workers (status: pending -> processing -> deleted, or dead)
+CREATE TABLE outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    destination TEXT NOT NULL,
+    post_id INTEGER NOT NULL,
+    payload TEXT,
+    status TEXT DEFAULT 'pending' NOT NULL,
+    attempts INTEGER DEFAULT 0 NOT NULL,
+    next_attempt_at DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL,
+    last_error TEXT,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL,
+    updated_at DATETIME,
+    FOREIGN KEY (post_id) REFERENCES posts (id) ON DELETE CASCADE
+);
+
+-- Full-text search index for posts (trigram tokenizer also matches CJK substrings)
+CREATE VIRTUAL TABLE posts_fts USING fts5(
+    title,
+    content,
+    content='posts',
+    content_rowid='id',
+    tokenize='trigram'
+);
+
+-- Keep the search index in sync with posts
+CREATE TRIGGER posts_fts_ai AFTER INSERT ON posts BEGIN
+    INSERT INTO posts_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+END;
+
+CREATE TRIGGER posts_fts_ad AFTER DELETE ON posts BEGIN
+    INSERT INTO posts_fts(posts_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content);
+END;
+
+CREATE TRIGGER posts_fts_au AFTER UPDATE OF title, content ON posts BEGIN
+    INSERT INTO posts_fts(posts_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content);
+    INSERT INTO posts_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+END;
+
+-- posts.hot_score, its triggers and indexes are added by migrations/0004_posts_hot_score.sql
+-- ig_accounts Graph API columns and ig_templates render settings are added by migrations/0005_publish_settings.sql
+
 -- Create indexes for better performance
 CREATE INDEX idx_users_email ON users(email);
 CREATE INDEX idx_users_school_id ON users(school_id);
@@ -193,4 +235,5 @@ CREATE INDEX idx_comments_post_id ON comments(post_id);
 CREATE INDEX idx_comments_author_id ON comments(author_id);
 CREATE INDEX idx_review_logs_post_id ON review_logs(post_id);
 CREATE INDEX idx_global_discussions_author_id ON global_discussions(author_id);
-CREATE INDEX idx_school_feature_toggles_school_id ON school_feature_toggles(school_id); 
\ No newline at end of file
+CREATE INDEX idx_school_feature_toggles_school_id ON school_feature_toggles(school_id);
+CREATE INDEX idx_outbox_destination_status_next ON outbox(destination, status, next_attempt_at); 
\ No newline at end of file